@@ -0,0 +1,200 @@
+"""Cache semântico de respostas do /chat, por tenant.
+
+Perguntas parafraseadas dentro de um mesmo tenant caem no mesmo vetor (ou
+muito próximo dele). Em vez de pagar uma nova geração do Sonnet, reutilizamos
+a resposta anterior quando a similaridade de cosseno entre os embeddings da
+pergunta passa do limiar configurado e o contexto de tela é compatível.
+Só perguntas sem histórico de conversa entram no cache: a chave não
+representa o histórico, do qual uma pergunta de continuação depende.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+
+import numpy as np
+
+from backend.core.config import get_settings
+from backend.core.metrics import register_metrics_source
+
+
+settings = get_settings()
+logger = logging.getLogger("copiloto-farma.answer-cache")
+
+
+def screen_scope(current_url: str | None) -> str:
+    """Normaliza a URL da tela (sem query/fragment) para escopo do cache."""
+    if not current_url:
+        return ""
+    parsed = urlparse(current_url)
+    return f"{parsed.scheme}://{parsed.netloc}{parsed.path}".rstrip("/")
+
+
+@dataclass(slots=True)
+class CachedAnswer:
+    answer: str
+    scope: str
+    created_at: float
+    generation_seconds: float
+
+
+@dataclass
+class _TenantCache:
+    entries: "OrderedDict[int, CachedAnswer]" = field(default_factory=OrderedDict)
+    vectors: dict[int, np.ndarray] = field(default_factory=dict)
+    matrix: np.ndarray | None = None
+    matrix_keys: list[int] = field(default_factory=list)
+
+    def rebuild(self) -> None:
+        self.matrix_keys = list(self.entries.keys())
+        self.matrix = (
+            np.stack([self.vectors[k] for k in self.matrix_keys])
+            if self.matrix_keys
+            else None
+        )
+
+    def remove(self, key: int) -> None:
+        self.entries.pop(key, None)
+        self.vectors.pop(key, None)
+        self.matrix = None
+
+
+class SemanticAnswerCache:
+    """Cache LRU por tenant indexado pelo embedding (normalizado) da pergunta."""
+
+    def __init__(
+        self,
+        *,
+        threshold: float,
+        max_entries_per_tenant: int,
+        ttl_seconds: float,
+    ) -> None:
+        self.threshold = threshold
+        self.max_entries_per_tenant = max_entries_per_tenant
+        self.ttl_seconds = ttl_seconds
+        self._tenants: dict[str, _TenantCache] = {}
+        self._next_key = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.saved_seconds = 0.0
+        self.hit_seconds = 0.0
+
+    def lookup(self, tenant_id: str, embedding: list[float], scope: str) -> CachedAnswer | None:
+        started = time.perf_counter()
+        found = self._find(tenant_id, embedding, scope)
+        elapsed = time.perf_counter() - started
+
+        if found is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.hit_seconds += elapsed
+        self.saved_seconds += max(0.0, found.generation_seconds - elapsed)
+        return found
+
+    def _find(self, tenant_id: str, embedding: list[float], scope: str) -> CachedAnswer | None:
+        tenant = self._tenants.get(tenant_id)
+        if tenant is None or not tenant.entries:
+            return None
+
+        self._expire(tenant)
+        if not tenant.entries:
+            return None
+        if tenant.matrix is None:
+            tenant.rebuild()
+
+        query = np.asarray(embedding, dtype=np.float32)
+        # Embeddings já saem normalizados do ingestor: produto escalar == cosseno
+        scores = tenant.matrix @ query  # type: ignore[operator]
+        for idx in np.argsort(scores)[::-1]:
+            if scores[idx] < self.threshold:
+                break
+            key = tenant.matrix_keys[idx]
+            entry = tenant.entries[key]
+            if entry.scope == scope:
+                tenant.entries.move_to_end(key)
+                return entry
+        return None
+
+    def _expire(self, tenant: _TenantCache) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        expired = [k for k, e in tenant.entries.items() if e.created_at < cutoff]
+        for key in expired:
+            tenant.remove(key)
+
+    def store(
+        self,
+        tenant_id: str,
+        embedding: list[float],
+        scope: str,
+        answer: str,
+        generation_seconds: float,
+    ) -> None:
+        tenant = self._tenants.setdefault(tenant_id, _TenantCache())
+        key = self._next_key
+        self._next_key += 1
+
+        tenant.entries[key] = CachedAnswer(
+            answer=answer,
+            scope=scope,
+            created_at=time.time(),
+            generation_seconds=generation_seconds,
+        )
+        tenant.vectors[key] = np.asarray(embedding, dtype=np.float32)
+        tenant.matrix = None
+
+        while len(tenant.entries) > self.max_entries_per_tenant:
+            oldest = next(iter(tenant.entries))
+            tenant.remove(oldest)
+
+    def invalidate_tenant(self, tenant_id: str) -> None:
+        """Descarta tudo do tenant (ex.: o corpus de documentos mudou)."""
+        if self._tenants.pop(tenant_id, None) is not None:
+            self.invalidations += 1
+            logger.info("Cache de respostas invalidado — tenant=%s", tenant_id)
+
+    def invalidate_answer(self, tenant_id: str, answer: str) -> None:
+        """Remove entradas cuja resposta recebeu feedback negativo."""
+        tenant = self._tenants.get(tenant_id)
+        if tenant is None:
+            return
+        target = answer.strip()
+        bad = [k for k, e in tenant.entries.items() if e.answer.strip() == target]
+        for key in bad:
+            tenant.remove(key)
+        if bad:
+            self.invalidations += 1
+            logger.info(
+                "Cache de respostas — %d entrada(s) removida(s) por feedback negativo (tenant=%s)",
+                len(bad), tenant_id,
+            )
+
+    def stats(self) -> dict[str, float | int]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": settings.ANSWER_CACHE_ENABLED,
+            "tenants": len(self._tenants),
+            "entries": sum(len(t.entries) for t in self._tenants.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "avg_hit_ms": round(self.hit_seconds / self.hits * 1000, 3) if self.hits else 0.0,
+            "saved_seconds_total": round(self.saved_seconds, 3),
+            "invalidations": self.invalidations,
+        }
+
+
+answer_cache = SemanticAnswerCache(
+    threshold=settings.ANSWER_CACHE_SIMILARITY,
+    max_entries_per_tenant=settings.ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+)
+
+register_metrics_source("answer_cache", answer_cache.stats)
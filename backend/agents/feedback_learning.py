@@ -0,0 +1,115 @@
+"""Seção de "aprendizado" do system prompt, materializada por tenant.
+
+A seção (últimas respostas avaliadas negativamente) só muda quando chega um
+feedback negativo. Em vez de consultar ``feedback`` a cada chat, mantemos o
+texto pronto em memória: o orquestrador lê em O(1) e ``submit_feedback``
+recalcula a entrada do tenant. Os demais workers são avisados via
+``NOTIFY`` do Postgres e descartam a própria cópia.
+
+A entrada fica em cache até a próxima invalidação, então é sempre montada
+a partir do primário: uma réplica atrasada logo após o ``NOTIFY`` ainda
+não teria o feedback que o disparou.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import uuid
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.models.database import AsyncSessionMaker, Feedback, engine
+from backend.models.replica import uses_replica
+
+
+logger = logging.getLogger("copiloto-farma.feedback-learning")
+
+NOTIFY_CHANNEL = "copiloto_feedback_learning"
+FEEDBACK_EXAMPLES = 5
+EXAMPLE_MAX_CHARS = 200
+
+# Identifica este processo para ignorar as próprias notificações
+_WORKER_ID = uuid.uuid4().hex
+
+_sections: dict[str, str] = {}
+
+
+def _format_section(negative_responses: list[str]) -> str:
+    if not negative_responses:
+        return ""
+    bad_examples = "\n".join(
+        f"  - {resp[:EXAMPLE_MAX_CHARS]}" for resp in negative_responses
+    )
+    return (
+        "\n=== APRENDIZADO (evite respostas similares) ===\n"
+        "O usuário avaliou negativamente as seguintes respostas. "
+        "Evite repeti-las ou dar respostas com tom/conteúdo parecido:\n"
+        f"{bad_examples}\n"
+        "=== FIM DO APRENDIZADO ===\n\n"
+    )
+
+
+async def _build_section(session: AsyncSession, tenant_id: str) -> str:
+    """Monta a seção a partir do banco (usa ix_feedback_tenant_rating_created)."""
+    stmt = (
+        select(Feedback.response)
+        .where(Feedback.tenant_id == tenant_id, Feedback.rating == "negative")
+        .order_by(Feedback.created_at.desc())
+        .limit(FEEDBACK_EXAMPLES)
+    )
+    result = await session.execute(stmt)
+    return _format_section([row[0] for row in result.all()])
+
+
+async def get_learning_section(session: AsyncSession, tenant_id: str) -> str:
+    """Seção pronta do tenant; só vai ao banco na primeira vez (ou após invalidação)."""
+    section = _sections.get(tenant_id)
+    if section is None:
+        if uses_replica(session):
+            async with AsyncSessionMaker() as primary:
+                section = await _build_section(primary, tenant_id)
+        else:
+            section = await _build_section(session, tenant_id)
+        _sections[tenant_id] = section
+    return section
+
+
+async def refresh_learning_section(session: AsyncSession, tenant_id: str) -> None:
+    """Recalcula a seção do tenant e avisa os outros workers."""
+    _sections[tenant_id] = await _build_section(session, tenant_id)
+    await session.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": NOTIFY_CHANNEL, "payload": f"{_WORKER_ID}:{tenant_id}"},
+    )
+    await session.commit()
+
+
+def _on_notify(connection, pid, channel, payload: str) -> None:
+    worker_id, _, tenant_id = payload.partition(":")
+    if worker_id != _WORKER_ID:
+        _sections.pop(tenant_id, None)
+
+
+async def run_feedback_listener() -> None:
+    """Mantém um ``LISTEN`` aberto para invalidação entre workers (reconecta em falha)."""
+    while True:
+        try:
+            async with engine.connect() as conn:
+                raw = await conn.get_raw_connection()
+                driver_conn = raw.driver_connection
+                await driver_conn.add_listener(NOTIFY_CHANNEL, _on_notify)
+                # Notificações perdidas enquanto estávamos desconectados
+                _sections.clear()
+                try:
+                    while not driver_conn.is_closed():
+                        await asyncio.sleep(30)
+                finally:
+                    if not driver_conn.is_closed():
+                        await driver_conn.remove_listener(NOTIFY_CHANNEL, _on_notify)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Listener de feedback desconectado: %s — reconectando", exc)
+        await asyncio.sleep(5)
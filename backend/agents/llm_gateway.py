@@ -0,0 +1,276 @@
+"""Gateway único para chamadas à API da Anthropic.
+
+Mantém um ``AsyncAnthropic`` de vida longa (um pool HTTP, conexões
+keep-alive reaproveitadas) e limita quantas chamadas ficam em voo ao mesmo
+tempo. Quem excede o limite espera numa fila por tenant; as vagas liberadas
+são distribuídas em round-robin entre os tenants, então uma rede grande de
+farmácias não monopoliza o LLM. Cada espera tem prazo.
+
+Antes de ocupar a vaga, a chamada reserva no balde ``llm_tokens`` do tenant
+(``backend.core.admission``) o ``max_tokens`` mais uma estimativa da
+entrada; depois o valor é acertado com o ``usage`` real da resposta.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator
+
+import httpx
+
+from backend.core.admission import admission
+from backend.core.config import get_settings
+from backend.core.metrics import register_metrics_source
+from backend.core.profiling import span
+
+if TYPE_CHECKING:
+    import anthropic
+
+
+settings = get_settings()
+logger = logging.getLogger("copiloto-farma.llm-gateway")
+
+
+class LLMOverloadedError(RuntimeError):
+    """Nenhuma vaga de LLM liberada dentro do prazo da fila."""
+
+
+_IMAGE_TOKENS_ESTIMATE = 1600  # imagem redimensionada para ~1.15 MP
+
+
+def estimate_tokens(kwargs: dict[str, Any]) -> int:
+    """Estimativa grosseira (4 caracteres/token) de entrada + saída máxima."""
+    chars = 0
+    images = 0
+
+    def visit(content: Any) -> None:
+        nonlocal chars, images
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            for block in content:
+                if block.get("type") == "image":
+                    images += 1
+                else:
+                    chars += len(block.get("text", ""))
+
+    visit(kwargs.get("system", ""))
+    for message in kwargs.get("messages", ()):
+        visit(message.get("content", ""))
+    return kwargs.get("max_tokens", 0) + chars // 4 + images * _IMAGE_TOKENS_ESTIMATE
+
+
+class LLMGateway:
+    def __init__(
+        self,
+        *,
+        max_in_flight: int,
+        max_in_flight_per_tenant: int,
+        queue_timeout: float,
+    ) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_per_tenant = max_in_flight_per_tenant
+        self.queue_timeout = queue_timeout
+
+        self._client: anthropic.AsyncAnthropic | None = None
+        self._in_flight = 0
+        self._tenant_in_flight: dict[str, int] = {}
+        self._queues: "OrderedDict[str, deque[asyncio.Future[None]]]" = OrderedDict()
+
+        self.requests = 0
+        self.queued = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    # ── Cliente compartilhado ──────────────────────────────────
+
+    @property
+    def configured(self) -> bool:
+        return bool(settings.ANTHROPIC_API_KEY)
+
+    @property
+    def client(self) -> anthropic.AsyncAnthropic:
+        if self._client is None:
+            if not self.configured:
+                raise RuntimeError(
+                    "ANTHROPIC_API_KEY não configurada. "
+                    "Defina no .env ou nas variáveis de ambiente."
+                )
+            # Importado só aqui: o SDK leva ~2s para carregar e pesaria em
+            # todo cold start (ver backend/core/warmup.py)
+            import anthropic
+
+            self._client = anthropic.AsyncAnthropic(
+                api_key=settings.ANTHROPIC_API_KEY,
+                base_url=settings.ANTHROPIC_BASE_URL,
+                timeout=settings.LLM_REQUEST_TIMEOUT_SECONDS,
+                max_retries=2,
+                http_client=anthropic.DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+                        keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_SECONDS,
+                    ),
+                ),
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    # ── Controle de concorrência ───────────────────────────────
+
+    def _has_capacity(self, tenant_id: str) -> bool:
+        return (
+            self._in_flight < self.max_in_flight
+            and self._tenant_in_flight.get(tenant_id, 0) < self.max_in_flight_per_tenant
+        )
+
+    def _grant(self, tenant_id: str) -> None:
+        self._in_flight += 1
+        self._tenant_in_flight[tenant_id] = self._tenant_in_flight.get(tenant_id, 0) + 1
+
+    def _release(self, tenant_id: str) -> None:
+        self._in_flight -= 1
+        remaining = self._tenant_in_flight.get(tenant_id, 1) - 1
+        if remaining:
+            self._tenant_in_flight[tenant_id] = remaining
+        else:
+            self._tenant_in_flight.pop(tenant_id, None)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Entrega vagas livres aos tenants da fila, em round-robin."""
+        progressed = True
+        while progressed and self._in_flight < self.max_in_flight and self._queues:
+            progressed = False
+            for tenant_id in list(self._queues):
+                queue = self._queues[tenant_id]
+                while queue and queue[0].done():
+                    queue.popleft()  # espera cancelada / expirada
+                if not queue:
+                    del self._queues[tenant_id]
+                    continue
+                if not self._has_capacity(tenant_id):
+                    continue
+
+                queue.popleft().set_result(None)
+                self._grant(tenant_id)
+                progressed = True
+
+                # Tenant atendido vai para o fim da fila
+                if queue:
+                    self._queues.move_to_end(tenant_id)
+                else:
+                    del self._queues[tenant_id]
+                break
+
+    @asynccontextmanager
+    async def slot(self, tenant_id: str, timeout: float | None = None) -> AsyncIterator[None]:
+        """Reserva uma vaga de chamada ao LLM para o tenant."""
+        self.requests += 1
+
+        if not self._queues and self._has_capacity(tenant_id):
+            self._grant(tenant_id)
+        else:
+            with span("llm.slot_wait"):
+                await self._wait_for_slot(tenant_id, self.queue_timeout if timeout is None else timeout)
+
+        try:
+            yield
+        finally:
+            self._release(tenant_id)
+
+    async def _wait_for_slot(self, tenant_id: str, timeout: float) -> None:
+        self.queued += 1
+        fut: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(tenant_id, deque()).append(fut)
+        self._dispatch()
+        started = time.perf_counter()
+
+        try:
+            await asyncio.wait({fut}, timeout=timeout)
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self._release(tenant_id)  # vaga concedida mas o chamador desistiu
+            else:
+                fut.cancel()
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+        if not fut.done():
+            fut.cancel()
+            self.timeouts += 1
+            logger.warning(
+                "Fila do LLM estourou o prazo (%.1fs) — tenant=%s em_voo=%d fila=%d",
+                timeout, tenant_id, self._in_flight, self.queue_depth,
+            )
+            raise LLMOverloadedError(
+                "Muitas requisições ao assistente no momento. Tente novamente em instantes."
+            )
+
+    async def create_message(self, tenant_id: str, **kwargs: Any) -> anthropic.types.Message:
+        """``messages.create`` respeitando a cota e os limites de concorrência."""
+        reserved = estimate_tokens(kwargs)
+        await admission.acquire(tenant_id, "llm_tokens", reserved)
+        with span("llm", model=kwargs.get("model"), reserved_tokens=reserved) as attrs:
+            try:
+                async with self.slot(tenant_id):
+                    response = await self.client.messages.create(**kwargs)
+            except BaseException:
+                admission.release(tenant_id, "llm_tokens", reserved)
+                raise
+            usage = response.usage
+            used = usage.input_tokens + (usage.cache_creation_input_tokens or 0) + usage.output_tokens
+            attrs.update(
+                input_tokens=usage.input_tokens,
+                cache_read_tokens=usage.cache_read_input_tokens or 0,
+                output_tokens=usage.output_tokens,
+            )
+        admission.release(tenant_id, "llm_tokens", reserved - used)
+        return response
+
+    # ── Métricas ───────────────────────────────────────────────
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for q in self._queues.values() for f in q if not f.done())
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": self.queue_depth,
+            "queue_depth_by_tenant": {
+                t: sum(1 for f in q if not f.done()) for t, q in self._queues.items()
+            },
+            "requests": self.requests,
+            "queued": self.queued,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.wait_seconds_total / self.queued * 1000, 2) if self.queued else 0.0,
+            "max_wait_ms": round(self.wait_seconds_max * 1000, 2),
+        }
+
+
+llm_gateway = LLMGateway(
+    max_in_flight=settings.LLM_MAX_IN_FLIGHT,
+    max_in_flight_per_tenant=settings.LLM_MAX_IN_FLIGHT_PER_TENANT,
+    queue_timeout=settings.LLM_QUEUE_TIMEOUT_SECONDS,
+)
+
+register_metrics_source("llm_gateway", llm_gateway.stats)
+
+
+def message_text(response: anthropic.types.Message) -> str:
+    """Concatena os blocos de texto de uma resposta da API."""
+    return "".join(block.text for block in response.content if block.type == "text")
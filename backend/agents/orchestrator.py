@@ -1,45 +1,138 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass
 from typing import Any, Dict, List
 
-import anthropic
-from langchain_anthropic import ChatAnthropic
-from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
-from sqlalchemy import select
-
+from backend.agents.answer_cache import answer_cache, screen_scope
+from backend.agents.feedback_learning import get_learning_section
+from backend.agents.llm_gateway import llm_gateway, message_text
+from backend.agents.screenshot import (
+    prepare_screenshot,
+    screen_descriptions,
+    split_screen_description,
+)
+from backend.agents.verified_answers import find_verified_answer, rephrase_verified_answer
 from backend.core.config import get_settings
-from backend.models.database import AsyncSession, Feedback
+from backend.core.metrics import register_metrics_source
+from backend.core.profiling import span
+from backend.models.database import AsyncSession
+from backend.models.replica import read_session
+from backend.rag.ingestor import embed_texts
 from backend.rag.retriever import format_chunks_as_context, retrieve_relevant_chunks
 
 
 settings = get_settings()
+logger = logging.getLogger("copiloto-farma")
+
+# ── Prompt layout (estável → volátil) ──────────────────────────
+# 1. persona fixa            (system, idêntica para todos)
+# 2. aprendizado do tenant   (system, muda só com feedback negativo)
+# 3. histórico da conversa   (messages, só cresce entre turnos)
+# 4. RAG + tela + pergunta   (última mensagem do usuário, muda a cada turno)
+# Os breakpoints de cache_control ficam no fim de (2) e de (3), então o
+# prefixo inteiro é reaproveitado pelo prompt caching da Anthropic.
+
+STATIC_SYSTEM_PROMPT = (
+    "Você é um co-piloto de IA especializado em operações de farmácias SaaS.\n"
+    "Responda sempre de forma concisa, em PT-BR, e evite inventar dados.\n"
+    "Quando não souber algo, admita explicitamente.\n"
+    "Se o usuário enviar uma captura de tela, analise-a cuidadosamente e "
+    "use as informações visuais para dar suporte contextualizado.\n"
+    "Cada mensagem do usuário traz o contexto RAG e a tela atual entre "
+    "marcadores === antes da pergunta propriamente dita.\n"
+)
+
+_CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def _system_blocks(feedback_section: str) -> list[dict[str, Any]]:
+    blocks: list[dict[str, Any]] = [{"type": "text", "text": STATIC_SYSTEM_PROMPT}]
+    if feedback_section:
+        blocks.append({"type": "text", "text": feedback_section})
+    blocks[-1]["cache_control"] = _CACHE_CONTROL
+    return blocks
+
+
+def _history_messages(history: List[Dict[str, str]]) -> list[dict[str, Any]]:
+    """Histórico no formato da API, com breakpoint de cache na última mensagem."""
+    out: list[dict[str, Any]] = [
+        {"role": entry["role"], "content": entry.get("content", "")}
+        for entry in history
+        if entry.get("role") in ("user", "assistant") and entry.get("content")
+    ]
+    if out:
+        out[-1]["content"] = [
+            {"type": "text", "text": out[-1]["content"], "cache_control": _CACHE_CONTROL}
+        ]
+    return out
+
+
+def _turn_context(rag_context: str, context: Dict[str, Any]) -> str:
+    """Parte volátil do prompt: tela atual, trechos RAG e contexto da requisição."""
+    page_title = context.get("page_title", "")
+    current_url = context.get("current_url", "")
+    screen_context_line = ""
+    if page_title or current_url:
+        screen_context_line = f"O usuário está na tela: {page_title} ({current_url})\n"
+
+    return (
+        f"{screen_context_line}"
+        f"=== CONTEXTO RAG ===\n{rag_context}\n"
+        f"=== FIM DO CONTEXTO ===\n\n"
+        "Contexto adicional da requisição (JSON): "
+        f"{json.dumps(context, ensure_ascii=False, sort_keys=True, default=str)}"
+    )
+
+
+def _log_cache_usage(path: str, usage: Any) -> None:
+    logger.info(
+        "LLM %s — input=%d cache_read=%d cache_write=%d",
+        path,
+        usage.input_tokens,
+        usage.cache_read_input_tokens or 0,
+        usage.cache_creation_input_tokens or 0,
+    )
+
+
+def _coalescing_key(
+    tenant_id: str, message: str, context: Dict[str, Any], history: List[Dict[str, str]],
+) -> str:
+    """Mesma chave = mesmo prompt: pergunta normalizada, contexto e histórico."""
+    normalized = " ".join(message.split()).casefold()
+    payload = json.dumps(
+        [tenant_id, normalized, context, _history_messages(history)],
+        ensure_ascii=False, sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass(slots=True)
+class ChatAnswer:
+    text: str
+    # pair_hash da resposta verificada que originou ``text`` (para o feedback)
+    verified_answer: str | None = None
 
 
 class ChatOrchestrator:
-    """Orquestrador de chamadas ao LLM com RAG."""
+    """Orquestrador de chamadas ao LLM com RAG.
 
-    def __init__(self) -> None:
-        if not settings.ANTHROPIC_API_KEY:
-            self._client: ChatAnthropic | None = None
-        else:
-            self._client = ChatAnthropic(
-                api_key=settings.ANTHROPIC_API_KEY,
-                model=settings.ANTHROPIC_MODEL,
-                max_tokens=settings.ANTHROPIC_MAX_TOKENS,
-            )
+    Perguntas idênticas que chegam ao mesmo tempo (abertura da loja, vários
+    atendentes do mesmo tenant) compartilham um único pipeline em voo —
+    embedding, retrieval e chamada ao LLM — e todas recebem a mesma
+    resposta. Vale só sem screenshot; o pipeline compartilhado abre a
+    própria sessão e não é cancelado se o primeiro cliente desistir.
+    """
 
-    async def _get_negative_feedback(
-        self, session: AsyncSession, tenant_id: str, limit: int = 5
-    ) -> List[str]:
-        """Busca as últimas respostas avaliadas negativamente pelo tenant."""
-        stmt = (
-            select(Feedback.response)
-            .where(Feedback.tenant_id == tenant_id, Feedback.rating == "negative")
-            .order_by(Feedback.created_at.desc())
-            .limit(limit)
-        )
-        result = await session.execute(stmt)
-        return [row[0] for row in result.all()]
+    def __init__(self) -> None:
+        self._in_flight: dict[str, asyncio.Task[ChatAnswer]] = {}
+        self.coalesced_leaders = 0
+        self.coalesced_followers = 0
 
     async def chat(
         self,
@@ -50,8 +143,8 @@ class ChatOrchestrator:
         context: Dict[str, Any] | None = None,
         history: List[Dict[str, str]] | None = None,
         screenshot: str | None = None,
-    ) -> str:
-        if self._client is None:
+    ) -> ChatAnswer:
+        if not llm_gateway.configured:
             raise RuntimeError(
                 "ANTHROPIC_API_KEY não configurada. "
                 "Defina no .env ou nas variáveis de ambiente."
@@ -59,116 +152,184 @@ class ChatOrchestrator:
 
         context = context or {}
         history = history or []
+        with span("orchestrator.chat", tenant_id=tenant_id, screenshot=bool(screenshot)) as attrs:
+            if screenshot or not settings.CHAT_COALESCING_ENABLED:
+                return await self._answer(
+                    session=session, tenant_id=tenant_id, message=message,
+                    context=context, history=history, screenshot=screenshot,
+                )
+
+            key = _coalescing_key(tenant_id, message, context, history)
+            task = self._in_flight.get(key)
+            if task is None:
+                self.coalesced_leaders += 1
+                attrs["coalesced"] = "leader"
+                task = asyncio.create_task(self._answer_detached(tenant_id, message, context, history))
+                self._in_flight[key] = task
+                task.add_done_callback(functools.partial(self._forget, key))
+            else:
+                self.coalesced_followers += 1
+                attrs["coalesced"] = "follower"
+            return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task[ChatAnswer]) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()  # todos os chamadores podem ter desistido
+
+    async def _answer_detached(
+        self, tenant_id: str, message: str, context: Dict[str, Any], history: List[Dict[str, str]],
+    ) -> ChatAnswer:
+        async with read_session() as session:
+            return await self._answer(
+                session=session, tenant_id=tenant_id, message=message,
+                context=context, history=history, screenshot=None,
+            )
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "in_flight": len(self._in_flight),
+            "leaders": self.coalesced_leaders,
+            "followers": self.coalesced_followers,
+        }
+
+    async def _answer(
+        self,
+        *,
+        session: AsyncSession,
+        tenant_id: str,
+        message: str,
+        context: Dict[str, Any],
+        history: List[Dict[str, str]],
+        screenshot: str | None,
+    ) -> ChatAnswer:
+        started = time.perf_counter()
+
+        query_embedding = embed_texts([message])[0]
+        follow_up = bool(_history_messages(history))
+
+        # ── Verified answers fast path (curated from positive feedback) ──
+        # Curated pairs are standalone questions: a follow-up goes through RAG
+        if settings.VERIFIED_ANSWERS_ENABLED and not screenshot and not follow_up:
+            with span("verified_answers") as attrs:
+                verified = await find_verified_answer(session, tenant_id, query_embedding)
+                attrs["hit"] = verified is not None
+            if verified is not None:
+                return ChatAnswer(
+                    text=await rephrase_verified_answer(tenant_id, verified.answer, message),
+                    verified_answer=verified.pair_hash,
+                )
+
+        # ── Semantic answer cache (only standalone questions without screenshot) ──
+        # A follow-up ("e como estorno?") depends on the history, which the
+        # cache key (question embedding + screen) doesn't capture
+        cache_scope = screen_scope(context.get("current_url"))
+        use_cache = settings.ANSWER_CACHE_ENABLED and not screenshot and not follow_up
+        if use_cache:
+            with span("answer_cache") as attrs:
+                cached = answer_cache.lookup(tenant_id, query_embedding, cache_scope)
+                attrs["hit"] = cached is not None
+            if cached is not None:
+                return ChatAnswer(text=cached.answer)
 
         chunks = await retrieve_relevant_chunks(
             session=session,
             tenant_id=tenant_id,
             query=message,
+            query_embedding=query_embedding,
         )
 
         rag_context = format_chunks_as_context(chunks)
 
-        # ── Build screen-context awareness ──
-        page_title = context.get("page_title", "")
-        current_url = context.get("current_url", "")
-        screen_context_line = ""
-        if page_title or current_url:
-            screen_context_line = (
-                f"O usuário está na tela: {page_title} ({current_url})\n"
-            )
+        # ── Passive learning: precomputed per-tenant section ──
+        with span("learning_section"):
+            feedback_section = await get_learning_section(session, tenant_id)
 
-        # ── Passive learning: fetch negative feedback ──
-        negative_responses = await self._get_negative_feedback(session, tenant_id)
-        feedback_section = ""
-        if negative_responses:
-            bad_examples = "\n".join(
-                f"  - {resp[:200]}" for resp in negative_responses
-            )
-            feedback_section = (
-                "\n=== APRENDIZADO (evite respostas similares) ===\n"
-                "O usuário avaliou negativamente as seguintes respostas. "
-                "Evite repeti-las ou dar respostas com tom/conteúdo parecido:\n"
-                f"{bad_examples}\n"
-                "=== FIM DO APRENDIZADO ===\n\n"
-            )
+        system_blocks = _system_blocks(feedback_section)
+        history_messages = _history_messages(history)
+        turn_context = _turn_context(rag_context, context)
 
-        system_prompt = (
-            "Você é um co-piloto de IA especializado em operações de farmácias SaaS.\n"
-            "Responda sempre de forma concisa, em PT-BR, e evite inventar dados.\n"
-            "Quando não souber algo, admita explicitamente.\n"
-            "Se o usuário enviar uma captura de tela, analise-a cuidadosamente e "
-            "use as informações visuais para dar suporte contextualizado.\n"
-            f"\n{screen_context_line}"
-            f"{feedback_section}"
-            f"=== CONTEXTO RAG ===\n{rag_context}\n"
-            f"=== FIM DO CONTEXTO ===\n\n"
-            f"Contexto adicional da requisição (JSON): {context}"
-        )
+        # Current user message — with screenshot: downscaled image, or the
+        # cached description when the same screen was already analysed
+        screen_hash: int | None = None
+        if screenshot:
+            with span("screenshot.prepare"):
+                prepared = await prepare_screenshot(screenshot)
+            logger.info(
+                "Screenshot %dx%d %s — %d → %d bytes",
+                prepared.width, prepared.height, prepared.media_type,
+                prepared.original_bytes, prepared.encoded_bytes,
+            )
 
-        # ── Build messages array with conversation history ──
-        messages: list[SystemMessage | HumanMessage | AIMessage] = [
-            SystemMessage(content=system_prompt),
-        ]
+            # URL completa (com query): outro registro na mesma tela é outra chave
+            screen_key = context.get("current_url") or ""
+            description = screen_descriptions.get(tenant_id, screen_key, prepared.phash)
+            if description is not None:
+                user_content: list[dict[str, Any]] = [
+                    {"type": "text", "text": turn_context},
+                    {
+                        "type": "text",
+                        "text": (
+                            "Descrição da tela atual (captura já analisada):\n"
+                            f"{description}\n\nResponda: {message}"
+                        ),
+                    },
+                ]
+            else:
+                screen_hash = prepared.phash
+                user_content = [
+                    {
+                        "type": "image",
+                        "source": {
+                            "type": "base64",
+                            "media_type": prepared.media_type,
+                            "data": prepared.data,
+                        },
+                    },
+                    {"type": "text", "text": turn_context},
+                    {
+                        "type": "text",
+                        "text": (
+                            "Descreva o que está visível nessa tela entre <tela> e </tela> "
+                            f"e depois responda: {message}"
+                        ),
+                    },
+                ]
+            max_tokens = max(1024, settings.ANTHROPIC_MAX_TOKENS)
+        else:
+            user_content = [
+                {"type": "text", "text": turn_context},
+                {"type": "text", "text": message},
+            ]
+            max_tokens = settings.ANTHROPIC_MAX_TOKENS
 
-        for entry in history:
-            role = entry.get("role", "")
-            content = entry.get("content", "")
-            if role == "user":
-                messages.append(HumanMessage(content=content))
-            elif role == "assistant":
-                messages.append(AIMessage(content=content))
+        response = await llm_gateway.create_message(
+            tenant_id,
+            model=settings.ANTHROPIC_MODEL,
+            max_tokens=max_tokens,
+            system=system_blocks,
+            messages=history_messages + [{"role": "user", "content": user_content}],
+        )
+        _log_cache_usage("vision" if screenshot else "chat", response.usage)
+        answer = message_text(response)
 
-        # Current user message — with screenshot: use Anthropic async SDK directly
-        if screenshot:
-            import logging
-            import re
-            logger = logging.getLogger("copiloto-farma")
-            logger.info(f"Entrando no bloco de screenshot, tamanho: {len(screenshot)}")
-
-            # Strip data URL prefix (handles png, jpeg, webp, etc.)
-            clean_b64 = re.sub(r"^data:image/[^;]+;base64,", "", screenshot)
-
-            # Build history for the vision call too
-            vision_messages: list[dict] = []
-            for entry in history:
-                role = entry.get("role", "")
-                content = entry.get("content", "")
-                if role in ("user", "assistant"):
-                    vision_messages.append({"role": role, "content": content})
-
-            vision_messages.append(
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": "image/png",
-                                "data": clean_b64,
-                            },
-                        },
-                        {
-                            "type": "text",
-                            "text": f"Descreva o que está visível nessa tela e responda: {message}",
-                        },
-                    ],
-                }
-            )
+        if screen_hash is not None:
+            description, answer = split_screen_description(answer)
+            if description:
+                screen_descriptions.put(tenant_id, screen_key, screen_hash, description)
 
-            async_client = anthropic.AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
-            response = await async_client.messages.create(
-                model=settings.ANTHROPIC_MODEL,
-                max_tokens=max(1024, settings.ANTHROPIC_MAX_TOKENS),
-                system=system_prompt,
-                messages=vision_messages,
+        if use_cache:
+            answer_cache.store(
+                tenant_id,
+                query_embedding,
+                cache_scope,
+                answer,
+                generation_seconds=time.perf_counter() - started,
             )
-            return response.content[0].text
-
-        # Without screenshot: use LangChain as usual
-        messages.append(HumanMessage(content=message))
+        return ChatAnswer(text=answer)
 
-        result = await self._client.ainvoke(messages)  # type: ignore[union-attr]
-        return result.content if isinstance(result.content, str) else str(result.content)
 
 orchestrator = ChatOrchestrator()
+
+register_metrics_source("chat_coalescing", orchestrator.stats)
@@ -0,0 +1,242 @@
+"""Pré-processamento das capturas de tela enviadas pelo widget.
+
+O Electron manda a tela em resolução cheia como PNG base64. Antes de ir para
+o modelo de visão, a imagem é decodificada, tem o formato real detectado,
+é reduzida para ``SCREENSHOT_MAX_EDGE`` e recomprimida — tudo num pool de
+threads dedicado, fora do event loop. Também calculamos um hash perceptual
+(dHash de 256 bits): telas praticamente iguais têm hashes a poucos bits de
+distância, o que permite reaproveitar a descrição da tela já feita pelo
+modelo em vez de reenviar a imagem.
+
+O reaproveitamento é opt-in (``SCREENSHOT_DESCRIPTION_REUSE``): telas com o
+mesmo layout e dados diferentes (outro cadastro, um diálogo de erro) podem
+ter o mesmo hash. Por isso a chave inclui também a URL da tela e, por
+padrão, o hash precisa ser idêntico (``SCREENSHOT_PHASH_MAX_DISTANCE=0``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import binascii
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+from typing import TYPE_CHECKING
+
+from backend.core.config import get_settings
+from backend.core.metrics import register_metrics_source
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+settings = get_settings()
+
+_DATA_URL_PREFIX = re.compile(r"^data:image/[^;]+;base64,")
+
+_MEDIA_TYPES = {
+    "PNG": "image/png",
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+    "GIF": "image/gif",
+}
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.SCREENSHOT_WORKERS,
+    thread_name_prefix="screenshot",
+)
+
+
+_stats: dict[str, float] = {
+    "processed": 0,
+    "process_seconds": 0.0,
+    "bytes_in": 0,
+    "bytes_out": 0,
+    "description_hits": 0,
+    "description_misses": 0,
+}
+
+
+class InvalidScreenshotError(ValueError):
+    """Screenshot não é base64 válido ou não é uma imagem suportada."""
+
+
+@dataclass(slots=True)
+class PreparedScreenshot:
+    media_type: str
+    data: str  # base64, sem prefixo data URL
+    phash: int
+    width: int
+    height: int
+    original_bytes: int
+    encoded_bytes: int
+
+
+_DHASH_SIZE = 16
+
+
+def _dhash(image: Image.Image) -> int:
+    """Hash perceptual por diferença (17x16 em tons de cinza → 256 bits)."""
+    from PIL import Image
+
+    n = _DHASH_SIZE
+    small = image.convert("L").resize((n + 1, n), Image.Resampling.BILINEAR)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(n):
+        offset = row * (n + 1)
+        for col in range(n):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def _process(raw: bytes) -> PreparedScreenshot:
+    from PIL import Image  # sob demanda: fora do cold start
+
+    try:
+        image = Image.open(BytesIO(raw))
+        image.load()
+    except Exception as exc:
+        raise InvalidScreenshotError(f"Screenshot inválido: {exc}") from exc
+
+    source_format = image.format or ""
+    phash = _dhash(image)
+
+    max_edge = settings.SCREENSHOT_MAX_EDGE
+    needs_resize = max(image.size) > max_edge
+    if needs_resize:
+        image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+    target_format = settings.SCREENSHOT_FORMAT.upper()
+    if not needs_resize and source_format == target_format:
+        # Já está no formato e tamanho certos: não recomprime
+        return PreparedScreenshot(
+            media_type=_MEDIA_TYPES[source_format],
+            data=base64.b64encode(raw).decode("ascii"),
+            phash=phash,
+            width=image.width,
+            height=image.height,
+            original_bytes=len(raw),
+            encoded_bytes=len(raw),
+        )
+
+    if target_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    elif image.mode not in ("RGB", "RGBA", "L"):
+        image = image.convert("RGBA")
+
+    out = BytesIO()
+    save_kwargs: dict = {"optimize": True}
+    if target_format in ("JPEG", "WEBP"):
+        save_kwargs["quality"] = settings.SCREENSHOT_QUALITY
+    image.save(out, format=target_format, **save_kwargs)
+    encoded = out.getvalue()
+
+    # Se a recompressão não compensar (e o original for aceito pela API), mantém
+    if not needs_resize and source_format in _MEDIA_TYPES and len(encoded) >= len(raw):
+        encoded, target_format = raw, source_format
+
+    return PreparedScreenshot(
+        media_type=_MEDIA_TYPES[target_format],
+        data=base64.b64encode(encoded).decode("ascii"),
+        phash=phash,
+        width=image.width,
+        height=image.height,
+        original_bytes=len(raw),
+        encoded_bytes=len(encoded),
+    )
+
+
+async def prepare_screenshot(screenshot: str) -> PreparedScreenshot:
+    """Decodifica, redimensiona e recomprime a captura num pool de threads."""
+    clean_b64 = _DATA_URL_PREFIX.sub("", screenshot, count=1)
+    try:
+        raw = base64.b64decode(clean_b64, validate=False)
+    except (binascii.Error, ValueError) as exc:
+        raise InvalidScreenshotError(f"Screenshot não é base64 válido: {exc}") from exc
+
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    prepared = await loop.run_in_executor(_executor, _process, raw)
+    _stats["processed"] += 1
+    _stats["process_seconds"] += time.perf_counter() - started
+    _stats["bytes_in"] += prepared.original_bytes
+    _stats["bytes_out"] += prepared.encoded_bytes
+    return prepared
+
+
+# ── Cache de descrições por hash perceptual ────────────────────
+
+class ScreenDescriptionCache:
+    """Descrições de tela já feitas pelo modelo, por tenant, URL da tela e dHash."""
+
+    def __init__(self, *, enabled: bool, max_distance: int, max_entries_per_tenant: int) -> None:
+        self.enabled = enabled
+        self.max_distance = max_distance
+        self.max_entries_per_tenant = max_entries_per_tenant
+        self._tenants: dict[str, "OrderedDict[tuple[str, int], str]"] = {}
+
+    def get(self, tenant_id: str, screen: str, phash: int) -> str | None:
+        if not self.enabled:
+            return None
+        entries = self._tenants.get(tenant_id)
+        if not entries:
+            _stats["description_misses"] += 1
+            return None
+        for key, description in entries.items():
+            known_screen, known = key
+            if known_screen == screen and (known ^ phash).bit_count() <= self.max_distance:
+                entries.move_to_end(key)
+                _stats["description_hits"] += 1
+                return description
+        _stats["description_misses"] += 1
+        return None
+
+    def put(self, tenant_id: str, screen: str, phash: int, description: str) -> None:
+        if not self.enabled:
+            return
+        entries = self._tenants.setdefault(tenant_id, OrderedDict())
+        key = (screen, phash)
+        entries[key] = description
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries_per_tenant:
+            entries.popitem(last=False)
+
+
+def _snapshot() -> dict[str, float]:
+    processed = _stats["processed"]
+    return {
+        **_stats,
+        "avg_process_ms": round(_stats["process_seconds"] / processed * 1000, 2) if processed else 0.0,
+        "compression_ratio": round(_stats["bytes_out"] / _stats["bytes_in"], 4) if _stats["bytes_in"] else 0.0,
+    }
+
+
+register_metrics_source("screenshots", _snapshot)
+
+screen_descriptions = ScreenDescriptionCache(
+    enabled=settings.SCREENSHOT_DESCRIPTION_REUSE,
+    max_distance=settings.SCREENSHOT_PHASH_MAX_DISTANCE,
+    max_entries_per_tenant=settings.SCREENSHOT_DESCRIPTION_CACHE_SIZE,
+)
+
+
+_DESCRIPTION_TAG = re.compile(r"<tela>(.*?)</tela>", re.DOTALL)
+
+
+def split_screen_description(text: str) -> tuple[str | None, str]:
+    """Separa a descrição ``<tela>...</tela>`` da resposta.
+
+    Retorna ``(descrição, texto_para_o_usuário)``; o texto mantém a descrição,
+    só sem as tags, como o usuário já recebia antes.
+    """
+    match = _DESCRIPTION_TAG.search(text)
+    if match is None:
+        return None, text
+    description = match.group(1).strip()
+    visible = _DESCRIPTION_TAG.sub(lambda m: m.group(1).strip(), text, count=1).strip()
+    return description or None, visible
@@ -0,0 +1,235 @@
+"""Respostas verificadas: pares pergunta/resposta com feedback positivo recorrente.
+
+Um job em background agrega a tabela ``feedback`` e promove os pares
+(pergunta, resposta) avaliados positivamente ao menos
+``VERIFIED_ANSWERS_MIN_POSITIVE`` vezes — e nunca negativamente — para o
+índice ``verified_answers``, já com o embedding da pergunta. O orquestrador
+consulta esse índice antes do RAG: em um match forte, devolve a resposta
+curada sem chamar o Sonnet. Só perguntas sem histórico de conversa usam o
+índice — uma pergunta de continuação depende do que veio antes.
+
+Com ``VERIFIED_ANSWERS_REPHRASE_MODEL`` o usuário avalia o texto reescrito,
+não o curado: por isso o ``/chat`` devolve o ``pair_hash`` do par usado e o
+feedback o traz de volta. Um negativo com ``pair_hash`` tira o par do
+índice na hora e o impede de voltar no rebuild.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass
+
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.agents.llm_gateway import llm_gateway, message_text
+from backend.core.config import get_settings
+from backend.core.metrics import register_metrics_source
+from backend.models.database import AsyncSessionMaker, Feedback, VerifiedAnswer
+from backend.rag.ingestor import embed_texts
+
+
+settings = get_settings()
+logger = logging.getLogger("copiloto-farma.verified-answers")
+
+_stats = {"lookups": 0, "hits": 0, "rephrased": 0, "rebuilds": 0, "promoted": 0, "demoted": 0}
+
+register_metrics_source("verified_answers", lambda: dict(_stats))
+
+
+def _normalize_question(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _pair_hash(question: str, answer: str) -> str:
+    return hashlib.md5(f"{question}\x00{answer.strip()}".encode("utf-8")).hexdigest()
+
+
+@dataclass(slots=True)
+class VerifiedMatch:
+    pair_hash: str
+    question: str
+    answer: str
+    similarity: float
+
+
+# ── Rebuild (job em background) ────────────────────────────────
+
+async def rebuild_verified_answers(session: AsyncSession) -> tuple[int, int]:
+    """Sincroniza ``verified_answers`` com o feedback atual.
+
+    Retorna ``(promovidos, removidos)``. Só embeda perguntas novas; pares
+    que já estão no índice apenas têm o contador atualizado.
+    """
+    question = func.lower(func.btrim(Feedback.message)).label("question")
+    positives = func.count().filter(Feedback.rating == "positive").label("positives")
+    negatives = func.count().filter(Feedback.rating == "negative").label("negatives")
+
+    stmt = (
+        select(Feedback.tenant_id, question, Feedback.response, positives, negatives)
+        .group_by(Feedback.tenant_id, question, Feedback.response)
+        .having(positives >= settings.VERIFIED_ANSWERS_MIN_POSITIVE)
+    )
+    rows = (await session.execute(stmt)).all()
+
+    # Negativos dados a respostas reescritas contam contra o par curado
+    rejected_rows = await session.execute(
+        select(Feedback.tenant_id, Feedback.verified_pair_hash)
+        .where(Feedback.rating == "negative", Feedback.verified_pair_hash.is_not(None))
+        .distinct()
+    )
+    rejected = {(t, h) for t, h in rejected_rows.all()}
+
+    qualifying: dict[tuple[str, str], tuple[str, str, int]] = {}
+    for tenant_id, q, response, pos, neg in rows:
+        if neg:
+            continue
+        q = _normalize_question(q)
+        key = (tenant_id, _pair_hash(q, response))
+        if key not in rejected:
+            qualifying[key] = (q, response, int(pos))
+
+    existing_rows = await session.execute(
+        select(VerifiedAnswer.id, VerifiedAnswer.tenant_id, VerifiedAnswer.pair_hash)
+    )
+    existing = {(t, h): vid for vid, t, h in existing_rows.all()}
+
+    # Pares que perderam a qualificação (feedback negativo, ou apagados)
+    stale_ids = [vid for key, vid in existing.items() if key not in qualifying]
+    if stale_ids:
+        await session.execute(delete(VerifiedAnswer).where(VerifiedAnswer.id.in_(stale_ids)))
+
+    for key, (q, response, pos) in qualifying.items():
+        if key in existing:
+            await session.execute(
+                update(VerifiedAnswer)
+                .where(VerifiedAnswer.id == existing[key])
+                .values(positive_count=pos)
+            )
+
+    new_keys = [key for key in qualifying if key not in existing]
+    if new_keys:
+        questions = [qualifying[k][0] for k in new_keys]
+        loop = asyncio.get_running_loop()
+        embeddings = await loop.run_in_executor(None, embed_texts, questions)
+        session.add_all(
+            VerifiedAnswer(
+                tenant_id=tenant_id,
+                pair_hash=pair_hash,
+                question=qualifying[(tenant_id, pair_hash)][0],
+                answer=qualifying[(tenant_id, pair_hash)][1],
+                positive_count=qualifying[(tenant_id, pair_hash)][2],
+                embedding=emb,
+            )
+            for (tenant_id, pair_hash), emb in zip(new_keys, embeddings, strict=True)
+        )
+
+    await session.commit()
+
+    _stats["rebuilds"] += 1
+    _stats["promoted"] += len(new_keys)
+    _stats["demoted"] += len(stale_ids)
+    return len(new_keys), len(stale_ids)
+
+
+async def run_verified_answers_job() -> None:
+    """Loop de background: reconstrói o índice a cada intervalo configurado."""
+    while True:
+        try:
+            async with AsyncSessionMaker() as session:
+                promoted, demoted = await rebuild_verified_answers(session)
+            if promoted or demoted:
+                logger.info(
+                    "Respostas verificadas — %d promovidas, %d removidas", promoted, demoted,
+                )
+        except Exception as exc:
+            logger.warning("Falha ao reconstruir respostas verificadas: %s", exc)
+
+        await asyncio.sleep(settings.VERIFIED_ANSWERS_REFRESH_SECONDS)
+
+
+async def remove_verified_answer(
+    session: AsyncSession,
+    tenant_id: str,
+    answer: str,
+    pair_hash: str | None = None,
+) -> None:
+    """Tira imediatamente do índice uma resposta que recebeu feedback negativo.
+
+    ``pair_hash`` (devolvido pelo ``/chat``) identifica o par mesmo quando o
+    usuário avaliou a versão reescrita.
+    """
+    match = VerifiedAnswer.answer == answer
+    if pair_hash:
+        match = or_(match, VerifiedAnswer.pair_hash == pair_hash)
+    await session.execute(
+        delete(VerifiedAnswer).where(VerifiedAnswer.tenant_id == tenant_id, match)
+    )
+    await session.commit()
+
+
+# ── Consulta (caminho rápido do chat) ──────────────────────────
+
+async def find_verified_answer(
+    session: AsyncSession,
+    tenant_id: str,
+    query_embedding: list[float],
+) -> VerifiedMatch | None:
+    """Retorna a resposta verificada mais próxima se passar do limiar."""
+    _stats["lookups"] += 1
+
+    distance = VerifiedAnswer.embedding.cosine_distance(query_embedding).label("distance")
+    stmt = (
+        select(VerifiedAnswer.pair_hash, VerifiedAnswer.question, VerifiedAnswer.answer, distance)
+        .where(VerifiedAnswer.tenant_id == tenant_id)
+        .order_by(distance.asc())
+        .limit(1)
+    )
+    row = (await session.execute(stmt)).first()
+    if row is None:
+        return None
+
+    similarity = 1.0 - float(row.distance)
+    if similarity < settings.VERIFIED_ANSWERS_SIMILARITY:
+        return None
+
+    _stats["hits"] += 1
+    return VerifiedMatch(
+        pair_hash=row.pair_hash, question=row.question, answer=row.answer, similarity=similarity,
+    )
+
+
+async def rephrase_verified_answer(tenant_id: str, answer: str, message: str) -> str:
+    """Adapta a resposta curada à pergunta atual com um modelo barato.
+
+    Desligado se ``VERIFIED_ANSWERS_REPHRASE_MODEL`` estiver vazio; em caso
+    de erro devolve a resposta curada original.
+    """
+    if not settings.VERIFIED_ANSWERS_REPHRASE_MODEL or not llm_gateway.configured:
+        return answer
+
+    try:
+        response = await llm_gateway.create_message(
+            tenant_id,
+            model=settings.VERIFIED_ANSWERS_REPHRASE_MODEL,
+            max_tokens=settings.ANTHROPIC_MAX_TOKENS,
+            system=(
+                "Reescreva a resposta abaixo para responder diretamente à pergunta "
+                "do usuário, em PT-BR e de forma concisa. Não adicione informações "
+                "que não estejam na resposta original."
+            ),
+            messages=[
+                {
+                    "role": "user",
+                    "content": f"Pergunta: {message}\n\nResposta verificada:\n{answer}",
+                }
+            ],
+        )
+    except Exception as exc:
+        logger.warning("Falha ao reescrever resposta verificada: %s", exc)
+        return answer
+
+    _stats["rephrased"] += 1
+    return message_text(response)
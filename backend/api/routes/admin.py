@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+
+from backend.core.dependencies import require_admin_token
+from backend.core.profiling import find_profile, list_profiles
+
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin_token)])
+
+
+@router.get("/profiles")
+async def get_profiles() -> list[dict[str, Any]]:
+    """Perfis gravados, do mais recente para o mais antigo."""
+    return list_profiles()
+
+
+@router.get("/profiles/{profile_id}", response_class=FileResponse)
+async def download_profile(profile_id: str) -> FileResponse:
+    path = find_profile(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    return FileResponse(path, media_type="application/json", filename=path.name)
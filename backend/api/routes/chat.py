@@ -1,13 +1,17 @@
 from __future__ import annotations
 
+from datetime import datetime, timezone
 from typing import Any, Dict, List, Literal
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel, Field
 
+from backend.agents.llm_gateway import LLMOverloadedError
 from backend.agents.orchestrator import orchestrator
-from backend.core.dependencies import get_db_session
-from backend.models.database import AsyncSession, Conversation, MessageRecord
+from backend.agents.screenshot import InvalidScreenshotError
+from backend.core.dependencies import get_read_session
+from backend.models.database import AsyncSession
+from backend.models.write_behind import ChatTurn, chat_persistence
 
 
 router = APIRouter(tags=["chat"])
@@ -35,13 +39,18 @@ class ChatRequest(BaseModel):
 
 class ChatResponse(BaseModel):
     response: str
+    verified_answer: str | None = Field(
+        default=None,
+        description="Identificador da resposta verificada usada; devolver no feedback",
+    )
 
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(
     payload: ChatRequest,
-    session: AsyncSession = Depends(get_db_session),
+    session: AsyncSession = Depends(get_read_session),
 ) -> ChatResponse:
+    received_at = datetime.now(timezone.utc)
     try:
         answer = await orchestrator.chat(
             session=session,
@@ -51,42 +60,33 @@ async def chat_endpoint(
             history=[h.model_dump() for h in payload.history],
             screenshot=payload.screenshot,
         )
+    except InvalidScreenshotError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc),
+        ) from exc
+    except LLMOverloadedError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(exc),
+            headers={"Retry-After": "5"},
+        ) from exc
     except RuntimeError as exc:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(exc),
         ) from exc
 
-    # ── Persist messages if conversation_id provided ──
+    # ── Persist messages if conversation_id provided (write-behind, batched) ──
     if payload.conversation_id:
-        try:
-            # Ensure conversation exists (create if not)
-            from sqlalchemy import select
-            conv_stmt = select(Conversation).where(Conversation.id == payload.conversation_id)
-            conv_result = await session.execute(conv_stmt)
-            if conv_result.scalar_one_or_none() is None:
-                conv = Conversation(id=payload.conversation_id, tenant_id=payload.tenant_id)
-                session.add(conv)
-
-            # Save user message
-            user_msg = MessageRecord(
+        await chat_persistence.enqueue(
+            ChatTurn(
                 conversation_id=payload.conversation_id,
-                role="user",
-                content=payload.message,
+                tenant_id=payload.tenant_id,
+                user_message=payload.message,
+                assistant_message=answer.text,
+                created_at=received_at,
             )
-            session.add(user_msg)
-
-            # Save assistant message
-            assistant_msg = MessageRecord(
-                conversation_id=payload.conversation_id,
-                role="assistant",
-                content=answer,
-            )
-            session.add(assistant_msg)
-
-            await session.commit()
-        except Exception:
-            # Don't fail the chat response if persistence fails
-            pass
+        )
 
-    return ChatResponse(response=answer)
+    return ChatResponse(response=answer.text, verified_answer=answer.verified_answer)
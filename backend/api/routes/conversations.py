@@ -3,12 +3,14 @@ from __future__ import annotations
 import uuid
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from pydantic import BaseModel, Field
-from sqlalchemy import select
+from sqlalchemy import select, true, tuple_
+from sqlalchemy.orm import aliased
 
-from backend.core.dependencies import get_db_session
-from backend.models.database import AsyncSession, Conversation, MessageRecord
+from backend.core.dependencies import get_db_session, get_read_session
+from backend.models.database import AsyncSession, AsyncSessionMaker, Conversation, MessageRecord
+from backend.models.replica import uses_replica
 
 
 router = APIRouter(prefix="/conversations", tags=["conversations"])
@@ -57,28 +59,79 @@ async def create_conversation(
 @router.get("/{conversation_id}/messages", response_model=List[MessageOut])
 async def get_messages(
     conversation_id: str,
-    session: AsyncSession = Depends(get_db_session),
+    response: Response,
+    before: int | None = Query(default=None, description="Mensagens anteriores a este id"),
+    after: int | None = Query(default=None, description="Mensagens posteriores a este id"),
+    limit: int = Query(default=50, ge=1, le=200),
+    session: AsyncSession = Depends(get_read_session),
 ) -> List[MessageOut]:
-    # Verify conversation exists
-    conv_stmt = select(Conversation).where(Conversation.id == conversation_id)
-    conv_result = await session.execute(conv_stmt)
-    if conv_result.scalar_one_or_none() is None:
-        raise HTTPException(status_code=404, detail="Conversa não encontrada")
+    """Página de mensagens em ordem cronológica (paginação por cursor).
+
+    Sem ``before``/``after`` devolve as ``limit`` mais recentes, para o widget
+    renderizar na hora; o id da primeira mensagem serve de ``before`` para
+    carregar turnos mais antigos. ``X-Has-More`` indica se há mais páginas
+    na direção pedida.
+    """
+    if before is not None and after is not None:
+        raise HTTPException(status_code=400, detail="Use before ou after, não ambos")
+
+    page = select(
+        MessageRecord.id,
+        MessageRecord.role,
+        MessageRecord.content,
+        MessageRecord.created_at,
+    ).where(MessageRecord.conversation_id == Conversation.id)
+
+    # Keyset em (created_at, id), coberto por ix_messages_conversation_created_id
+    cursor_id = after if after is not None else before
+    if cursor_id is not None:
+        cursor_msg = aliased(MessageRecord)
+        cursor_ts = (
+            select(cursor_msg.created_at)
+            .where(cursor_msg.id == cursor_id)
+            .scalar_subquery()
+        )
+        key = tuple_(MessageRecord.created_at, MessageRecord.id)
+        cursor_key = tuple_(cursor_ts, cursor_id)
+        page = page.where(key > cursor_key if after is not None else key < cursor_key)
+
+    if after is not None:
+        page = page.order_by(MessageRecord.created_at.asc(), MessageRecord.id.asc())
+    else:
+        page = page.order_by(MessageRecord.created_at.desc(), MessageRecord.id.desc())
+    page = page.limit(limit + 1).lateral("page")
 
+    # Existência da conversa + página numa única ida ao banco
     stmt = (
-        select(MessageRecord)
-        .where(MessageRecord.conversation_id == conversation_id)
-        .order_by(MessageRecord.created_at.asc())
+        select(Conversation.id, page.c.id, page.c.role, page.c.content, page.c.created_at)
+        .select_from(Conversation)
+        .outerjoin(page, true())
+        .where(Conversation.id == conversation_id)
     )
     result = await session.execute(stmt)
-    messages = result.scalars().all()
+    rows = result.all()
+    if not rows and uses_replica(session):
+        # Conversa recém-criada pode ainda não ter chegado à réplica
+        async with AsyncSessionMaker() as primary:
+            rows = (await primary.execute(stmt)).all()
+
+    if not rows:
+        raise HTTPException(status_code=404, detail="Conversa não encontrada")
+
+    messages = [row for row in rows if row[1] is not None]
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if after is None:
+        messages.reverse()
+
+    response.headers["X-Has-More"] = "true" if has_more else "false"
 
     return [
         MessageOut(
-            id=m.id,
-            role=m.role,
-            content=m.content,
-            created_at=str(m.created_at),
+            id=m[1],
+            role=m[2],
+            content=m[3],
+            created_at=str(m[4]),
         )
         for m in messages
     ]
@@ -5,6 +5,9 @@ from typing import Any, Dict, Literal
 from fastapi import APIRouter, Depends, status
 from pydantic import BaseModel, Field
 
+from backend.agents.answer_cache import answer_cache
+from backend.agents.feedback_learning import refresh_learning_section
+from backend.agents.verified_answers import remove_verified_answer
 from backend.core.dependencies import get_db_session
 from backend.models.database import AsyncSession, Feedback
 
@@ -18,6 +21,11 @@ class FeedbackRequest(BaseModel):
     response: str = Field(..., description="Resposta do agente")
     rating: Literal["positive", "negative"] = Field(..., description="Avaliação: positive ou negative")
     context: Dict[str, Any] | None = Field(default=None, description="Contexto adicional")
+    verified_answer: str | None = Field(
+        default=None,
+        max_length=32,
+        description="``verified_answer`` devolvido pelo /chat junto com a resposta",
+    )
 
 
 class FeedbackResponse(BaseModel):
@@ -36,9 +44,18 @@ async def submit_feedback(
         response=payload.response,
         rating=payload.rating,
         context=payload.context,
+        verified_pair_hash=payload.verified_answer,
     )
     session.add(feedback)
     await session.commit()
     await session.refresh(feedback)
 
+    if payload.rating == "negative":
+        answer_cache.invalidate_answer(payload.tenant_id, payload.response)
+        await remove_verified_answer(
+            session, payload.tenant_id, payload.response, payload.verified_answer,
+        )
+        # A seção de aprendizado só depende dos negativos
+        await refresh_learning_section(session, payload.tenant_id)
+
     return FeedbackResponse(status="ok", id=feedback.id)
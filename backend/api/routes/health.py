@@ -1,10 +1,20 @@
+from typing import Any
+
 from fastapi import APIRouter
 
+from backend.core.metrics import collect_metrics
+from backend.core.warmup import warmup_status
+
 
 router = APIRouter(tags=["health"])
 
 
 @router.get("/health")
 async def health_check() -> dict[str, str]:
-    return {"status": "ok"}
+    # Sem banco nem I/O: responde já no boot, enquanto o warmup roda
+    return {"status": "ok", "warmup": warmup_status()}
+
 
+@router.get("/metrics")
+async def metrics() -> dict[str, Any]:
+    return collect_metrics()
@@ -1,12 +1,32 @@
 from __future__ import annotations
 
+import asyncio
+import os
+import shutil
+import tempfile
+import uuid
+from pathlib import Path
+from typing import BinaryIO
+
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
-from pydantic import BaseModel, Field, HttpUrl
+from fastapi.responses import FileResponse, JSONResponse
+from pydantic import BaseModel, Field, HttpUrl, TypeAdapter, ValidationError
+from sqlalchemy import select
+from starlette.background import BackgroundTask
+
+from backend.core.admission import AdmissionRejected, admission
+from backend.core.config import get_settings
+from backend.core.dependencies import get_db_session, get_read_session, require_admin_token
+from backend.models.database import AsyncSession, AsyncSessionMaker, IngestBatchItem, OnboardingJob
+from backend.models.replica import uses_replica
+from backend.rag.batch_ingest import FILE_SUFFIXES, BatchItem, create_batch_job, run_batch_job
+from backend.rag.confluence import run_confluence_job
+from backend.rag.ingestor import IngestResult, ingest_url
+from backend.rag.pdf_pipeline import count_pdf_pages_async, ingest_pdf_file, run_pdf_ingest_job
+from backend.rag.snapshot import SNAPSHOT_SUFFIX, SnapshotError, export_snapshot, import_snapshot
 
-from backend.core.dependencies import get_db_session
-from backend.models.database import AsyncSession
-from backend.rag.ingestor import IngestResult, ingest_pdf, ingest_url
 
+settings = get_settings()
 
 router = APIRouter(prefix="/ingest", tags=["ingest"])
 
@@ -22,11 +42,75 @@ class IngestResponse(BaseModel):
     chunks_ingested: int
 
 
+class IngestJobResponse(BaseModel):
+    status: str
+    job_id: str
+
+
+class SnapshotImportResponse(BaseModel):
+    tenant_id: str
+    chunks_imported: int
+    chunks_replaced: int
+    seconds: float
+
+
+class IngestBatchItemStatus(BaseModel):
+    position: int
+    source: str
+    kind: str
+    status: str
+    chunks: int
+    error_message: str | None = None
+
+
+class IngestBatchStatusResponse(BaseModel):
+    job_id: str
+    tenant_id: str
+    status: str
+    items_total: int
+    items_processed: int
+    chunks_total: int
+    percent: int
+    error_message: str | None = None
+    items: list[IngestBatchItemStatus]
+
+
+class IngestConfluenceRequest(BaseModel):
+    tenant_id: str = Field(..., description="Identificador do tenant")
+    space_key: str = Field(..., description="Chave do espaço no Confluence, ex: FARMA")
+    prune: bool = Field(default=True, description="Remove chunks de páginas que saíram do espaço")
+
+
+_url_adapter = TypeAdapter(HttpUrl)
+
+
+def _spool_to_disk(src: BinaryIO, suffix: str = ".pdf") -> tuple[str, int]:
+    """Copia o upload para um arquivo temporário em blocos; retorna (caminho, bytes)."""
+    src.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as dst:
+        shutil.copyfileobj(src, dst, length=1024 * 1024)
+        return dst.name, dst.tell()
+
+
+async def _charge_pdf_pages(tenant_id: str, path: str) -> int:
+    """Conta as páginas do PDF e cobra ``ingest_pages``; PDF ilegível vira 400."""
+    try:
+        pages = await count_pdf_pages_async(path)
+    except Exception as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"PDF inválido: {exc}",
+        ) from exc
+    await admission.acquire(tenant_id, "ingest_pages", pages)
+    return pages
+
+
 @router.post("/url", response_model=IngestResponse)
 async def ingest_url_endpoint(
     payload: IngestUrlRequest,
     session: AsyncSession = Depends(get_db_session),
 ) -> IngestResponse:
+    await admission.acquire(payload.tenant_id, "ingest_pages")
     try:
         result: IngestResult = await ingest_url(
             session=session,
@@ -42,37 +126,298 @@ async def ingest_url_endpoint(
     return IngestResponse(**result.__dict__)
 
 
-@router.post("/pdf", response_model=IngestResponse)
+@router.post(
+    "/pdf",
+    response_model=IngestResponse | IngestJobResponse,
+    responses={status.HTTP_202_ACCEPTED: {"model": IngestJobResponse}},
+)
 async def ingest_pdf_endpoint(
     tenant_id: str = Form(...),
     file: UploadFile = File(...),
     session: AsyncSession = Depends(get_db_session),
-) -> IngestResponse:
+) -> IngestResponse | JSONResponse:
+    """Ingere um PDF; arquivos grandes viram job (202 + job_id) com progresso."""
     if file.content_type not in {"application/pdf", "application/octet-stream"}:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Envie um arquivo PDF (content-type application/pdf).",
         )
 
-    pdf_bytes = await file.read()
-    if not pdf_bytes:
+    loop = asyncio.get_running_loop()
+    path, size = await loop.run_in_executor(None, _spool_to_disk, file.file)
+    if not size:
+        os.unlink(path)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="PDF vazio.",
         )
 
+    # Páginas contadas e cobradas antes de responder: cota esgotada vira 429
+    # com Retry-After, não um job que falha depois do 202
     try:
-        result: IngestResult = await ingest_pdf(
-            session=session,
+        total_pages = await _charge_pdf_pages(tenant_id, path)
+    except BaseException:
+        os.unlink(path)
+        raise
+
+    if size > settings.INGEST_PDF_ASYNC_BYTES:
+        try:
+            await admission.reserve_job_slot(session, tenant_id)
+        except AdmissionRejected:
+            admission.release(tenant_id, "ingest_pages", total_pages)
+            os.unlink(path)
+            raise
+        job_id = str(uuid.uuid4())
+        session.add(
+            OnboardingJob(
+                id=job_id,
+                tenant_id=tenant_id,
+                root_url=file.filename or "upload.pdf",
+                product_name=f"PDF: {file.filename or 'upload.pdf'}"[:256],
+                status="pending",
+                pages_found=0,
+                pages_processed=0,
+                chunks_total=0,
+            )
+        )
+        await session.commit()
+
+        asyncio.create_task(
+            run_pdf_ingest_job(
+                job_id=job_id,
+                tenant_id=tenant_id,
+                path=path,
+                source_url=file.filename,
+                total_pages=total_pages,
+            )
+        )
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=IngestJobResponse(status="started", job_id=job_id).model_dump(),
+        )
+
+    try:
+        result: IngestResult = await ingest_pdf_file(
             tenant_id=tenant_id,
-            pdf_bytes=pdf_bytes,
+            path=path,
             source_url=file.filename,
+            total_pages=total_pages,
         )
     except Exception as exc:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Falha ao ingerir PDF: {exc}",
         ) from exc
+    finally:
+        os.unlink(path)
 
     return IngestResponse(**result.__dict__)
 
+
+@router.post("/batch", response_model=IngestJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def ingest_batch_endpoint(
+    tenant_id: str = Form(...),
+    urls: list[str] = Form(default=[]),
+    files: list[UploadFile] = File(default=[]),
+    session: AsyncSession = Depends(get_db_session),
+) -> IngestJobResponse:
+    """Ingere várias URLs e/ou arquivos como um job (progresso em ``GET /ingest/batch/{job_id}``)."""
+    total = len(urls) + len(files)
+    if not total:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Envie ao menos uma URL ou arquivo.",
+        )
+    if total > settings.INGEST_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo de {settings.INGEST_BATCH_MAX_ITEMS} itens por lote.",
+        )
+
+    items: list[BatchItem] = []
+    for url in urls:
+        try:
+            _url_adapter.validate_python(url)
+        except ValidationError as exc:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"URL inválida: {url}",
+            ) from exc
+        items.append(BatchItem(position=len(items), source=url, kind="url"))
+
+    for upload in files:
+        name = upload.filename or "upload"
+        suffix = Path(name).suffix.lower()
+        if suffix not in FILE_SUFFIXES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Tipo de arquivo não suportado: {name}",
+            )
+        items.append(BatchItem(position=len(items), source=name, kind="file"))
+
+    # Arquivos só vão para o disco depois de validar o lote inteiro
+    loop = asyncio.get_running_loop()
+    try:
+        for item, upload in zip(items[len(urls):], files):
+            item.path, _ = await loop.run_in_executor(None, _spool_to_disk, upload.file, item.suffix)
+            if item.suffix == ".pdf":
+                try:
+                    item.pages = await count_pdf_pages_async(item.path)
+                except Exception:
+                    pass  # PDF ilegível falha como item do lote, não o lote inteiro
+
+        # Um item por URL/arquivo, PDFs por página — cobrado antes do 202
+        pages = sum(item.pages or 1 for item in items)
+        await admission.acquire(tenant_id, "ingest_pages", pages)
+        try:
+            await admission.reserve_job_slot(session, tenant_id)
+        except AdmissionRejected:
+            admission.release(tenant_id, "ingest_pages", pages)
+            raise
+    except BaseException:
+        for item in items:
+            if item.path:
+                os.unlink(item.path)
+        raise
+
+    job_id = await create_batch_job(session, tenant_id=tenant_id, items=items)
+    asyncio.create_task(run_batch_job(job_id, tenant_id, items))
+    return IngestJobResponse(status="started", job_id=job_id)
+
+
+@router.get("/batch/{job_id}", response_model=IngestBatchStatusResponse)
+async def get_batch_status(
+    job_id: str,
+    session: AsyncSession = Depends(get_read_session),
+) -> IngestBatchStatusResponse:
+    job = await session.get(OnboardingJob, job_id)
+    if job is None and uses_replica(session):
+        # Job recém-disparado pode ainda não ter chegado à réplica
+        async with AsyncSessionMaker() as primary:
+            return await get_batch_status(job_id, primary)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+
+    result = await session.execute(
+        select(IngestBatchItem)
+        .where(IngestBatchItem.job_id == job_id)
+        .order_by(IngestBatchItem.position)
+    )
+    items = result.scalars().all()
+
+    percent = 0
+    if job.pages_found > 0:
+        percent = min(100, int((job.pages_processed / job.pages_found) * 100))
+
+    return IngestBatchStatusResponse(
+        job_id=job.id,
+        tenant_id=job.tenant_id,
+        status=job.status,
+        items_total=job.pages_found,
+        items_processed=job.pages_processed,
+        chunks_total=job.chunks_total,
+        percent=percent,
+        error_message=job.error_message,
+        items=[
+            IngestBatchItemStatus(
+                position=i.position,
+                source=i.source,
+                kind=i.kind,
+                status=i.status,
+                chunks=i.chunks,
+                error_message=i.error_message,
+            )
+            for i in items
+        ],
+    )
+
+
+@router.post("/confluence", response_model=IngestJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def ingest_confluence_endpoint(
+    payload: IngestConfluenceRequest,
+    session: AsyncSession = Depends(get_db_session),
+) -> IngestJobResponse:
+    """Sincroniza um espaço do Confluence (só páginas novas/alteradas) como job."""
+    if not settings.CONFLUENCE_BASE_URL:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="CONFLUENCE_BASE_URL não configurada.",
+        )
+
+    await admission.reserve_job_slot(session, payload.tenant_id)
+    job_id = str(uuid.uuid4())
+    session.add(
+        OnboardingJob(
+            id=job_id,
+            tenant_id=payload.tenant_id,
+            root_url=f"{settings.CONFLUENCE_BASE_URL}/display/{payload.space_key}",
+            product_name=f"Confluence: {payload.space_key}",
+            status="pending",
+            pages_found=0,
+            pages_processed=0,
+            chunks_total=0,
+        )
+    )
+    await session.commit()
+
+    asyncio.create_task(
+        run_confluence_job(job_id, payload.tenant_id, payload.space_key, payload.prune)
+    )
+    return IngestJobResponse(status="started", job_id=job_id)
+
+
+@router.get(
+    "/snapshot/{tenant_id}",
+    response_class=FileResponse,
+    dependencies=[Depends(require_admin_token)],
+)
+async def export_snapshot_endpoint(tenant_id: str) -> FileResponse:
+    """Baixa o corpus do tenant (textos, metadados e vetores) como snapshot.
+
+    Operação administrativa (header ``X-Admin-Token``), fora das cotas por tenant.
+    """
+    fd, path = tempfile.mkstemp(suffix=SNAPSHOT_SUFFIX)
+    os.close(fd)
+    try:
+        await export_snapshot(tenant_id, path)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return FileResponse(
+        path,
+        media_type="application/zip",
+        filename=f"{tenant_id}{SNAPSHOT_SUFFIX}",
+        background=BackgroundTask(os.unlink, path),
+    )
+
+
+@router.post(
+    "/snapshot",
+    response_model=SnapshotImportResponse,
+    dependencies=[Depends(require_admin_token)],
+)
+async def import_snapshot_endpoint(
+    tenant_id: str = Form(...),
+    replace: bool = Form(default=False),
+    file: UploadFile = File(...),
+) -> SnapshotImportResponse:
+    """Carrega um snapshot no tenant via COPY, sem chamar o provedor de embeddings.
+
+    Operação administrativa (header ``X-Admin-Token``): com ``replace`` apaga
+    o corpus atual do tenant.
+    """
+    loop = asyncio.get_running_loop()
+    path, _ = await loop.run_in_executor(None, _spool_to_disk, file.file, SNAPSHOT_SUFFIX)
+    try:
+        result = await import_snapshot(path, tenant_id=tenant_id, replace=replace)
+    except SnapshotError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    finally:
+        os.unlink(path)
+
+    return SnapshotImportResponse(
+        tenant_id=result.tenant_id,
+        chunks_imported=result.rows,
+        chunks_replaced=result.replaced,
+        seconds=round(result.seconds, 3),
+    )
@@ -8,8 +8,10 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel, Field
 from sqlalchemy import select
 
-from backend.core.dependencies import get_db_session
-from backend.models.database import AsyncSession, OnboardingJob
+from backend.core.admission import admission
+from backend.core.dependencies import get_db_session, get_read_session
+from backend.models.database import AsyncSession, AsyncSessionMaker, OnboardingJob
+from backend.models.replica import uses_replica
 from backend.rag.crawler import run_onboarding
 
 
@@ -50,6 +52,8 @@ async def start_onboarding(
     payload: OnboardingStartRequest,
     session: AsyncSession = Depends(get_db_session),
 ) -> OnboardingStartResponse:
+    await admission.reserve_job_slot(session, payload.tenant_id)
+    await admission.acquire(payload.tenant_id, "ingest_pages", payload.max_pages)
     job_id = str(uuid.uuid4())
 
     job = OnboardingJob(
@@ -83,11 +87,15 @@ async def start_onboarding(
 @router.get("/status/{job_id}", response_model=OnboardingStatusResponse)
 async def get_onboarding_status(
     job_id: str,
-    session: AsyncSession = Depends(get_db_session),
+    session: AsyncSession = Depends(get_read_session),
 ) -> OnboardingStatusResponse:
     stmt = select(OnboardingJob).where(OnboardingJob.id == job_id)
     result = await session.execute(stmt)
     job = result.scalar_one_or_none()
+    if job is None and uses_replica(session):
+        # Job recém-disparado pode ainda não ter chegado à réplica
+        async with AsyncSessionMaker() as primary:
+            job = await primary.get(OnboardingJob, job_id)
 
     if job is None:
         raise HTTPException(status_code=404, detail="Job não encontrado")
@@ -0,0 +1,450 @@
+"""Controle de admissão por tenant: token buckets e teto de jobs de ingestão.
+
+Três baldes por tenant (capacidade = cota do período, reposição contínua):
+
+- ``requests``: POSTs em ``/chat``, ``/feedback``, ``/conversations``,
+  ``/ingest`` e ``/onboarding``, cobrados pelo :class:`AdmissionMiddleware`.
+  O tenant é o mesmo que a rota atende — ``tenant_id`` do corpo JSON ou da
+  query; o header ``X-Tenant-ID`` só vale para uploads multipart (que sem
+  header só passam pelos outros limites) e, se divergir do corpo/query, o
+  pedido é recusado com 400;
+- ``llm_tokens``: reservado antes de cada chamada ao LLM (``max_tokens`` +
+  estimativa da entrada) e acertado com o ``usage`` real da resposta;
+- ``ingest_pages``: páginas/itens de ingestão — o onboarding reserva
+  ``max_pages`` e devolve o que o crawl não encontrou; PDFs são contados e
+  cobrados na rota, antes do 202, para a rejeição sair como 429.
+
+Além disso, no máximo ``max_concurrent_jobs`` jobs de ingestão (onboarding,
+lote, PDF grande, Confluence) pendentes/rodando por tenant, contados em
+``onboarding_jobs`` sob advisory lock — vale entre workers e instâncias.
+
+Limites: ``ADMISSION_*`` (padrão de todos) e ``ADMISSION_TENANT_LIMITS``
+(JSON ``{"tenant": {"requests_per_minute": 30, ...}}``).
+
+Estado dos baldes: com ``ADMISSION_SHARED=false`` cada processo tem os
+seus. Com ``true`` eles vivem em ``tenant_rate_buckets``: cada processo
+retira um lote (``ADMISSION_LEASE_FRACTION`` da capacidade) numa única
+consulta e consome localmente até acabar ou expirar — o caminho comum não
+toca o banco. Se o banco falhar, o processo cai para o balde local.
+O ``tenant_id`` vem do cliente, então os baldes em memória são um LRU de
+até ``_MAX_TRACKED_BUCKETS`` entradas: o menos usado sai primeiro (e
+normalmente já estaria cheio de novo).
+
+Rejeições levantam :class:`AdmissionRejected`, respondida como 429 com
+``Retry-After``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import json
+import logging
+import math
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, fields, replace
+from datetime import datetime, timedelta, timezone
+from typing import Any
+from urllib.parse import parse_qs
+
+from fastapi.responses import JSONResponse
+from sqlalchemy import func, select, text
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.core.config import get_settings
+from backend.core.metrics import register_metrics_source
+from backend.models.database import AsyncSession, AsyncSessionMaker, OnboardingJob
+
+
+settings = get_settings()
+logger = logging.getLogger("copiloto-farma.admission")
+
+KINDS = ("requests", "llm_tokens", "ingest_pages")
+GUARDED_PREFIXES = ("/chat", "/feedback", "/conversations", "/ingest", "/onboarding")
+JOB_STATUSES_ACTIVE = ("pending", "running")
+
+_JSON_PARSE_MAX_BYTES = 256 * 1024
+_MAX_TRACKED_BUCKETS = 10_000
+_TENANT_FIELD = re.compile(rb'"tenant_id"\s*:\s*"([^"\\]{1,64})"')
+
+
+@dataclass(slots=True, frozen=True)
+class TenantLimits:
+    requests_per_minute: float
+    llm_tokens_per_minute: float
+    ingest_pages_per_hour: float
+    max_concurrent_jobs: int
+
+    def bucket(self, kind: str) -> tuple[float, float]:
+        """``(capacidade, reposição por segundo)`` do balde."""
+        if kind == "requests":
+            return self.requests_per_minute, self.requests_per_minute / 60
+        if kind == "llm_tokens":
+            return self.llm_tokens_per_minute, self.llm_tokens_per_minute / 60
+        return self.ingest_pages_per_hour, self.ingest_pages_per_hour / 3600
+
+
+class AdmissionRejected(Exception):
+    """Cota do tenant esgotada; ``retry_after`` em segundos."""
+
+    def __init__(self, tenant_id: str, kind: str, retry_after: float) -> None:
+        self.tenant_id = tenant_id
+        self.kind = kind
+        self.retry_after = max(1.0, retry_after)
+        labels = {
+            "requests": "requisições",
+            "llm_tokens": "uso do assistente",
+            "ingest_pages": "páginas de ingestão",
+            "jobs": "jobs de ingestão simultâneos",
+        }
+        super().__init__(
+            f"Limite de {labels.get(kind, kind)} atingido para este tenant. "
+            f"Tente novamente em {math.ceil(self.retry_after)}s."
+        )
+
+
+def rejection_response(exc: AdmissionRejected) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "limit": exc.kind},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _overrides() -> dict[str, dict[str, Any]]:
+    if not settings.ADMISSION_TENANT_LIMITS:
+        return {}
+    try:
+        data = json.loads(settings.ADMISSION_TENANT_LIMITS)
+    except json.JSONDecodeError as exc:
+        logger.error("ADMISSION_TENANT_LIMITS inválido (%s) — usando os limites padrão", exc)
+        return {}
+    known = {f.name for f in fields(TenantLimits)}
+    return {
+        tenant: {k: v for k, v in values.items() if k in known}
+        for tenant, values in data.items()
+        if isinstance(values, dict)
+    }
+
+
+@dataclass(slots=True)
+class _Bucket:
+    tokens: float
+    updated: float
+    lease_expires: float = 0.0  # modo compartilhado: tokens locais são um lote retirado do banco
+
+
+_WITHDRAW_SQL = text(
+    """
+    WITH current AS (
+        SELECT LEAST(:capacity, tokens + EXTRACT(EPOCH FROM now() - updated_at) * :rate) AS available
+        FROM tenant_rate_buckets
+        WHERE tenant_id = :tenant_id AND kind = :kind
+        FOR UPDATE
+    ), granted AS (
+        SELECT available,
+               CASE WHEN available >= :need THEN LEAST(available, :want) ELSE 0 END AS amount
+        FROM current
+    )
+    UPDATE tenant_rate_buckets b
+    SET tokens = g.available - g.amount, updated_at = now()
+    FROM granted g
+    WHERE b.tenant_id = :tenant_id AND b.kind = :kind
+    RETURNING g.amount, g.available
+    """
+)
+
+_ENSURE_BUCKET_SQL = text(
+    """
+    INSERT INTO tenant_rate_buckets (tenant_id, kind, tokens, updated_at)
+    VALUES (:tenant_id, :kind, :capacity, now())
+    ON CONFLICT (tenant_id, kind) DO NOTHING
+    """
+)
+
+
+class AdmissionController:
+    def __init__(self) -> None:
+        self._buckets: OrderedDict[tuple[str, str], _Bucket] = OrderedDict()
+        self._locks: dict[tuple[str, str], asyncio.Lock] = {}
+        self.evicted = 0
+        self._db_failing_until = 0.0
+        self.admitted = {kind: 0 for kind in KINDS}
+        self.rejected = {kind: 0 for kind in (*KINDS, "jobs")}
+        self.local_hits = 0
+        self.db_withdrawals = 0
+        self.db_errors = 0
+
+    def limits_for(self, tenant_id: str) -> TenantLimits:
+        defaults = TenantLimits(
+            requests_per_minute=settings.ADMISSION_REQUESTS_PER_MINUTE,
+            llm_tokens_per_minute=settings.ADMISSION_LLM_TOKENS_PER_MINUTE,
+            ingest_pages_per_hour=settings.ADMISSION_INGEST_PAGES_PER_HOUR,
+            max_concurrent_jobs=settings.ADMISSION_MAX_CONCURRENT_JOBS,
+        )
+        override = _overrides().get(tenant_id)
+        return replace(defaults, **override) if override else defaults
+
+    # ── Baldes ─────────────────────────────────────────────────
+
+    def _reject(self, tenant_id: str, kind: str, retry_after: float) -> AdmissionRejected:
+        self.rejected[kind] += 1
+        return AdmissionRejected(tenant_id, kind, retry_after)
+
+    def _store(self, key: tuple[str, str], bucket: _Bucket) -> _Bucket:
+        self._buckets[key] = bucket
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > _MAX_TRACKED_BUCKETS:
+            old, _ = self._buckets.popitem(last=False)
+            self.evicted += 1
+            lock = self._locks.get(old)
+            if lock is not None and not lock.locked():
+                del self._locks[old]
+        return bucket
+
+    def _lock(self, key: tuple[str, str]) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            if len(self._locks) >= _MAX_TRACKED_BUCKETS:
+                # Locks de retiradas que terminaram (inclusive rejeitadas, sem balde)
+                self._locks = {k: v for k, v in self._locks.items() if v.locked()}
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    def _take_local(self, key: tuple[str, str], amount: float, need: float, capacity: float, rate: float) -> float:
+        """Balde só deste processo; retorna 0 se admitiu ou a espera sugerida."""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._store(key, _Bucket(tokens=capacity, updated=now))
+        else:
+            self._buckets.move_to_end(key)
+        bucket.tokens = min(capacity, bucket.tokens + (now - bucket.updated) * rate)
+        bucket.updated = now
+        if bucket.tokens >= need:
+            bucket.tokens -= amount
+            return 0.0
+        return (need - bucket.tokens) / rate if rate > 0 else 3600.0
+
+    def _take_lease(self, key: tuple[str, str], amount: float, need: float) -> bool:
+        bucket = self._buckets.get(key)
+        if bucket is not None and bucket.lease_expires > time.monotonic() and bucket.tokens >= need:
+            bucket.tokens -= amount
+            self._buckets.move_to_end(key)
+            self.local_hits += 1
+            return True
+        return False
+
+    async def _withdraw(
+        self, tenant_id: str, kind: str, *, capacity: float, rate: float, need: float, want: float,
+    ) -> tuple[float, float]:
+        params = {
+            "tenant_id": tenant_id, "kind": kind, "capacity": capacity,
+            "rate": rate, "need": need, "want": want,
+        }
+        async with AsyncSessionMaker() as session:
+            async with session.begin():
+                await session.execute(_ENSURE_BUCKET_SQL, params)
+                row = (await session.execute(_WITHDRAW_SQL, params)).one()
+        self.db_withdrawals += 1
+        return float(row.amount), float(row.available)
+
+    async def acquire(self, tenant_id: str, kind: str, amount: float = 1) -> None:
+        """Consome ``amount`` do balde ou levanta :class:`AdmissionRejected`."""
+        if not settings.ADMISSION_ENABLED or amount <= 0:
+            return
+        capacity, rate = self.limits_for(tenant_id).bucket(kind)
+        if capacity <= 0:
+            return  # 0 = sem limite
+        key = (tenant_id, kind)
+        need = min(amount, capacity)  # um pedido maior que a cota passa com o balde cheio
+
+        if not settings.ADMISSION_SHARED or time.monotonic() < self._db_failing_until:
+            wait = self._take_local(key, amount, need, capacity, rate)
+            if wait:
+                raise self._reject(tenant_id, kind, wait)
+            self.admitted[kind] += 1
+            return
+
+        if self._take_lease(key, amount, need):
+            self.admitted[kind] += 1
+            return
+
+        async with self._lock(key):
+            if self._take_lease(key, amount, need):
+                self.admitted[kind] += 1
+                return
+            want = max(need, capacity * settings.ADMISSION_LEASE_FRACTION)
+            try:
+                granted, available = await self._withdraw(
+                    tenant_id, kind, capacity=capacity, rate=rate, need=need, want=want,
+                )
+            except Exception as exc:
+                # Banco fora: segue com baldes locais por um tempo em vez de derrubar o serviço
+                self.db_errors += 1
+                self._db_failing_until = time.monotonic() + 30
+                logger.warning("Admissão: estado compartilhado indisponível (%s) — usando baldes locais", exc)
+                self._buckets.pop(key, None)
+                wait = self._take_local(key, amount, need, capacity, rate)
+                if wait:
+                    raise self._reject(tenant_id, kind, wait) from exc
+                self.admitted[kind] += 1
+                return
+
+            if granted <= 0:
+                raise self._reject(tenant_id, kind, (need - available) / rate if rate > 0 else 3600.0)
+            # Lote anterior expirado é descartado (erra para o lado conservador)
+            self._store(key, _Bucket(
+                tokens=granted - amount,
+                updated=time.monotonic(),
+                lease_expires=time.monotonic() + settings.ADMISSION_LEASE_SECONDS,
+            ))
+            self.admitted[kind] += 1
+
+    def release(self, tenant_id: str, kind: str, amount: float) -> None:
+        """Devolve ``amount`` ao balde local (negativo = cobrança extra, ex.: usage acima da estimativa)."""
+        if not settings.ADMISSION_ENABLED or not amount:
+            return
+        bucket = self._buckets.get((tenant_id, kind))
+        if bucket is None:
+            return
+        capacity, _ = self.limits_for(tenant_id).bucket(kind)
+        bucket.tokens = min(capacity, bucket.tokens + amount)
+
+    # ── Jobs de ingestão ───────────────────────────────────────
+
+    async def reserve_job_slot(self, session: AsyncSession, tenant_id: str) -> None:
+        """Confere o teto de jobs ativos do tenant.
+
+        O advisory lock fica preso na transação de ``session`` até o commit
+        que grava o novo job, então dois pedidos simultâneos (mesmo em
+        workers diferentes) não passam juntos pelo mesmo último slot.
+        """
+        limit = self.limits_for(tenant_id).max_concurrent_jobs
+        if not settings.ADMISSION_ENABLED or limit <= 0:
+            return
+        await session.execute(
+            text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"admission-jobs:{tenant_id}"}
+        )
+        active = await session.scalar(
+            select(func.count())
+            .select_from(OnboardingJob)
+            .where(
+                OnboardingJob.tenant_id == tenant_id,
+                OnboardingJob.status.in_(JOB_STATUSES_ACTIVE),
+                # Jobs de um processo que morreu ficam "running" para sempre
+                OnboardingJob.created_at
+                > datetime.now(timezone.utc) - timedelta(seconds=settings.ADMISSION_JOB_STALE_SECONDS),
+            )
+        )
+        if active >= limit:
+            raise self._reject(tenant_id, "jobs", settings.ADMISSION_JOB_RETRY_AFTER_SECONDS)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": settings.ADMISSION_ENABLED,
+            "shared": settings.ADMISSION_SHARED,
+            "admitted": dict(self.admitted),
+            "rejected": dict(self.rejected),
+            "local_hits": self.local_hits,
+            "db_withdrawals": self.db_withdrawals,
+            "db_errors": self.db_errors,
+            "tracked_buckets": len(self._buckets),
+            "evicted_buckets": self.evicted,
+        }
+
+
+admission = AdmissionController()
+
+register_metrics_source("admission", admission.stats)
+
+
+# ── Middleware ─────────────────────────────────────────────────
+
+
+def _tenant_from_body(body: bytes) -> str | None:
+    if len(body) <= _JSON_PARSE_MAX_BYTES:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return None
+        tenant = data.get("tenant_id") if isinstance(data, dict) else None
+        return tenant if isinstance(tenant, str) and tenant else None
+    # Corpos grandes (screenshot em base64): só procura o campo
+    match = _TENANT_FIELD.search(body)
+    return match.group(1).decode("utf-8", "replace") if match else None
+
+
+class AdmissionMiddleware:
+    """Cobra o balde ``requests`` do tenant nos POSTs das rotas protegidas.
+
+    O corpo JSON é lido aqui para achar o ``tenant_id`` e reentregue intacto
+    à rota.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or not settings.ADMISSION_ENABLED
+            or not scope["path"].startswith(GUARDED_PREFIXES)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        # Cobra o tenant que a rota vai atender: o header é só um fallback,
+        # senão um valor qualquer nele escaparia do balde do tenant real
+        headers = Headers(scope=scope)
+        tenant_id: str | None = None
+        if headers.get("content-type", "").startswith("application/json"):
+            body, receive = await _buffer_body(receive)
+            tenant_id = _tenant_from_body(body)
+        if not tenant_id:
+            query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+            tenant_id = (query.get("tenant_id") or [None])[0]
+
+        header_tenant = headers.get("x-tenant-id")
+        if tenant_id and header_tenant and header_tenant != tenant_id:
+            await JSONResponse(
+                status_code=400,
+                content={"detail": "X-Tenant-ID difere do tenant_id da requisição."},
+            )(scope, receive, send)
+            return
+        tenant_id = tenant_id or header_tenant
+
+        if tenant_id:
+            try:
+                await admission.acquire(tenant_id, "requests")
+            except AdmissionRejected as exc:
+                await rejection_response(exc)(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+async def _buffer_body(receive: Receive) -> tuple[bytes, Receive]:
+    chunks: list[bytes] = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    body = b"".join(chunks)
+    replayed = False
+
+    async def replay() -> Message:
+        nonlocal replayed
+        if not replayed:
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return body, replay
@@ -11,6 +11,41 @@ class Settings(BaseSettings):
     ENV: Literal["dev", "prod"] = "dev"
     LOG_LEVEL: str = "INFO"
 
+    # Boot — com FAST_BOOT o startup não aplica o schema (rodar
+    # `python -m backend.models.migrate` no deploy) e só confere em background
+    FAST_BOOT: bool = False
+    WARMUP_ON_STARTUP: bool = True  # importa SDKs e cria clientes logo após o boot
+
+    # Admissão por tenant (backend/core/admission.py) — 0 desliga o limite
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_SHARED: bool = False  # baldes em tenant_rate_buckets, compartilhados entre workers
+    ADMISSION_REQUESTS_PER_MINUTE: float = 120
+    ADMISSION_LLM_TOKENS_PER_MINUTE: float = 200_000
+    ADMISSION_INGEST_PAGES_PER_HOUR: float = 2_000
+    ADMISSION_MAX_CONCURRENT_JOBS: int = 2
+    ADMISSION_TENANT_LIMITS: str = ""  # JSON: {"tenant": {"requests_per_minute": 30, ...}}
+    ADMISSION_LEASE_FRACTION: float = 0.1  # fração da cota retirada do banco por vez
+    ADMISSION_LEASE_SECONDS: float = 5.0
+    ADMISSION_JOB_STALE_SECONDS: int = 6 * 3600  # jobs ativos mais velhos não contam no teto
+    ADMISSION_JOB_RETRY_AFTER_SECONDS: float = 30
+
+    # Profiling por requisição (backend/core/profiling.py): header X-Profile-Token
+    # com este valor (vazio = desligado) e/ou amostragem
+    PROFILING_TOKEN: str = ""
+    PROFILING_SAMPLE_RATE: float = 0.0  # fração das requisições perfiladas (0 = nenhuma)
+    PROFILING_DIR: str = "data/profiles"
+    PROFILING_MAX_FILES: int = 200
+
+    # Rotas administrativas (snapshot do corpus, /admin/profiles): header
+    # X-Admin-Token com este valor; vazio = rotas fechadas (snapshot: use a CLI)
+    ADMIN_TOKEN: str = ""
+
+    # Watchdog do event loop (backend/core/loop_monitor.py)
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL_MS: float = 20
+    LOOP_LAG_THRESHOLD_MS: float = 100  # acima disso a pilha de quem bloqueou é capturada
+    LOOP_MONITOR_MAX_STALLS: int = 100
+
     # Database — accepts a full DATABASE_URL (Render) or individual vars (local dev)
     DATABASE_URL: str | None = None
     POSTGRES_HOST: str = "localhost"
@@ -22,18 +57,101 @@ class Settings(BaseSettings):
     DB_POOL_SIZE: int = 5
     DB_MAX_OVERFLOW: int = 10
 
+    # Réplica de leitura (retrieval, histórico, status de jobs); vazio = tudo no primário
+    DATABASE_READ_URL: str | None = None
+    DB_READ_POOL_SIZE: int = 5
+    DB_READ_MAX_OVERFLOW: int = 10
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5.0  # acima disso as leituras voltam ao primário
+    DB_REPLICA_CHECK_SECONDS: float = 2.0
+
+    # Persistência write-behind das mensagens do chat
+    PERSIST_QUEUE_MAX: int = 5000
+    PERSIST_BATCH_SIZE: int = 200
+    PERSIST_FLUSH_INTERVAL_SECONDS: float = 0.5
+    PERSIST_ENQUEUE_TIMEOUT_SECONDS: float = 0.2
+    PERSIST_SPILL_PATH: str = "data/chat_spill.jsonl"
+
+    # Particionamento mensal de messages/feedback e retenção (0 = manter tudo).
+    # A retenção só remove partições com PARTITION_ARCHIVE_DIR configurado,
+    # que deve ser um volume durável (não o disco efêmero do container).
+    PARTITION_MONTHS_AHEAD: int = 3
+    PARTITION_MAINTENANCE_INTERVAL_SECONDS: int = 86400
+    PARTITION_ARCHIVE_DIR: str = ""
+    RETENTION_MONTHS_MESSAGES: int = 0
+    RETENTION_MONTHS_FEEDBACK: int = 0
+
     # Anthropic / LLM
     ANTHROPIC_API_KEY: str | None = None
     ANTHROPIC_MODEL: str = "claude-sonnet-4-6"
     ANTHROPIC_MAX_TOKENS: int = 800
+    ANTHROPIC_BASE_URL: str | None = None  # vazio = API oficial; ex: stub do teste de carga
+
+    # LLM gateway — cliente compartilhado e limites de concorrência
+    LLM_MAX_IN_FLIGHT: int = 16
+    LLM_MAX_IN_FLIGHT_PER_TENANT: int = 4
+    LLM_QUEUE_TIMEOUT_SECONDS: float = 20.0
+    LLM_REQUEST_TIMEOUT_SECONDS: float = 60.0
+    LLM_HTTP_MAX_CONNECTIONS: int = 32
+    LLM_HTTP_KEEPALIVE_SECONDS: float = 120.0
+
+    # Screenshots (pré-processamento antes do modelo de visão)
+    SCREENSHOT_MAX_EDGE: int = 1568
+    SCREENSHOT_FORMAT: Literal["webp", "jpeg", "png"] = "webp"
+    SCREENSHOT_QUALITY: int = 85
+    SCREENSHOT_WORKERS: int = 2
+    # Reaproveitar a descrição de uma tela já analisada (mesma URL e hash) em vez
+    # de reenviar a imagem; desligado por padrão — o hash não vê dados diferentes
+    # num mesmo layout
+    SCREENSHOT_DESCRIPTION_REUSE: bool = False
+    SCREENSHOT_PHASH_MAX_DISTANCE: int = 0  # bits de diferença (de 256) para considerar a mesma tela
+    SCREENSHOT_DESCRIPTION_CACHE_SIZE: int = 200  # por tenant
 
     # RAG / Embeddings
     EMBEDDING_DIM: int = 1024
     RAG_TOP_K: int = 5
     RAG_MAX_CONTEXT_CHARS: int = 6000
+    RAG_NEIGHBOR_WINDOW: int = 0  # chunks vizinhos (mesma fonte) trazidos junto de cada resultado
 
+    EMBEDDING_PROVIDER: str = "voyage"  # voyage | local | hashing (offline, para benchmarks/CI)
+    EMBEDDING_LOCAL_MODEL: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
     VOYAGE_API_KEY: str | None = None
     VOYAGE_MODEL_NAME: str = "voyage-2"
+    VOYAGE_BASE_URL: str | None = None  # vazio = API oficial (https://api.voyageai.com/v1)
+
+    # Ingestão
+    INGEST_PROCESS_WORKERS: int = 0  # 0 = nº de CPUs
+    INGEST_PDF_PAGE_BATCH: int = 20
+    INGEST_PDF_ASYNC_BYTES: int = 5 * 1024 * 1024  # acima disso, vira job em background
+    INGEST_BATCH_MAX_ITEMS: int = 500
+    INGEST_BATCH_CONCURRENCY: int = 4  # itens baixados/extraídos ao mesmo tempo
+    INGEST_BATCH_EMBED_SIZE: int = 64  # textos por chamada de embedding
+    INGEST_BATCH_FLUSH_SECONDS: float = 2.0
+    HTML_PARSER_BACKEND: str = "auto"  # auto | selectolax | lxml | bs4
+    CHUNK_MAX_TOKENS: int = 1000  # ≈ tamanho real das antigas janelas de 500 palavras
+    CHUNK_OVERLAP_TOKENS: int = 50  # só quando uma seção é cortada no meio
+    CHUNK_TOKENIZER: str = "voyage"  # voyage (tokenizer do modelo) | approx
+
+    # Confluence (REST API) — usuário + token = Basic (Cloud); só token = Bearer (PAT, Server/DC)
+    CONFLUENCE_BASE_URL: str | None = None
+    CONFLUENCE_USER: str | None = None
+    CONFLUENCE_TOKEN: str | None = None
+    CONFLUENCE_PAGE_LIMIT: int = 100  # páginas por requisição na listagem
+    CONFLUENCE_BODY_BATCH: int = 50  # corpos buscados por requisição (CQL id in (...))
+
+    # Cache semântico de respostas (/chat)
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY: float = 0.95  # limiar de similaridade de cosseno
+    ANSWER_CACHE_MAX_ENTRIES: int = 500  # por tenant
+    ANSWER_CACHE_TTL_SECONDS: int = 86400
+    # Perguntas idênticas simultâneas (sem screenshot) compartilham uma chamada ao LLM
+    CHAT_COALESCING_ENABLED: bool = True
+
+    # Respostas verificadas (feedback positivo recorrente)
+    VERIFIED_ANSWERS_ENABLED: bool = True
+    VERIFIED_ANSWERS_MIN_POSITIVE: int = 3
+    VERIFIED_ANSWERS_SIMILARITY: float = 0.92
+    VERIFIED_ANSWERS_REFRESH_SECONDS: int = 600
+    VERIFIED_ANSWERS_REPHRASE_MODEL: str = ""  # ex: claude-haiku-4-5; vazio = resposta curada literal
 
     @property
     def sync_database_url(self) -> str:
@@ -55,21 +173,28 @@ class Settings(BaseSettings):
     @property
     def async_database_url(self) -> str:
         if self.DATABASE_URL:
-            url = self.DATABASE_URL
-            if url.startswith("postgres://"):
-                url = url.replace("postgres://", "postgresql://", 1)
-            # Ensure asyncpg driver
-            if url.startswith("postgresql://"):
-                url = url.replace("postgresql://", "postgresql+asyncpg://", 1)
-            elif url.startswith("postgresql+psycopg2://"):
-                url = url.replace("postgresql+psycopg2://", "postgresql+asyncpg://", 1)
-            return url
+            return _asyncpg_url(self.DATABASE_URL)
         return (
             f"postgresql+asyncpg://{self.POSTGRES_USER}:"
             f"{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:"
             f"{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
         )
 
+    @property
+    def async_read_database_url(self) -> str | None:
+        return _asyncpg_url(self.DATABASE_READ_URL) if self.DATABASE_READ_URL else None
+
+
+def _asyncpg_url(url: str) -> str:
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    # Ensure asyncpg driver
+    if url.startswith("postgresql://"):
+        url = url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    elif url.startswith("postgresql+psycopg2://"):
+        url = url.replace("postgresql+psycopg2://", "postgresql+asyncpg://", 1)
+    return url
+
 
 @lru_cache
 def get_settings() -> Settings:
@@ -1,9 +1,11 @@
+import hmac
 from collections.abc import AsyncGenerator
 
-from fastapi import Depends
+from fastapi import Depends, Header, HTTPException, status
 
 from backend.core.config import Settings, get_settings
 from backend.models.database import AsyncSession, get_async_session
+from backend.models.replica import get_read_session as _get_read_session
 
 
 def get_app_settings() -> Settings:
@@ -15,7 +17,20 @@ async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    """Sessão de leitura: réplica quando configurada e em dia (ver backend/models/replica.py)."""
+    async for session in _get_read_session():
+        yield session
+
+
 def get_tenant_id(tenant_id: str) -> str:
     # Para o MVP, o tenant_id vem direto do payload.
     # Em versões futuras, pode vir de header, auth, etc.
     return tenant_id
+
+
+def require_admin_token(x_admin_token: str | None = Header(default=None)) -> None:
+    # Sem ADMIN_TOKEN configurado as rotas administrativas ficam fechadas
+    expected = get_settings().ADMIN_TOKEN
+    if not (expected and x_admin_token and hmac.compare_digest(x_admin_token, expected)):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Token de admin inválido")
@@ -0,0 +1,254 @@
+"""Watchdog do event loop: mede o atraso de agendamento e aponta quem bloqueou.
+
+Trabalho síncrono no loop (embedding via HTTP, parsing de PDF, scraping)
+congela todas as requisições do worker enquanto roda. Este monitor:
+
+- mede continuamente o lag: uma task dorme ``LOOP_MONITOR_INTERVAL_MS`` e
+  registra quanto acordou atrasada, num histograma cumulativo (limites em
+  ``LAG_BUCKETS_MS``) mais as amostras recentes para percentis;
+- captura o culpado: uma thread de vigia confere o heartbeat da task; se o
+  loop ficar parado mais que ``LOOP_LAG_THRESHOLD_MS``, copia a pilha da
+  thread do loop *durante* o bloqueio — ou seja, a pilha da corrotina que
+  está segurando o loop — e o nome da task corrente.
+
+Os travamentos são agregados pelo frame mais interno do código da
+aplicação (``backend/``), então o mesmo ponto bloqueante aparece uma vez,
+com contagem e tempo total. Tudo sai em ``/metrics`` (fonte
+``event_loop``); cada novo ponto bloqueante também vai para o log.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from backend.core.config import get_settings
+from backend.core.metrics import register_metrics_source
+
+
+settings = get_settings()
+logger = logging.getLogger("copiloto-farma.loop-monitor")
+
+LAG_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+_MAX_SAMPLES = 20_000
+_STACK_DEPTH = 25
+_APP_ROOT = str(Path(__file__).resolve().parents[1])
+
+
+@dataclass(slots=True)
+class Stall:
+    """Um travamento do loop, capturado enquanto acontecia."""
+
+    captured_at: float
+    task: str | None
+    stack: list[str]
+    location: str
+    lag_ms: float | None = None  # preenchido quando o loop volta
+
+
+@dataclass(slots=True)
+class Blocker:
+    """Ponto do código que já travou o loop (agregado por ``location``)."""
+
+    location: str
+    stack: list[str]
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    tasks: set[str] = field(default_factory=set)
+
+
+def _describe_stack(frame: Any) -> tuple[list[str], str]:
+    summary = traceback.extract_stack(frame)[-_STACK_DEPTH:]
+    lines = [f"{f.filename}:{f.lineno} in {f.name}" for f in summary]
+    app_frames = [f for f in summary if f.filename.startswith(_APP_ROOT)]
+    innermost = (app_frames or summary)[-1]
+    return lines, f"{innermost.filename}:{innermost.lineno} in {innermost.name}"
+
+
+class LoopMonitor:
+    def __init__(self) -> None:
+        self.interval = settings.LOOP_MONITOR_INTERVAL_MS / 1000
+        self.threshold = settings.LOOP_LAG_THRESHOLD_MS / 1000
+
+        self.buckets = [0] * (len(LAG_BUCKETS_MS) + 1)  # último = +inf
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+        self.samples: deque[float] = deque(maxlen=_MAX_SAMPLES)
+
+        self.stalls: deque[Stall] = deque(maxlen=settings.LOOP_MONITOR_MAX_STALLS)
+        self.blockers: dict[str, Blocker] = {}
+        self._pending: Stall | None = None
+        self._lock = threading.Lock()  # stalls/blockers são escritos pela thread de vigia
+
+        self._heartbeat = time.perf_counter()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._stop = threading.Event()
+        self._watchdog: threading.Thread | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    # ── Medição no loop ────────────────────────────────────────
+
+    def start(self) -> None:
+        """Inicia o sampler (no loop corrente) e a thread de vigia."""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._sample())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _sample(self) -> None:
+        while True:
+            started = time.perf_counter()
+            self._heartbeat = started
+            await asyncio.sleep(self.interval)
+            self._record(max(0.0, time.perf_counter() - started - self.interval))
+
+    def _record(self, lag: float) -> None:
+        lag_ms = lag * 1000
+        self.buckets[bisect.bisect_left(LAG_BUCKETS_MS, lag_ms)] += 1
+        self.count += 1
+        self.sum_ms += lag_ms
+        self.max_ms = max(self.max_ms, lag_ms)
+        self.samples.append(lag)
+
+        if self._pending is None:
+            return
+        with self._lock:
+            stall, self._pending = self._pending, None
+            if stall is None:
+                return
+            stall.lag_ms = round(lag_ms, 1)
+            blocker = self.blockers.get(stall.location)
+            if blocker is not None:
+                blocker.total_ms += lag_ms
+                blocker.max_ms = max(blocker.max_ms, lag_ms)
+
+    # ── Vigia (outra thread) ───────────────────────────────────
+
+    def _watch(self) -> None:
+        poll = max(self.threshold / 4, 0.005)
+        captured_for: float | None = None
+        while not self._stop.wait(poll):
+            heartbeat = self._heartbeat
+            blocked_for = time.perf_counter() - heartbeat - self.interval
+            if blocked_for < self.threshold or captured_for == heartbeat:
+                continue
+            captured_for = heartbeat  # uma captura por travamento
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self._capture(frame)
+
+    def _capture(self, frame: Any) -> None:
+        stack, location = _describe_stack(frame)
+        task = asyncio.current_task(self._loop) if self._loop is not None else None
+        task_name = task.get_name() if task is not None else None
+        if task is not None:
+            coro = task.get_coro()
+            task_name = f"{task_name} ({getattr(coro, '__qualname__', coro)})"
+
+        stall = Stall(captured_at=time.time(), task=task_name, stack=stack, location=location)
+        with self._lock:
+            self.stalls.append(stall)
+            self._pending = stall
+            blocker = self.blockers.get(location)
+            new = blocker is None
+            if new:
+                blocker = self.blockers[location] = Blocker(location=location, stack=stack)
+            blocker.count += 1
+            if task_name:
+                blocker.tasks.add(task_name)
+        if new:
+            logger.warning(
+                "Event loop bloqueado há mais de %.0f ms em %s (task %s)\n%s",
+                self.threshold * 1000, location, task_name, "\n".join(stack),
+            )
+
+    # ── Métricas ───────────────────────────────────────────────
+
+    def reset(self) -> None:
+        self.buckets = [0] * (len(LAG_BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+        self.samples.clear()
+        with self._lock:
+            self.stalls.clear()
+            self.blockers.clear()
+            self._pending = None
+
+    def histogram(self) -> dict[str, int]:
+        """Contagens cumulativas por limite (``le_<ms>``), como num histograma Prometheus."""
+        out: dict[str, int] = {}
+        running = 0
+        for bound, n in zip((*LAG_BUCKETS_MS, "inf"), self.buckets):
+            running += n
+            out[f"le_{bound}"] = running
+        return out
+
+    def stats(self) -> dict[str, Any]:
+        lag: dict[str, Any] = {
+            "count": self.count,
+            "sum_ms": round(self.sum_ms, 1),
+            "max_ms": round(self.max_ms, 1),
+            "buckets": self.histogram(),
+        }
+        if self.samples:
+            ms = np.fromiter(self.samples, dtype=np.float64, count=len(self.samples)) * 1000
+            lag.update(
+                p50_ms=round(float(np.percentile(ms, 50)), 2),
+                p99_ms=round(float(np.percentile(ms, 99)), 2),
+            )
+        with self._lock:
+            blockers = sorted(self.blockers.values(), key=lambda b: b.total_ms, reverse=True)
+            top = [
+                {
+                    "location": b.location,
+                    "count": b.count,
+                    "total_ms": round(b.total_ms, 1),
+                    "max_ms": round(b.max_ms, 1),
+                    "tasks": sorted(b.tasks)[:5],
+                    "stack": b.stack,
+                }
+                for b in blockers[:10]
+            ]
+            recent = [
+                {"at": s.captured_at, "lag_ms": s.lag_ms, "task": s.task, "location": s.location}
+                for s in list(self.stalls)[-10:]
+            ]
+        return {
+            "running": self._task is not None,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "lag": lag,
+            "stalls": sum(b.count for b in blockers),
+            "blockers": top,
+            "recent_stalls": recent,
+        }
+
+
+loop_monitor = LoopMonitor()
+
+register_metrics_source("event_loop", loop_monitor.stats)
@@ -0,0 +1,19 @@
+"""Registro simples de métricas em processo, exposto em ``GET /metrics``."""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict
+
+
+MetricsSource = Callable[[], Dict[str, Any]]
+
+_sources: dict[str, MetricsSource] = {}
+
+
+def register_metrics_source(name: str, source: MetricsSource) -> None:
+    """Registra um callable que devolve um snapshot (dict) das métricas do componente."""
+    _sources[name] = source
+
+
+def collect_metrics() -> dict[str, Dict[str, Any]]:
+    return {name: source() for name, source in _sources.items()}
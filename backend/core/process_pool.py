@@ -0,0 +1,32 @@
+"""Pool de processos compartilhado para trabalho CPU-bound (parsing de PDF/HTML).
+
+Criado sob demanda na primeira chamada, para não custar nada no boot de
+instâncias que nunca ingerem documentos.
+"""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from backend.core.config import get_settings
+
+
+settings = get_settings()
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        workers = settings.INGEST_PROCESS_WORKERS or os.cpu_count() or 1
+        _pool = ProcessPoolExecutor(max_workers=workers)
+    return _pool
+
+
+def shutdown_process_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,286 @@
+"""Profiling opcional por requisição: spans de tempo de parede e SQL com duração.
+
+Uma requisição é perfilada quando traz ``X-Profile-Token`` igual a
+``PROFILING_TOKEN`` ou cai na amostragem (``PROFILING_SAMPLE_RATE``). O
+perfil fica num ``ContextVar``, então acompanha a requisição pelos
+``await`` e pelas tasks que ela cria (mas não por threads do executor)
+sem se misturar com as requisições concorrentes. Jobs em background
+disparados pela requisição herdam o perfil, mas ele é fechado quando a
+resposta termina: o que o job fizer depois não é registrado.
+
+- ``span(nome, **attrs)`` marca etapas (orquestrador, retriever, gateway
+  do LLM, embeddings) com início e duração relativos ao começo da
+  requisição e o span pai;
+- cada consulta SQL executada pelos engines (primário e réplica) entra com
+  o texto, a duração, o engine e o span em que rodou.
+
+Cada perfil vira um JSON em ``PROFILING_DIR`` (os ``PROFILING_MAX_FILES``
+mais recentes são mantidos), com o id devolvido no header ``X-Profile-Id``;
+``/admin/profiles`` (header ``X-Admin-Token``) lista e baixa os arquivos.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hmac
+import json
+import logging
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.core.config import get_settings
+from backend.core.metrics import register_metrics_source
+from backend.models.database import engine, read_engine
+
+
+settings = get_settings()
+logger = logging.getLogger("copiloto-farma.profiling")
+
+PROFILE_HEADER = "x-profile-token"
+_SKIP_PATHS = ("/health", "/metrics", "/admin/profiles")
+_STATEMENT_MAX_CHARS = 2000
+
+
+@dataclass(slots=True)
+class Span:
+    id: int
+    parent: int | None
+    name: str
+    start_ms: float
+    duration_ms: float | None = None
+    attrs: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class SqlCall:
+    statement: str
+    engine: str
+    span: int | None
+    start_ms: float
+    duration_ms: float = 0.0
+    rows: int | None = None
+
+
+@dataclass(slots=True)
+class Profile:
+    id: str
+    method: str
+    path: str
+    query: str
+    trigger: str
+    started_at: str
+    started: float = field(default_factory=time.perf_counter)
+    status: int | None = None
+    duration_ms: float = 0.0
+    spans: list[Span] = field(default_factory=list)
+    sql: list[SqlCall] = field(default_factory=list)
+    closed: bool = False  # já gravado; tasks que herdaram o contexto não registram mais
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.started) * 1000, 3)
+
+    def to_dict(self) -> dict[str, Any]:
+        data = asdict(self)
+        data.pop("started")
+        data.pop("closed")
+        data["sql_count"] = len(self.sql)
+        data["sql_total_ms"] = round(sum(call.duration_ms for call in self.sql), 3)
+        return data
+
+
+_profile: ContextVar[Profile | None] = ContextVar("copiloto_profile", default=None)
+_span: ContextVar[int | None] = ContextVar("copiloto_profile_span", default=None)
+
+_stats = {"captured": 0, "write_errors": 0}
+
+
+def current_profile() -> Profile | None:
+    return _profile.get()
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[dict[str, Any]]:
+    """Marca uma etapa da requisição perfilada; fora de um perfil não custa nada.
+
+    O dicionário devolvido aceita atributos descobertos durante a etapa
+    (ex.: tokens usados pelo LLM).
+    """
+    profile = _profile.get()
+    if profile is None or profile.closed:
+        yield attrs
+        return
+    record = Span(
+        id=len(profile.spans), parent=_span.get(), name=name,
+        start_ms=profile.elapsed_ms(), attrs=attrs,
+    )
+    profile.spans.append(record)
+    token = _span.set(record.id)
+    try:
+        yield record.attrs
+    finally:
+        _span.reset(token)
+        record.duration_ms = round(profile.elapsed_ms() - record.start_ms, 3)
+
+
+# ── SQL ────────────────────────────────────────────────────────
+
+
+def instrument_engine(sync_engine: Engine, label: str) -> None:
+    """Registra a duração de cada consulta do engine no perfil ativo."""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany) -> None:
+        profile = _profile.get()
+        if profile is None or profile.closed:
+            return
+        call = SqlCall(
+            statement=statement[:_STATEMENT_MAX_CHARS], engine=label,
+            span=_span.get(), start_ms=profile.elapsed_ms(),
+        )
+        profile.sql.append(call)
+        conn.info["copiloto_profile_call"] = call
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany) -> None:
+        profile = _profile.get()
+        call = conn.info.pop("copiloto_profile_call", None)
+        if profile is None or call is None:
+            return
+        call.duration_ms = round(profile.elapsed_ms() - call.start_ms, 3)
+        rowcount = getattr(cursor, "rowcount", -1)
+        call.rows = rowcount if rowcount is not None and rowcount >= 0 else None
+
+
+# ── Arquivos ───────────────────────────────────────────────────
+
+
+def profiles_dir() -> Path:
+    return Path(settings.PROFILING_DIR)
+
+
+def _write(profile: Profile) -> None:
+    directory = profiles_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = profile.started_at[:26].replace(":", "").replace(".", "")  # até microssegundos
+    name = f"{stamp}-{profile.id}.json"
+    (directory / name).write_text(json.dumps(profile.to_dict(), ensure_ascii=False, indent=1))
+    # Rotação: nomes começam pelo horário, então a ordem alfabética é a cronológica
+    files = sorted(directory.glob("*.json"))
+    for old in files[: max(0, len(files) - settings.PROFILING_MAX_FILES)]:
+        old.unlink(missing_ok=True)
+
+
+def list_profiles() -> list[dict[str, Any]]:
+    out = []
+    for path in sorted(profiles_dir().glob("*.json"), reverse=True):
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        out.append({
+            "id": data["id"],
+            "file": path.name,
+            "method": data["method"],
+            "path": data["path"],
+            "status": data["status"],
+            "trigger": data["trigger"],
+            "started_at": data["started_at"],
+            "duration_ms": data["duration_ms"],
+            "sql_count": data["sql_count"],
+            "sql_total_ms": data["sql_total_ms"],
+        })
+    return out
+
+
+def find_profile(profile_id: str) -> Path | None:
+    matches = list(profiles_dir().glob(f"*-{profile_id}.json")) if profile_id.isalnum() else []
+    return matches[0] if matches else None
+
+
+# ── Middleware ─────────────────────────────────────────────────
+
+
+def token_matches(value: str | None) -> bool:
+    return bool(settings.PROFILING_TOKEN and value) and hmac.compare_digest(value, settings.PROFILING_TOKEN)
+
+
+def _trigger(scope: Scope) -> str | None:
+    if scope["type"] != "http" or scope["path"].startswith(_SKIP_PATHS):
+        return None
+    if token_matches(Headers(scope=scope).get(PROFILE_HEADER)):
+        return "header"
+    if settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE:
+        return "sample"
+    return None
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        trigger = _trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(
+            id=uuid.uuid4().hex[:12],
+            method=scope["method"],
+            path=scope["path"],
+            query=scope.get("query_string", b"").decode("latin-1"),
+            trigger=trigger,
+            started_at=datetime.now(timezone.utc).isoformat(),
+        )
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        token = _profile.set(profile)
+        try:
+            with span("request"):
+                await self.app(scope, receive, send_with_id)
+        finally:
+            _profile.reset(token)
+            profile.closed = True
+            profile.duration_ms = profile.elapsed_ms()
+            _stats["captured"] += 1
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, _write, profile)
+            except OSError as exc:
+                _stats["write_errors"] += 1
+                logger.warning("Falha ao gravar o perfil %s: %s", profile.id, exc)
+            logger.info(
+                "Perfil %s — %s %s %.1f ms (%d consultas SQL)",
+                profile.id, profile.method, profile.path, profile.duration_ms, len(profile.sql),
+            )
+
+
+instrument_engine(engine.sync_engine, "primary")
+if read_engine is not None:
+    instrument_engine(read_engine.sync_engine, "replica")
+
+register_metrics_source(
+    "profiling",
+    lambda: {
+        **_stats,
+        "header_enabled": bool(settings.PROFILING_TOKEN),
+        "sample_rate": settings.PROFILING_SAMPLE_RATE,
+    },
+)
@@ -0,0 +1,112 @@
+"""Pré-aquecimento em background depois do boot.
+
+Os SDKs e parsers pesados são importados sob demanda (o boot não paga por
+eles); este hook antecipa esse custo logo depois que o servidor começa a
+responder, para que a primeira requisição de chat não pague por ele:
+
+- ``database``: abre a primeira conexão do pool (e do pool da réplica);
+- ``llm_client``: importa o SDK da Anthropic e cria o cliente do gateway;
+- ``embeddings``: cria o provedor de embeddings (importa o SDK da Voyage);
+- ``tokenizer``: baixa/carrega o tokenizer usado no chunking;
+- ``parsers``: importa ``pypdf``, o Pillow e o backend de HTML em uso.
+
+Imports e construção de clientes rodam numa thread, então o event loop
+continua atendendo (``/health`` inclusive) enquanto isso. Falhas ficam
+registradas por etapa e não impedem as demais. O andamento aparece em
+``/health`` e em ``/metrics`` (fonte ``warmup``).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import logging
+import time
+from typing import Any, Callable
+
+from sqlalchemy import text
+
+from backend.core.metrics import register_metrics_source
+
+
+logger = logging.getLogger("copiloto-farma.warmup")
+
+_state: dict[str, Any] = {"status": "pending", "seconds": 0.0, "steps": {}}
+
+
+async def _database() -> None:
+    from backend.models.database import engine, read_engine
+
+    for target in (engine, read_engine):
+        if target is not None:
+            async with target.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+
+def _llm_client() -> None:
+    from backend.agents.llm_gateway import llm_gateway
+
+    if llm_gateway.configured:
+        llm_gateway.client
+
+
+def _embeddings() -> None:
+    from backend.rag.embeddings import get_embedding_provider
+
+    get_embedding_provider()
+
+
+def _tokenizer() -> None:
+    from backend.rag.chunker import load_tokenizer
+
+    load_tokenizer()
+
+
+def _parsers() -> None:
+    from backend.rag.html_extract import extract_page
+
+    importlib.import_module("pypdf")
+    importlib.import_module("PIL.Image")
+    extract_page("<html><body><h1>ok</h1></body></html>")
+
+
+_STEPS: tuple[tuple[str, Callable[[], Any]], ...] = (
+    ("database", _database),
+    ("llm_client", _llm_client),
+    ("embeddings", _embeddings),
+    ("tokenizer", _tokenizer),
+    ("parsers", _parsers),
+)
+
+
+async def warmup() -> None:
+    _state["status"] = "running"
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    failed = False
+
+    for name, step in _STEPS:
+        step_started = time.perf_counter()
+        try:
+            if asyncio.iscoroutinefunction(step):
+                await step()
+            else:
+                await loop.run_in_executor(None, step)
+        except Exception as exc:
+            failed = True
+            _state["steps"][name] = {"ok": False, "error": str(exc)[:200]}
+            logger.warning("Warmup: %s falhou: %s", name, exc)
+        else:
+            _state["steps"][name] = {"ok": True}
+        _state["steps"][name]["seconds"] = round(time.perf_counter() - step_started, 3)
+
+    _state["seconds"] = round(time.perf_counter() - started, 3)
+    _state["status"] = "partial" if failed else "done"
+    logger.info("Warmup %s em %.2fs", _state["status"], _state["seconds"])
+
+
+def warmup_status() -> str:
+    return _state["status"]
+
+
+register_metrics_source("warmup", lambda: dict(_state))
@@ -0,0 +1,3 @@
+#!/bin/sh
+# Libera streaming de WAL para a réplica do docker-compose (perfil "replica")
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
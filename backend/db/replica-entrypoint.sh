@@ -0,0 +1,14 @@
+#!/bin/bash
+# Réplica física do serviço "db": clona com pg_basebackup na primeira subida
+# e segue como hot standby (streaming). Uso: docker compose --profile replica up
+set -e
+
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+  until pg_isready -h db -U "$POSTGRES_USER" -q; do sleep 1; done
+  mkdir -p "$PGDATA"
+  chown postgres:postgres "$PGDATA"
+  chmod 700 "$PGDATA"
+  gosu postgres pg_basebackup -h db -U "$POSTGRES_USER" -D "$PGDATA" -R -X stream
+fi
+
+exec gosu postgres postgres
@@ -1,18 +1,31 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from backend.agents.feedback_learning import run_feedback_listener
+from backend.agents.llm_gateway import llm_gateway
+from backend.agents.verified_answers import run_verified_answers_job
+from backend.api.routes.admin import router as admin_router
 from backend.api.routes.chat import router as chat_router
 from backend.api.routes.conversations import router as conversations_router
 from backend.api.routes.health import router as health_router
 from backend.api.routes.feedback import router as feedback_router
 from backend.api.routes.ingest import router as ingest_router
 from backend.api.routes.onboarding import router as onboarding_router
+from backend.core.admission import AdmissionMiddleware, AdmissionRejected, rejection_response
 from backend.core.config import get_settings
-from backend.models.database import init_db
+from backend.core.loop_monitor import loop_monitor
+from backend.core.profiling import ProfilingMiddleware
+from backend.core.process_pool import shutdown_process_pool
+from backend.core.warmup import warmup
+from backend.models.migrate import check_schema_in_background, migrate
+from backend.models.partitions import run_partition_maintenance
+from backend.models.replica import run_replica_monitor
+from backend.models.write_behind import chat_persistence
 
 
 settings = get_settings()
@@ -27,6 +40,11 @@ logger = logging.getLogger("copiloto-farma")
 def create_app() -> FastAPI:
     app = FastAPI(title="Copiloto Farma API", version="0.1.0")
 
+    # Antes do CORS: as respostas 429 também levam os headers de CORS
+    app.add_middleware(AdmissionMiddleware)
+    app.add_exception_handler(AdmissionRejected, lambda request, exc: rejection_response(exc))
+    # Por fora da admissão: o perfil inclui o tempo gasto nela
+    app.add_middleware(ProfilingMiddleware)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=[
@@ -38,6 +56,7 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Has-More", "Retry-After", "X-Profile-Id"],
     )
 
     app.include_router(health_router)
@@ -46,12 +65,36 @@ def create_app() -> FastAPI:
     app.include_router(ingest_router)
     app.include_router(feedback_router)
     app.include_router(onboarding_router)
+    app.include_router(admin_router)
 
     @app.on_event("startup")
     async def on_startup() -> None:
-        logger.info("Inicializando banco de dados...")
-        await init_db()
-        logger.info("Banco de dados pronto.")
+        if settings.LOOP_MONITOR_ENABLED:
+            loop_monitor.start()
+        if settings.FAST_BOOT:
+            # Schema aplicado no deploy (python -m backend.models.migrate)
+            asyncio.create_task(check_schema_in_background())
+        else:
+            logger.info("Inicializando banco de dados...")
+            await migrate(force=True)
+            logger.info("Banco de dados pronto.")
+        asyncio.create_task(run_partition_maintenance())
+        asyncio.create_task(run_replica_monitor())
+
+        await chat_persistence.start()
+
+        asyncio.create_task(run_feedback_listener())
+        if settings.VERIFIED_ANSWERS_ENABLED:
+            asyncio.create_task(run_verified_answers_job())
+        if settings.WARMUP_ON_STARTUP:
+            asyncio.create_task(warmup())
+
+    @app.on_event("shutdown")
+    async def on_shutdown() -> None:
+        loop_monitor.stop()
+        await chat_persistence.stop()
+        await llm_gateway.aclose()
+        shutdown_process_pool()
 
     return app
 
@@ -2,7 +2,7 @@ from typing import AsyncGenerator
 
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import DateTime, Index, String, Text, func, text
+from sqlalchemy import DateTime, Float, Index, String, Text, func, text
 from sqlalchemy.dialects.postgresql import JSONB
 from pgvector.sqlalchemy import Vector
 
@@ -27,6 +27,8 @@ class Document(Base):
         nullable=False,
     )
     source_url: Mapped[str | None] = mapped_column(String(2048), nullable=True)
+    # Caminho de títulos do chunk ("Manual > Vendas > Estorno"), ver rag/chunker.py
+    heading_path: Mapped[str | None] = mapped_column(Text, nullable=True)
     created_at: Mapped[object] = mapped_column(
         DateTime(timezone=True),
         nullable=False,
@@ -39,18 +41,50 @@ class Document(Base):
 class Feedback(Base):
     __tablename__ = "feedback"
 
+    # Particionada por mês em created_at (ver backend/models/partitions.py):
+    # a chave de partição precisa fazer parte da PK.
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     tenant_id: Mapped[str] = mapped_column(String(64), nullable=False, index=True)
     message: Mapped[str] = mapped_column(Text, nullable=False)
     response: Mapped[str] = mapped_column(Text, nullable=False)
     rating: Mapped[str] = mapped_column(String(16), nullable=False)
     context: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
+    # pair_hash da resposta verificada que originou a resposta (reescrita ou não)
+    verified_pair_hash: Mapped[str | None] = mapped_column(String(32), nullable=True)
     created_at: Mapped[object] = mapped_column(
         DateTime(timezone=True),
+        primary_key=True,
         nullable=False,
         server_default=func.now(),
     )
 
+    __table_args__ = (
+        Index("ix_feedback_tenant_rating_created", "tenant_id", "rating", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+
+class VerifiedAnswer(Base):
+    __tablename__ = "verified_answers"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    tenant_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    pair_hash: Mapped[str] = mapped_column(String(32), nullable=False)
+    question: Mapped[str] = mapped_column(Text, nullable=False)
+    answer: Mapped[str] = mapped_column(Text, nullable=False)
+    embedding: Mapped[list[float]] = mapped_column(
+        Vector(dim=settings.EMBEDDING_DIM),
+        nullable=False,
+    )
+    positive_count: Mapped[int] = mapped_column(nullable=False, default=0)
+    updated_at: Mapped[object] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now(),
+    )
+
+    __table_args__ = (
+        Index("ux_verified_answers_tenant_pair", "tenant_id", "pair_hash", unique=True),
+    )
+
 
 class OnboardingJob(Base):
     __tablename__ = "onboarding_jobs"
@@ -64,10 +98,63 @@ class OnboardingJob(Base):
     pages_processed: Mapped[int] = mapped_column(default=0)
     chunks_total: Mapped[int] = mapped_column(default=0)
     error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[object] = mapped_column(DateTime(timezone=True), server_default=func.now())
     started_at: Mapped[object | None] = mapped_column(DateTime(timezone=True), nullable=True)
     finished_at: Mapped[object | None] = mapped_column(DateTime(timezone=True), nullable=True)
 
 
+class TenantRateBucket(Base):
+    """Balde de admissão compartilhado entre workers (ver ``backend.core.admission``)."""
+
+    __tablename__ = "tenant_rate_buckets"
+
+    tenant_id: Mapped[str] = mapped_column(String(64), primary_key=True)
+    kind: Mapped[str] = mapped_column(String(32), primary_key=True)
+    tokens: Mapped[float] = mapped_column(Float, nullable=False)
+    updated_at: Mapped[object] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
+class IngestBatchItem(Base):
+    """Um item (URL ou arquivo) de um job de ``/ingest/batch``."""
+
+    __tablename__ = "ingest_batch_items"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    job_id: Mapped[str] = mapped_column(String(36), nullable=False)
+    position: Mapped[int] = mapped_column(nullable=False)
+    source: Mapped[str] = mapped_column(String(2048), nullable=False)
+    kind: Mapped[str] = mapped_column(String(8), nullable=False)  # url | file
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="pending")
+    chunks: Mapped[int] = mapped_column(nullable=False, default=0)
+    error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
+    finished_at: Mapped[object | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (Index("ix_ingest_batch_items_job", "job_id", "position"),)
+
+
+class ConfluencePage(Base):
+    """Versão já ingerida de cada página do Confluence (ver rag/confluence.py)."""
+
+    __tablename__ = "confluence_pages"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    tenant_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    page_id: Mapped[str] = mapped_column(String(32), nullable=False)
+    space_key: Mapped[str] = mapped_column(String(64), nullable=False)
+    title: Mapped[str] = mapped_column(String(512), nullable=False)
+    version: Mapped[int] = mapped_column(nullable=False)
+    source_url: Mapped[str] = mapped_column(String(2048), nullable=False)
+    chunks: Mapped[int] = mapped_column(nullable=False, default=0)
+    ingested_at: Mapped[object] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now(),
+    )
+
+    __table_args__ = (
+        Index("ux_confluence_pages_tenant_page", "tenant_id", "page_id", unique=True),
+        Index("ix_confluence_pages_tenant_space", "tenant_id", "space_key"),
+    )
+
+
 class Conversation(Base):
     __tablename__ = "conversations"
 
@@ -84,14 +171,18 @@ class Conversation(Base):
 class MessageRecord(Base):
     __tablename__ = "messages"
 
+    # Particionada por mês em created_at, como feedback
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    conversation_id: Mapped[str] = mapped_column(
-        String(36), nullable=False, index=True,
-    )
+    conversation_id: Mapped[str] = mapped_column(String(36), nullable=False)
     role: Mapped[str] = mapped_column(String(16), nullable=False)
     content: Mapped[str] = mapped_column(Text, nullable=False)
     created_at: Mapped[object] = mapped_column(
-        DateTime(timezone=True), nullable=False, server_default=func.now(),
+        DateTime(timezone=True), primary_key=True, nullable=False, server_default=func.now(),
+    )
+
+    __table_args__ = (
+        Index("ix_messages_conversation_created_id", "conversation_id", "created_at", "id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
 
 
@@ -101,6 +192,17 @@ engine: AsyncEngine = create_async_engine(
     max_overflow=settings.DB_MAX_OVERFLOW,
 )
 
+# Réplica de leitura opcional; quem usa é backend.models.replica
+read_engine: AsyncEngine | None = (
+    create_async_engine(
+        settings.async_read_database_url,
+        pool_size=settings.DB_READ_POOL_SIZE,
+        max_overflow=settings.DB_READ_MAX_OVERFLOW,
+    )
+    if settings.async_read_database_url
+    else None
+)
+
 AsyncSessionMaker = async_sessionmaker(
     bind=engine,
     expire_on_commit=False,
@@ -113,9 +215,23 @@ async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+# create_all não adiciona colunas nem índices novos em tabelas já existentes
+EXTRA_DDL = (
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS heading_path TEXT",
+    "ALTER TABLE onboarding_jobs ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ DEFAULT now()",
+    "ALTER TABLE feedback ADD COLUMN IF NOT EXISTS verified_pair_hash VARCHAR(32)",
+    "CREATE INDEX IF NOT EXISTS ix_feedback_tenant_rating_created "
+    "ON feedback (tenant_id, rating, created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_messages_conversation_created_id "
+    "ON messages (conversation_id, created_at, id)",
+)
+
+
 async def init_db() -> None:
-    """Cria tabelas se ainda não existirem."""
+    """Cria tabelas se ainda não existirem (ver também backend/models/migrate.py)."""
     async with engine.begin() as conn:
         await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
         await conn.run_sync(Base.metadata.create_all)
+        for statement in EXTRA_DDL:
+            await conn.execute(text(statement))
 
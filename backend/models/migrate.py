@@ -0,0 +1,190 @@
+"""Migração explícita do schema, fora do caminho de boot.
+
+Por padrão o startup chama ``migrate`` (``CREATE EXTENSION``, ``create_all``,
+``EXTRA_DDL`` e criação das partições futuras) a cada boot. Com ``FAST_BOOT=true``
+isso sai do boot e vira um passo do deploy::
+
+    python -m backend.models.migrate            # aplica se o schema mudou
+    python -m backend.models.migrate --check    # só confere (código 1 se desatualizado)
+    python -m backend.models.migrate --force    # aplica mesmo se estiver em dia
+
+O schema aplicado é identificado por uma impressão digital do DDL dos
+modelos (tabelas, índices e ``EXTRA_DDL``), gravada em ``schema_state``.
+Com ``FAST_BOOT`` o startup só confere essa impressão digital em
+background (uma consulta) e registra um erro se o deploy esqueceu a migração.
+
+Instâncias que sobem juntas (deploy gradual) não migram ao mesmo tempo: a
+migração inteira roda sob um advisory lock de sessão, e quem espera confere
+de novo a impressão digital ao conseguir o lock.
+
+``create_all`` não altera tabelas que já existem: uma coluna ou índice novo
+no modelo sem o ``ALTER``/``CREATE INDEX`` correspondente em ``EXTRA_DDL``
+não chegaria ao banco. Por isso a migração (e o ``--check``) também confere
+as colunas e índices reais no catálogo e falha, sem gravar a impressão
+digital, se faltar algo.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import sys
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from backend.models.database import EXTRA_DDL, Base, engine, init_db
+from backend.models.partitions import ensure_all_partitions
+
+
+logger = logging.getLogger("copiloto-farma.migrate")
+
+_COLUMNS_SQL = text(
+    "SELECT table_name, column_name FROM information_schema.columns "
+    "WHERE table_schema = current_schema()"
+)
+_INDEXES_SQL = text("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()")
+
+_MIGRATE_LOCK_KEY = "copiloto-migrate"
+
+_STATE_DDL = (
+    "CREATE TABLE IF NOT EXISTS schema_state ("
+    "id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1), "
+    "fingerprint TEXT NOT NULL, "
+    "applied_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+)
+
+
+def schema_fingerprint() -> str:
+    """Hash do DDL que ``init_db`` aplicaria (muda quando os modelos mudam)."""
+    dialect = postgresql.dialect()
+    parts: list[str] = []
+    for table in Base.metadata.sorted_tables:
+        parts.append(str(CreateTable(table).compile(dialect=dialect)))
+        parts.extend(
+            str(CreateIndex(index).compile(dialect=dialect))
+            for index in sorted(table.indexes, key=lambda i: i.name or "")
+        )
+    parts.extend(EXTRA_DDL)
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+async def applied_fingerprint() -> str | None:
+    async with engine.connect() as conn:
+        exists = await conn.scalar(text("SELECT to_regclass('schema_state') IS NOT NULL"))
+        if not exists:
+            return None
+        return await conn.scalar(text("SELECT fingerprint FROM schema_state WHERE id = 1"))
+
+
+async def schema_drift() -> list[str]:
+    """Tabelas, colunas e índices dos modelos que não existem no banco."""
+    async with engine.connect() as conn:
+        columns = {(t, c) for t, c in (await conn.execute(_COLUMNS_SQL)).all()}
+        indexes = set((await conn.execute(_INDEXES_SQL)).scalars())
+    tables = {t for t, _ in columns}
+
+    missing: list[str] = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            missing.append(f"tabela {table.name}")
+            continue
+        missing.extend(
+            f"coluna {table.name}.{column.name}"
+            for column in table.columns
+            if (table.name, column.name) not in columns
+        )
+        missing.extend(f"índice {index.name}" for index in table.indexes if index.name not in indexes)
+    return missing
+
+
+async def schema_is_current() -> bool:
+    return await applied_fingerprint() == schema_fingerprint() and not await schema_drift()
+
+
+async def migrate(*, force: bool = False) -> bool:
+    """Aplica o schema se a impressão digital mudou; retorna se aplicou."""
+    # Lock de sessão numa conexão própria em autocommit: vale por toda a
+    # migração (que usa outras conexões) sem deixar transação aberta
+    async with engine.connect() as conn:
+        lock_conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await lock_conn.execute(
+            text("SELECT pg_advisory_lock(hashtext(:key))"), {"key": _MIGRATE_LOCK_KEY}
+        )
+        try:
+            return await _migrate_locked(force=force)
+        finally:
+            await lock_conn.execute(
+                text("SELECT pg_advisory_unlock(hashtext(:key))"), {"key": _MIGRATE_LOCK_KEY}
+            )
+
+
+async def _migrate_locked(*, force: bool) -> bool:
+    fingerprint = schema_fingerprint()
+    if not force and await applied_fingerprint() == fingerprint:
+        logger.info("Schema em dia (%s).", fingerprint)
+        return False
+
+    await init_db()
+    missing = await schema_drift()
+    if missing:
+        raise RuntimeError(
+            "Schema do banco difere dos modelos mesmo após create_all — adicione o "
+            f"DDL correspondente em EXTRA_DDL: {', '.join(missing)}"
+        )
+    await ensure_all_partitions()
+    async with engine.begin() as conn:
+        await conn.execute(text(_STATE_DDL))
+        await conn.execute(
+            text(
+                "INSERT INTO schema_state (id, fingerprint) VALUES (1, :fingerprint) "
+                "ON CONFLICT (id) DO UPDATE SET fingerprint = EXCLUDED.fingerprint, applied_at = now()"
+            ),
+            {"fingerprint": fingerprint},
+        )
+    logger.info("Schema aplicado (%s).", fingerprint)
+    return True
+
+
+async def check_schema_in_background() -> None:
+    """Startup com ``FAST_BOOT``: confere o schema sem segurar o boot."""
+    try:
+        applied = await applied_fingerprint()
+        if applied != schema_fingerprint():
+            logger.error(
+                "Schema do banco (%s) difere dos modelos (%s) — rode "
+                "`python -m backend.models.migrate` no deploy.",
+                applied, schema_fingerprint(),
+            )
+        elif missing := await schema_drift():
+            logger.error("Schema do banco difere dos modelos: faltam %s", ", ".join(missing))
+    except Exception as exc:
+        logger.warning("Falha ao conferir o schema no startup: %s", exc)
+
+
+async def _run(args: argparse.Namespace) -> int:
+    try:
+        if args.check:
+            current = await schema_is_current()
+            print("Schema em dia." if current else "Schema desatualizado.")
+            return 0 if current else 1
+        await migrate(force=args.force)
+        return 0
+    finally:
+        await engine.dispose()
+
+
+def main(argv: list[str]) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+    parser = argparse.ArgumentParser(prog="python -m backend.models.migrate")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--check", action="store_true", help="só confere; código 1 se desatualizado")
+    group.add_argument("--force", action="store_true", help="aplica mesmo se estiver em dia")
+    return asyncio.run(_run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,366 @@
+"""Particionamento mensal de ``messages`` e ``feedback`` com retenção.
+
+As duas tabelas são append-only e crescem sem limite. Com partições mensais
+por ``created_at`` (``RANGE``), os inserts e o autovacuum trabalham só na
+partição do mês corrente e as consultas por período fazem partition pruning.
+
+A migração do schema cria as partições dos próximos
+``PARTITION_MONTHS_AHEAD`` meses. A retenção roda só no job periódico (nunca
+no caminho de boot) e vem desligada: com ``RETENTION_MONTHS_*`` > 0 *e*
+``PARTITION_ARCHIVE_DIR`` apontando para um volume durável, partições mais
+antigas que o limite são destacadas com ``DETACH PARTITION ... CONCURRENTLY``
+(sem travar a tabela mãe), exportadas para
+``<PARTITION_ARCHIVE_DIR>/<tabela>/<partição>.csv.gz`` fora de qualquer
+transação e só então removidas. Uma execução interrompida é retomada na
+seguinte: partições com detach pendente são finalizadas e tabelas já
+destacadas, exportadas.
+
+Bancos criados antes do particionamento têm as tabelas comuns; para
+convertê-las (renomeia, recria particionada e copia os dados numa
+transação)::
+
+    python -m backend.models.partitions migrate
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import logging
+import re
+import shutil
+import sys
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from backend.core.config import get_settings
+from backend.models.database import Base, engine
+
+
+settings = get_settings()
+logger = logging.getLogger("copiloto-farma.partitions")
+
+PARTITIONED_TABLES = ("messages", "feedback")
+
+_PARTITION_NAME = re.compile(r"_y(\d{4})m(\d{2})$")
+
+
+def _retention_months(table: str) -> int:
+    return {
+        "messages": settings.RETENTION_MONTHS_MESSAGES,
+        "feedback": settings.RETENTION_MONTHS_FEEDBACK,
+    }[table]
+
+
+def _month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def _add_months(d: date, months: int) -> date:
+    index = d.year * 12 + (d.month - 1) + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(table: str, month: date) -> str:
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+async def _relkind(conn: AsyncConnection, table: str) -> str | None:
+    """'p' = particionada, 'r' = tabela comum, None = não existe."""
+    result = await conn.execute(
+        text(
+            "SELECT c.relkind FROM pg_class c "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE c.relname = :name AND n.nspname = current_schema()"
+        ),
+        {"name": table},
+    )
+    return result.scalar_one_or_none()
+
+
+# ── Criação de partições ───────────────────────────────────────
+
+async def ensure_partitions(
+    conn: AsyncConnection,
+    table: str,
+    *,
+    start: date | None = None,
+    months_ahead: int | None = None,
+) -> int:
+    """Garante partições de ``start`` (padrão: mês atual) até N meses à frente."""
+    if months_ahead is None:
+        months_ahead = settings.PARTITION_MONTHS_AHEAD
+    month = _month_start(start or _today())
+    last = _add_months(_month_start(_today()), months_ahead)
+
+    created = 0
+    while month <= last:
+        upper = _add_months(month, 1)
+        name = _partition_name(table, month)
+        result = await conn.execute(
+            text("SELECT to_regclass(:name) IS NULL"), {"name": name}
+        )
+        if result.scalar_one():
+            await conn.execute(
+                text(
+                    f'CREATE TABLE "{name}" PARTITION OF "{table}" '
+                    f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') "
+                    f"TO ('{upper.isoformat()} 00:00:00+00')"
+                )
+            )
+            created += 1
+        month = upper
+
+    await _drop_empty_default(conn, table)
+    return created
+
+
+async def _drop_empty_default(conn: AsyncConnection, table: str) -> None:
+    """Remove a partição ``DEFAULT`` das versões anteriores, se estiver vazia.
+
+    Com uma partição default o Postgres não aceita ``DETACH ... CONCURRENTLY``;
+    as partições criadas com meses de antecedência já cobrem os inserts.
+    """
+    default = f"{table}_default"
+    if (await conn.execute(text("SELECT to_regclass(:name)"), {"name": default})).scalar_one() is None:
+        return
+    if (await conn.execute(text(f'SELECT EXISTS (SELECT 1 FROM "{default}")'))).scalar_one():
+        logger.warning(
+            "Partição %s tem linhas; a retenção de %s vai usar DETACH sem CONCURRENTLY.",
+            default, table,
+        )
+        return
+    await conn.execute(text(f'DROP TABLE "{default}"'))
+
+
+# ── Migração de tabela comum → particionada ────────────────────
+
+async def migrate_to_partitioned(conn: AsyncConnection, table: str) -> bool:
+    """Converte ``table`` em particionada, preservando dados e sequência de ids."""
+    if await _relkind(conn, table) != "r":
+        return False
+
+    legacy = f"{table}_legacy"
+    logger.info("Convertendo %s em tabela particionada...", table)
+
+    await conn.execute(text(f'ALTER TABLE "{table}" RENAME TO "{legacy}"'))
+
+    # Índices (incluindo a PK) e a sequência mantêm o nome antigo; renomeia
+    # para não colidir com os objetos da nova tabela
+    indexes = await conn.execute(
+        text(
+            "SELECT indexname FROM pg_indexes "
+            "WHERE tablename = :name AND schemaname = current_schema()"
+        ),
+        {"name": legacy},
+    )
+    for (index_name,) in indexes.all():
+        await conn.execute(text(f'ALTER INDEX "{index_name}" RENAME TO "{index_name}_legacy"'))
+
+    seq = (
+        await conn.execute(text("SELECT pg_get_serial_sequence(:name, 'id')"), {"name": legacy})
+    ).scalar_one_or_none()
+    if seq:
+        await conn.execute(text(f"ALTER SEQUENCE {seq} RENAME TO \"{legacy}_id_seq\""))
+
+    await conn.run_sync(Base.metadata.tables[table].create)
+
+    oldest = (
+        await conn.execute(text(f'SELECT min(created_at) FROM "{legacy}"'))
+    ).scalar_one_or_none()
+    await ensure_partitions(conn, table, start=oldest.date() if oldest else None)
+
+    columns = ", ".join(f'"{c.name}"' for c in Base.metadata.tables[table].columns)
+    await conn.execute(
+        text(f'INSERT INTO "{table}" ({columns}) SELECT {columns} FROM "{legacy}"')
+    )
+    await conn.execute(
+        text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f'COALESCE((SELECT max(id) FROM "{table}"), 0) + 1, false)'
+        )
+    )
+    await conn.execute(text(f'DROP TABLE "{legacy}"'))
+
+    logger.info("%s convertida para particionamento mensal.", table)
+    return True
+
+
+# ── Retenção ───────────────────────────────────────────────────
+
+async def _list_monthly_partitions(
+    conn: AsyncConnection, table: str
+) -> list[tuple[str, date, str]]:
+    """Partições mensais de ``table``: ``(nome, mês, estado)``.
+
+    ``estado`` é ``attached``, ``pending`` (``DETACH CONCURRENTLY``
+    interrompido) ou ``detached`` (já fora da tabela mãe, ainda não arquivada).
+    """
+    result = await conn.execute(
+        text(
+            "SELECT c.relname, "
+            "CASE WHEN i.inhrelid IS NULL THEN 'detached' "
+            "WHEN i.inhdetachpending THEN 'pending' ELSE 'attached' END "
+            "FROM pg_class c "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "LEFT JOIN pg_inherits i ON i.inhrelid = c.oid "
+            "WHERE n.nspname = current_schema() AND c.relkind = 'r' "
+            "AND c.relname ~ :pattern"
+        ),
+        {"pattern": f"^{table}_y[0-9]{{4}}m[0-9]{{2}}$"},
+    )
+    out: list[tuple[str, date, str]] = []
+    for name, state in result.all():
+        match = _PARTITION_NAME.search(name)
+        if match:
+            out.append((name, date(int(match.group(1)), int(match.group(2)), 1), state))
+    return sorted(out, key=lambda item: item[1])
+
+
+async def _detach(table: str, name: str, state: str) -> None:
+    """Destaca a partição em autocommit, sem segurar lock durante a exportação."""
+    async with engine.connect() as conn:
+        # DETACH CONCURRENTLY não roda dentro de um bloco de transação
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        if state == "pending":
+            await conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}" FINALIZE'))
+            return
+        has_default = (
+            await conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": f"{table}_default"})
+        ).scalar_one()
+        if not has_default:
+            await conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}" CONCURRENTLY'))
+            return
+        # Com partição default só há o DETACH comum: só metadados, mas pede
+        # ACCESS EXCLUSIVE na mãe — desiste rápido em vez de enfileirar o chat
+        await conn.execute(text("SET lock_timeout = '5s'"))
+        try:
+            await conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+        finally:
+            await conn.execute(text("RESET lock_timeout"))
+
+
+def _gzip_file(src: Path, dst: Path) -> None:
+    partial = dst.with_name(dst.name + ".partial")
+    with src.open("rb") as f_in, gzip.open(partial, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    partial.replace(dst)
+    src.unlink()
+
+
+async def apply_retention(table: str) -> list[str]:
+    """Destaca, arquiva em CSV gzip e remove partições fora da retenção."""
+    retention = _retention_months(table)
+    if retention <= 0:
+        return []
+    if not settings.PARTITION_ARCHIVE_DIR:
+        logger.warning(
+            "Retenção de %s configurada sem PARTITION_ARCHIVE_DIR — nada será removido.", table
+        )
+        return []
+
+    cutoff = _add_months(_month_start(_today()), -retention)
+    archive_dir = Path(settings.PARTITION_ARCHIVE_DIR) / table
+    loop = asyncio.get_running_loop()
+
+    async with engine.connect() as conn:
+        expired = [
+            (name, state)
+            for name, month, state in await _list_monthly_partitions(conn, table)
+            if month < cutoff
+        ]
+
+    archived: list[str] = []
+    for name, state in expired:
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        raw_path = archive_dir / f"{name}.csv"
+        final_path = archive_dir / f"{name}.csv.gz"
+
+        if state != "detached":
+            await _detach(table, name, state)
+
+        # A partição destacada é uma tabela comum: exportar não trava ``table``
+        async with engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            await raw.driver_connection.copy_from_table(
+                name, output=str(raw_path), format="csv", header=True,
+            )
+        await loop.run_in_executor(None, _gzip_file, raw_path, final_path)
+
+        # Só remove depois que o arquivo foi escrito com sucesso
+        async with engine.begin() as conn:
+            await conn.execute(text(f'DROP TABLE "{name}"'))
+
+        archived.append(name)
+        logger.info("Partição %s arquivada em %s e removida", name, final_path)
+
+    return archived
+
+
+# ── Pontos de entrada ──────────────────────────────────────────
+
+async def ensure_all_partitions() -> list[str]:
+    """Cria as partições futuras; devolve as tabelas já particionadas.
+
+    É o que a migração do schema roda — nada de retenção no caminho de boot.
+    """
+    partitioned: list[str] = []
+    for table in PARTITIONED_TABLES:
+        async with engine.begin() as conn:
+            kind = await _relkind(conn, table)
+            if kind == "r":
+                logger.warning(
+                    "Tabela %s ainda não é particionada — rode "
+                    "`python -m backend.models.partitions migrate`",
+                    table,
+                )
+                continue
+            if kind != "p":
+                continue
+            await ensure_partitions(conn, table)
+        partitioned.append(table)
+    return partitioned
+
+
+async def maintain_partitions() -> None:
+    """Cria partições futuras e aplica a retenção nas tabelas já particionadas."""
+    for table in await ensure_all_partitions():
+        await apply_retention(table)
+
+
+async def run_partition_maintenance() -> None:
+    """Loop de background da manutenção de partições (primeira rodada logo no startup)."""
+    while True:
+        try:
+            await maintain_partitions()
+        except Exception as exc:
+            logger.warning("Falha na manutenção de partições: %s", exc)
+        await asyncio.sleep(settings.PARTITION_MAINTENANCE_INTERVAL_SECONDS)
+
+
+async def _migrate_all() -> None:
+    for table in PARTITIONED_TABLES:
+        async with engine.begin() as conn:
+            await migrate_to_partitioned(conn, table)
+    await ensure_all_partitions()
+
+
+def main(argv: list[str]) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+    commands = {"migrate": _migrate_all, "maintain": maintain_partitions}
+    if len(argv) != 1 or argv[0] not in commands:
+        print("Uso: python -m backend.models.partitions [migrate|maintain]")
+        return 2
+    asyncio.run(commands[argv[0]]())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
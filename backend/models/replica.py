@@ -0,0 +1,136 @@
+"""Roteamento de leituras para a réplica, com fallback pelo atraso de replicação.
+
+Com ``DATABASE_READ_URL`` configurada, as consultas que toleram dados
+alguns segundos atrasados — retrieval vetorial do chat, histórico de
+conversas e polling de status de jobs — usam :func:`read_session`, ligada à
+réplica. Escritas continuam em ``AsyncSessionMaker`` (primário).
+
+Um loop de background mede o atraso da réplica a cada
+``DB_REPLICA_CHECK_SECONDS``: lê a posição atual do WAL no primário e, se a
+réplica ainda não reaplicou até ali, o atraso é o tempo desde a última
+transação reaplicada. Comparar com o primário (e não só o que a réplica
+recebeu com o que reaplicou) pega também uma réplica cujo WAL receiver caiu.
+Se o atraso passar de ``DB_REPLICA_MAX_LAG_SECONDS`` ou a réplica não
+responder, :func:`read_session` devolve sessões do
+primário até a próxima medição boa. Até a primeira medição as leituras
+também ficam no primário.
+
+Leituras de algo recém-criado (o job que acabou de ser disparado, a
+conversa recém-aberta) podem não estar na réplica ainda: as rotas usam
+:func:`uses_replica` para repetir a consulta no primário quando não acham
+o registro.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+from typing import Any, AsyncGenerator
+
+from sqlalchemy import text
+
+from backend.core.config import get_settings
+from backend.core.metrics import register_metrics_source
+from backend.models.database import AsyncSession, AsyncSessionMaker, engine, read_engine
+
+
+settings = get_settings()
+logger = logging.getLogger("copiloto-farma.replica")
+
+_PRIMARY_LSN_SQL = text("SELECT pg_current_wal_lsn()::text")
+
+# 0 fora de recovery (réplica lógica) ou quando a réplica já reaplicou até a
+# posição lida no primário; senão, o tempo desde a última transação
+# reaplicada (NULL = nunca reaplicou nada: conta como indisponível)
+_LAG_SQL = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_wal_lsn_diff(CAST(:primary_lsn AS pg_lsn), pg_last_wal_replay_lsn()) <= 0 THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+    """
+)
+
+_state: dict[str, Any] = {
+    "configured": read_engine is not None,
+    "healthy": False,
+    "lag_seconds": None,
+    "checks": 0,
+    "failures": 0,
+    "fallbacks": 0,
+    "read_sessions": {"replica": 0, "primary": 0},
+}
+
+
+def replica_available() -> bool:
+    return read_engine is not None and _state["healthy"]
+
+
+def read_session() -> AsyncSession:
+    """Sessão só de leitura: réplica se estiver em dia, senão o primário."""
+    if replica_available():
+        _state["read_sessions"]["replica"] += 1
+        return AsyncSessionMaker(bind=read_engine)
+    _state["read_sessions"]["primary"] += 1
+    return AsyncSessionMaker()
+
+
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    async with read_session() as session:
+        yield session
+
+
+def uses_replica(session: AsyncSession) -> bool:
+    return session.bind is not engine
+
+
+async def check_replica() -> float:
+    """Mede o atraso da réplica (segundos) e atualiza o roteamento."""
+    assert read_engine is not None
+    _state["checks"] += 1
+    try:
+        # Primário primeiro: uma réplica em dia já terá passado dessa posição
+        async with engine.connect() as conn:
+            primary_lsn = await conn.scalar(_PRIMARY_LSN_SQL)
+        async with read_engine.connect() as conn:
+            value = await conn.scalar(_LAG_SQL, {"primary_lsn": primary_lsn})
+    except Exception:
+        _state["failures"] += 1
+        _set_healthy(False, None, "réplica indisponível")
+        raise
+    if value is None:
+        _set_healthy(False, None, "réplica ainda não reaplicou WAL")
+        return math.inf
+    lag = float(value)
+    healthy = lag <= settings.DB_REPLICA_MAX_LAG_SECONDS
+    _set_healthy(healthy, lag, f"atraso de {lag:.1f}s")
+    return lag
+
+
+def _set_healthy(healthy: bool, lag: float | None, reason: str) -> None:
+    _state["lag_seconds"] = None if lag is None else round(lag, 3)
+    if healthy == _state["healthy"]:
+        return
+    _state["healthy"] = healthy
+    if healthy:
+        logger.info("Leituras voltaram para a réplica (%s).", reason)
+    else:
+        _state["fallbacks"] += 1
+        logger.warning("Leituras desviadas para o primário (%s).", reason)
+
+
+async def run_replica_monitor() -> None:
+    """Loop de background do startup; não faz nada sem ``DATABASE_READ_URL``."""
+    if read_engine is None:
+        return
+    while True:
+        try:
+            await check_replica()
+        except Exception as exc:
+            logger.debug("Falha ao medir o atraso da réplica: %s", exc)
+        await asyncio.sleep(settings.DB_REPLICA_CHECK_SECONDS)
+
+
+register_metrics_source("replica", lambda: {**_state, "read_sessions": dict(_state["read_sessions"])})
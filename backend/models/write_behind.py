@@ -0,0 +1,259 @@
+"""Persistência write-behind das mensagens do chat.
+
+O ``/chat`` não grava mais conversa e mensagens dentro da requisição: só
+enfileira o turno. Um worker único junta os turnos de todas as requisições e
+grava em lote (upsert multi-linha de ``conversations`` + insert multi-linha
+de ``messages``) quando o lote enche ou o intervalo vence.
+
+A fila é limitada: quando cheia, ``enqueue`` espera um pouco
+(backpressure) e, se ainda assim não houver espaço, descarta o turno e
+conta em ``dropped``. Lotes que falham são re-tentados; o que não puder ser
+gravado no shutdown vai para um arquivo JSONL e é reprocessado no próximo
+startup.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import func, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from backend.core.config import get_settings
+from backend.core.metrics import register_metrics_source
+from backend.models.database import AsyncSessionMaker, Conversation, MessageRecord
+
+
+settings = get_settings()
+logger = logging.getLogger("copiloto-farma.write-behind")
+
+FLUSH_RETRIES = 3
+
+
+@dataclass(slots=True)
+class ChatTurn:
+    conversation_id: str
+    tenant_id: str
+    user_message: str
+    assistant_message: str
+    created_at: datetime
+
+
+class ChatPersistenceQueue:
+    def __init__(
+        self,
+        *,
+        max_queue: int,
+        batch_size: int,
+        flush_interval: float,
+        enqueue_timeout: float,
+        spill_path: Path,
+    ) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.spill_path = spill_path
+
+        self._queue: asyncio.Queue[ChatTurn] = asyncio.Queue(maxsize=max_queue)
+        self._worker: asyncio.Task | None = None
+        self._stopping = False
+
+        self.enqueued = 0
+        self.flushed = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failed = 0
+        self.spilled = 0
+        self.replayed = 0
+
+    # ── API usada pelas rotas ──────────────────────────────────
+
+    async def enqueue(self, turn: ChatTurn) -> bool:
+        """Enfileira um turno; retorna False se foi descartado por falta de espaço."""
+        if self._stopping:
+            self._spill([turn])
+            return False
+        try:
+            self._queue.put_nowait(turn)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(turn), timeout=self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                self.dropped += 1
+                logger.warning(
+                    "Fila de persistência cheia — turno descartado (conversa=%s)",
+                    turn.conversation_id,
+                )
+                return False
+        self.enqueued += 1
+        return True
+
+    # ── Ciclo de vida ──────────────────────────────────────────
+
+    async def start(self) -> None:
+        self._stopping = False
+        self._replay_spill()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Drena a fila gravando o que der; o restante vai para o spill em disco."""
+        self._stopping = True
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        pending: list[ChatTurn] = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            if not await self._flush_with_retry(batch):
+                self._spill(batch)
+
+    # ── Worker ─────────────────────────────────────────────────
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: list[ChatTurn] = []
+            try:
+                batch.append(await self._queue.get())
+                deadline = loop.time() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout=timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                ok = await self._flush_with_retry(batch)
+            except asyncio.CancelledError:
+                # Lote em formação ou em andamento durante o shutdown: os turnos
+                # já saíram da fila, então só o spill em disco os preserva
+                self._spill(batch)
+                raise
+            if not ok:
+                self.failed += len(batch)
+                self._spill(batch)
+
+    async def _flush_with_retry(self, batch: list[ChatTurn]) -> bool:
+        for attempt in range(1, FLUSH_RETRIES + 1):
+            try:
+                await self._flush(batch)
+                return True
+            except Exception as exc:
+                logger.warning(
+                    "Falha ao gravar lote de %d turnos (tentativa %d/%d): %s",
+                    len(batch), attempt, FLUSH_RETRIES, exc,
+                )
+                if attempt < FLUSH_RETRIES:
+                    await asyncio.sleep(attempt)
+        logger.error("Lote de %d turnos não gravado após %d tentativas", len(batch), FLUSH_RETRIES)
+        return False
+
+    async def _flush(self, batch: list[ChatTurn]) -> None:
+        # Uma linha por conversa: ON CONFLICT não pode tocar a mesma linha duas vezes
+        conversations = {t.conversation_id: t.tenant_id for t in batch}
+        conv_stmt = pg_insert(Conversation).values(
+            [{"id": cid, "tenant_id": tid} for cid, tid in conversations.items()]
+        )
+        conv_stmt = conv_stmt.on_conflict_do_update(
+            index_elements=[Conversation.id],
+            set_={"updated_at": func.now()},
+        )
+
+        # created_at explícito preserva a ordem pergunta → resposta no lote
+        rows: list[dict] = []
+        for t in batch:
+            rows.append({
+                "conversation_id": t.conversation_id,
+                "role": "user",
+                "content": t.user_message,
+                "created_at": t.created_at,
+            })
+            rows.append({
+                "conversation_id": t.conversation_id,
+                "role": "assistant",
+                "content": t.assistant_message,
+                "created_at": t.created_at + timedelta(microseconds=1),
+            })
+
+        async with AsyncSessionMaker() as session:
+            await session.execute(conv_stmt)
+            await session.execute(insert(MessageRecord), rows)
+            await session.commit()
+
+        self.batches += 1
+        self.flushed += len(batch)
+
+    # ── Spill em disco ─────────────────────────────────────────
+
+    def _spill(self, turns: list[ChatTurn]) -> None:
+        if not turns:
+            return
+        try:
+            self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.spill_path.open("a", encoding="utf-8") as f:
+                for t in turns:
+                    record = asdict(t)
+                    record["created_at"] = t.created_at.isoformat()
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.spilled += len(turns)
+            logger.warning("%d turnos salvos em %s para reprocessar", len(turns), self.spill_path)
+        except OSError as exc:
+            self.failed += len(turns)
+            logger.error("Falha ao salvar spill de persistência: %s", exc)
+
+    def _replay_spill(self) -> None:
+        if not self.spill_path.exists():
+            return
+        lines = self.spill_path.read_text(encoding="utf-8").splitlines()
+        self.spill_path.unlink()
+
+        for line in lines:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            record["created_at"] = datetime.fromisoformat(record["created_at"])
+            turn = ChatTurn(**record)
+            try:
+                self._queue.put_nowait(turn)
+                self.replayed += 1
+            except asyncio.QueueFull:
+                self._spill([turn])
+        if self.replayed:
+            logger.info("%d turnos do spill reenfileirados", self.replayed)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+        }
+
+
+chat_persistence = ChatPersistenceQueue(
+    max_queue=settings.PERSIST_QUEUE_MAX,
+    batch_size=settings.PERSIST_BATCH_SIZE,
+    flush_interval=settings.PERSIST_FLUSH_INTERVAL_SECONDS,
+    enqueue_timeout=settings.PERSIST_ENQUEUE_TIMEOUT_SECONDS,
+    spill_path=Path(settings.PERSIST_SPILL_PATH),
+)
+
+register_metrics_source("chat_persistence", chat_persistence.stats)
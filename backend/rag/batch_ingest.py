@@ -0,0 +1,303 @@
+"""Ingestão em lote: muitas URLs e/ou arquivos como um único job.
+
+O job reaproveita ``onboarding_jobs`` para o progresso agregado
+(``pages_found`` = itens, ``pages_processed`` = itens concluídos,
+``chunks_total``) e guarda o resultado de cada item em
+``ingest_batch_items``, consultável em ``GET /ingest/batch/{job_id}``.
+
+Até ``INGEST_BATCH_CONCURRENCY`` itens são baixados, extraídos e chunkados
+ao mesmo tempo (download em thread, parsing no pool de processos). Os
+chunks de itens diferentes são acumulados e embedados juntos, em chamadas
+de até ``INGEST_BATCH_EMBED_SIZE`` textos, em vez de uma chamada por
+página. PDFs seguem pelo pipeline em streaming de ``pdf_pipeline``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import os
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlalchemy import update
+
+from backend.core.config import get_settings
+from backend.models.database import AsyncSession, AsyncSessionMaker, IngestBatchItem, OnboardingJob
+from backend.rag.chunker import Chunk, chunk_document_async
+from backend.rag.crawler import embed_with_retry, update_job
+from backend.rag.html_extract import extract_page_async
+from backend.rag.ingestor import ingest_chunks, scrape_url_text_async
+from backend.rag.pdf_pipeline import ingest_pdf_file
+
+
+settings = get_settings()
+logger = logging.getLogger("copiloto-farma.batch-ingest")
+
+FILE_SUFFIXES = {".pdf", ".html", ".htm", ".txt", ".md"}
+
+
+@dataclass(slots=True)
+class BatchItem:
+    position: int
+    source: str  # URL ou nome original do arquivo
+    kind: str  # "url" | "file"
+    path: str | None = None  # arquivo temporário, quando kind == "file"
+    pages: int | None = None  # PDFs: páginas contadas (e cobradas) na rota
+
+    @property
+    def suffix(self) -> str:
+        return Path(self.source).suffix.lower() if self.kind == "file" else ""
+
+
+@dataclass(slots=True)
+class _Prepared:
+    item: BatchItem
+    chunks: list[Chunk]
+
+
+async def create_batch_job(
+    session: AsyncSession,
+    *,
+    tenant_id: str,
+    items: list[BatchItem],
+) -> str:
+    job_id = str(uuid.uuid4())
+    session.add(
+        OnboardingJob(
+            id=job_id,
+            tenant_id=tenant_id,
+            root_url=items[0].source[:2048],
+            product_name=f"Lote: {len(items)} itens",
+            status="pending",
+            pages_found=len(items),
+            pages_processed=0,
+            chunks_total=0,
+        )
+    )
+    session.add_all(
+        IngestBatchItem(
+            job_id=job_id,
+            position=item.position,
+            source=item.source[:2048],
+            kind=item.kind,
+            status="pending",
+            chunks=0,
+        )
+        for item in items
+    )
+    await session.commit()
+    return job_id
+
+
+async def _update_item(job_id: str, position: int, **fields) -> None:
+    async with AsyncSessionMaker() as session:
+        stmt = (
+            update(IngestBatchItem)
+            .where(IngestBatchItem.job_id == job_id, IngestBatchItem.position == position)
+            .values(**fields)
+        )
+        await session.execute(stmt)
+        await session.commit()
+
+
+async def _prepare(item: BatchItem) -> list[Chunk]:
+    """Baixa/lê, extrai e chunka um item que não é PDF."""
+    if item.kind == "url":
+        return await chunk_document_async(await scrape_url_text_async(item.source))
+
+    loop = asyncio.get_running_loop()
+    raw = await loop.run_in_executor(
+        None, lambda: Path(item.path).read_text(encoding="utf-8", errors="replace")
+    )
+    if item.suffix in (".html", ".htm"):
+        raw = (await extract_page_async(raw)).text
+    return await chunk_document_async(raw)
+
+
+class _BatchRun:
+    def __init__(self, job_id: str, tenant_id: str, items: list[BatchItem]) -> None:
+        self.job_id = job_id
+        self.tenant_id = tenant_id
+        self.items = items
+        self.queue: asyncio.Queue[_Prepared | None] = asyncio.Queue(
+            maxsize=settings.INGEST_BATCH_CONCURRENCY * 2
+        )
+        self.semaphore = asyncio.Semaphore(settings.INGEST_BATCH_CONCURRENCY)
+        self.processed = 0
+        self.failed = 0
+        self.chunks_total = 0
+
+    async def _finish(self, item: BatchItem, *, chunks: int = 0, error: str | None = None) -> None:
+        self.processed += 1
+        self.chunks_total += chunks
+        if error is not None:
+            self.failed += 1
+        await _update_item(
+            self.job_id,
+            item.position,
+            status="failed" if error is not None else "completed",
+            chunks=chunks,
+            error_message=error[:500] if error else None,
+            finished_at=datetime.now(timezone.utc),
+        )
+        await update_job(
+            self.job_id,
+            pages_processed=self.processed,
+            chunks_total=self.chunks_total,
+        )
+
+    async def _produce(self, item: BatchItem) -> None:
+        chunks: list[Chunk] = []
+        try:
+            async with self.semaphore:
+                if item.suffix == ".pdf":
+                    result = await ingest_pdf_file(
+                        tenant_id=self.tenant_id, path=item.path, source_url=item.source,
+                        total_pages=item.pages,
+                    )
+                    await self._finish(item, chunks=result.chunks_ingested)
+                    return
+                chunks = await _prepare(item)
+        except Exception as exc:
+            logger.warning("Lote [%s] — falha em %s: %s", self.job_id, item.source, exc)
+            await self._finish(item, error=str(exc))
+            return
+        finally:
+            # Também quando o produtor é cancelado ainda na fila do semáforo
+            if item.path:
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(item.path)
+
+        if chunks:
+            await self.queue.put(_Prepared(item, chunks))
+        else:
+            await self._finish(item)
+
+    async def _consume(self) -> None:
+        loop = asyncio.get_running_loop()
+        pending: list[_Prepared] = []
+        pending_chunks = 0
+
+        while True:
+            try:
+                prepared = await asyncio.wait_for(
+                    self.queue.get(), timeout=settings.INGEST_BATCH_FLUSH_SECONDS,
+                )
+            except asyncio.TimeoutError:
+                # Nada novo chegou: grava o que já acumulou
+                if pending:
+                    await self._flush(loop, pending)
+                    pending, pending_chunks = [], 0
+                continue
+            if prepared is None:
+                break
+
+            pending.append(prepared)
+            pending_chunks += len(prepared.chunks)
+            if pending_chunks >= settings.INGEST_BATCH_EMBED_SIZE:
+                await self._flush(loop, pending)
+                pending, pending_chunks = [], 0
+
+        if pending:
+            await self._flush(loop, pending)
+
+    async def _flush(self, loop: asyncio.AbstractEventLoop, group: list[_Prepared]) -> None:
+        texts = [c.text for p in group for c in p.chunks]
+        size = settings.INGEST_BATCH_EMBED_SIZE
+        try:
+            embeddings: list[list[float]] = []
+            for start in range(0, len(texts), size):
+                embeddings.extend(
+                    await embed_with_retry(
+                        loop, texts[start:start + size], self.job_id, f"lote de {len(group)} itens",
+                    )
+                )
+        except Exception as exc:
+            for p in group:
+                await self._finish(p.item, error=f"Falha no embedding: {exc}")
+            return
+
+        offset = 0
+        async with AsyncSessionMaker() as session:
+            for p in group:
+                n = len(p.chunks)
+                try:
+                    await ingest_chunks(
+                        session,
+                        tenant_id=self.tenant_id,
+                        chunks=p.chunks,
+                        source_url=p.item.source,
+                        embeddings=embeddings[offset:offset + n],
+                    )
+                except Exception as exc:
+                    await session.rollback()
+                    await self._finish(p.item, error=str(exc))
+                else:
+                    await self._finish(p.item, chunks=n)
+                offset += n
+
+        logger.info(
+            "Lote [%s] — %d itens, %d chunks embedados em %d chamada(s)",
+            self.job_id, len(group), len(texts), -(-len(texts) // size),
+        )
+
+    async def _unless_consumer_fails(self, consumer: asyncio.Task, awaitable) -> None:
+        """Espera ``awaitable``, mas desiste se o consumidor morrer antes.
+
+        A fila é limitada: sem consumidor, um ``queue.put`` nunca voltaria e o
+        job ficaria ``running`` (segurando o slot de admissão).
+        """
+        task = asyncio.ensure_future(awaitable)
+        await asyncio.wait({task, consumer}, return_when=asyncio.FIRST_COMPLETED)
+        if task.done():
+            task.result()
+            return
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        consumer.result()  # levanta o erro do consumidor
+        raise RuntimeError("Consumidor do lote terminou antes dos produtores")
+
+    async def run(self) -> None:
+        consumer = asyncio.create_task(self._consume())
+        try:
+            await self._unless_consumer_fails(
+                consumer, asyncio.gather(*(self._produce(item) for item in self.items))
+            )
+            await self._unless_consumer_fails(consumer, self.queue.put(None))
+            await consumer
+        finally:
+            consumer.cancel()
+
+
+async def run_batch_job(job_id: str, tenant_id: str, items: list[BatchItem]) -> None:
+    """Background task de ``/ingest/batch``."""
+    logger.info("Lote [%s] iniciado — tenant=%s, %d itens", job_id, tenant_id, len(items))
+    await update_job(job_id, status="running", started_at=datetime.now(timezone.utc))
+
+    batch = _BatchRun(job_id, tenant_id, items)
+    try:
+        await batch.run()
+    except Exception as exc:
+        logger.exception("Lote [%s] falhou: %s", job_id, exc)
+        await update_job(
+            job_id,
+            status="failed",
+            error_message=str(exc)[:500],
+            finished_at=datetime.now(timezone.utc),
+        )
+        return
+
+    await update_job(
+        job_id,
+        status="completed",
+        error_message=f"{batch.failed} item(ns) com falha" if batch.failed else None,
+        finished_at=datetime.now(timezone.utc),
+    )
+    logger.info(
+        "Lote [%s] concluído — %d itens (%d com falha), %d chunks",
+        job_id, batch.processed, batch.failed, batch.chunks_total,
+    )
@@ -0,0 +1,374 @@
+"""Chunking estrutural medido com o tokenizer do modelo de embedding.
+
+O texto extraído (HTML via ``html_extract``, PDF via ``pypdf``) é dividido
+em seções pelos títulos — linhas ``# Título`` marcadas na extração de HTML
+e, em PDFs, títulos numerados (``2.1 Cadastro de produtos``). Os blocos
+(parágrafos, itens de lista, linhas de tabela) são empacotados em chunks de
+até ``CHUNK_MAX_TOKENS`` tokens, contados com o tokenizer do modelo Voyage.
+
+Os blocos são empacotados gulosamente até o limite: seções pequenas
+vizinhas dividem o mesmo chunk. O corte recua para uma fronteira de seção
+(ou, em PDFs, de página — ``\\f``) só quando o chunk já está quase cheio;
+senão a seção é cortada no meio, as primeiras frases do bloco seguinte
+completam o chunk e o próximo repete os últimos blocos do anterior (até
+``CHUNK_OVERLAP_TOKENS``) com o caminho de títulos como primeira linha.
+Cada chunk carrega o caminho de títulos em ``heading_path``.
+
+Tokenizar é CPU e o primeiro uso do tokenizer o baixa do Hugging Face: o
+código async usa :func:`chunk_document_async`, que roda numa thread, e o
+warmup carrega o tokenizer antes da primeira ingestão. Com
+``EMBEDDING_PROVIDER=hashing`` (offline) a contagem é sempre a estimativa.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import re
+import threading
+from dataclasses import dataclass
+
+from backend.core.config import get_settings
+
+
+settings = get_settings()
+logger = logging.getLogger("copiloto-farma.chunker")
+
+PAGE_BREAK = "\f"
+HEADING_SEPARATOR = " > "
+
+_MD_HEADING = re.compile(r"^(#{1,6})\s+(.+)$")
+# "3 Vendas", "2.1 Cadastro de produtos", "4.2.1. Estorno" — curtos e sem ponto final
+_NUMBERED_HEADING = re.compile(r"^(\d{1,2}(?:\.\d{1,2}){0,3})\.?\s+([A-ZÀ-Ý][^.:;!?]{1,78})$")
+_SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+")
+# Estimativa quando o tokenizer não está disponível: BPE quebra palavras em
+# pedaços de ~4 caracteres e cada pontuação vira um token
+_APPROX_PIECE = re.compile(r"\w{1,4}|[^\w\s]")
+
+
+@dataclass(slots=True)
+class Chunk:
+    text: str
+    heading_path: tuple[str, ...] = ()
+    tokens: int = 0
+
+    @property
+    def heading(self) -> str | None:
+        return HEADING_SEPARATOR.join(self.heading_path) or None
+
+
+@dataclass(slots=True)
+class _Unit:
+    text: str
+    path: tuple[str, ...]
+    tokens: int = 0
+    is_heading: bool = False
+    page_break: bool = False  # primeira linha de uma nova página
+
+
+# ── Tokenizer ──────────────────────────────────────────────────
+
+_tokenizer_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=1)
+def _load_tokenizer():
+    # O provedor hashing roda sem rede: nada de baixar (e re-tentar) o tokenizer
+    if settings.CHUNK_TOKENIZER != "voyage" or settings.EMBEDDING_PROVIDER == "hashing":
+        return None
+    try:
+        from tokenizers import Tokenizer
+
+        tokenizer = Tokenizer.from_pretrained(f"voyageai/{settings.VOYAGE_MODEL_NAME}")
+        tokenizer.no_truncation()
+        return tokenizer
+    except Exception as exc:
+        logger.warning(
+            "Tokenizer de %s indisponível (%s) — usando estimativa de tokens",
+            settings.VOYAGE_MODEL_NAME, exc,
+        )
+        return None
+
+
+def _tokenizer():
+    # Várias threads do executor podem chegar aqui antes do primeiro download
+    with _tokenizer_lock:
+        return _load_tokenizer()
+
+
+def load_tokenizer() -> bool:
+    """Carrega o tokenizer (chamado no warmup, numa thread); retorna se está disponível."""
+    return _tokenizer() is not None
+
+
+def count_tokens(texts: list[str]) -> list[int]:
+    """Número de tokens de cada texto para o modelo de embedding configurado."""
+    if not texts:
+        return []
+    tokenizer = _tokenizer()
+    if tokenizer is None:
+        return [len(_APPROX_PIECE.findall(t)) for t in texts]
+    return [len(enc.ids) for enc in tokenizer.encode_batch(texts, add_special_tokens=False)]
+
+
+@functools.lru_cache(maxsize=1)
+def _separator_tokens() -> int:
+    """Tokens que a quebra de linha entre dois blocos acrescenta (0 na estimativa)."""
+    joined, first, second = count_tokens(["Cadastro\nProduto", "Cadastro", "Produto"])
+    return max(0, joined - first - second)
+
+
+def _provider_max_tokens() -> int:
+    """Limite de tokens por texto do provedor de embedding (sem instanciar o provedor)."""
+    from backend.rag.embeddings import provider_max_tokens
+
+    return provider_max_tokens() or settings.CHUNK_MAX_TOKENS
+
+
+# ── Estrutura ──────────────────────────────────────────────────
+
+def _parse_units(text: str, *, numbered_headings: bool) -> list[_Unit]:
+    units: list[_Unit] = []
+    stack: list[tuple[int, str]] = []  # (nível, título)
+    page_break = False
+
+    for page_index, page in enumerate(text.split(PAGE_BREAK)):
+        page_break = page_index > 0
+        for raw in page.splitlines():
+            line = raw.strip()
+            if not line:
+                continue
+
+            level, title = 0, ""
+            if match := _MD_HEADING.match(line):
+                level, title = len(match.group(1)), match.group(2).strip()
+            elif numbered_headings and (match := _NUMBERED_HEADING.match(line)):
+                level, title = match.group(1).count(".") + 1, line
+
+            if level:
+                while stack and stack[-1][0] >= level:
+                    stack.pop()
+                stack.append((level, title))
+                units.append(_Unit(title, tuple(t for _, t in stack), is_heading=True, page_break=page_break))
+            else:
+                units.append(_Unit(line, tuple(t for _, t in stack), page_break=page_break))
+            page_break = False
+
+    for unit, tokens in zip(units, count_tokens([u.text for u in units])):
+        unit.tokens = tokens
+    return units
+
+
+def _hard_split(word: str, tokens: int, max_tokens: int) -> list[tuple[str, int]]:
+    """Corta uma "palavra" maior que o limite (base64, hash, URL longa) por caracteres."""
+    if tokens <= max_tokens or len(word) <= 1:
+        return [(word, tokens)]
+    step = max(1, len(word) * max_tokens // tokens)
+    parts = [word[i:i + step] for i in range(0, len(word), step)]
+    out: list[tuple[str, int]] = []
+    for part, part_tokens in zip(parts, count_tokens(parts)):
+        out.extend(_hard_split(part, part_tokens, max_tokens))
+    return out
+
+
+def _split_oversized(unit: _Unit, max_tokens: int) -> list[_Unit]:
+    """Quebra um bloco maior que o limite em frases, palavras e, se preciso, caracteres."""
+    pieces: list[_Unit] = []
+    sentences = _SENTENCE_END.split(unit.text)
+    for sentence, tokens in zip(sentences, count_tokens(sentences)):
+        if tokens <= max_tokens:
+            pieces.append(_Unit(sentence, unit.path, tokens))
+            continue
+        words = sentence.split()
+        current: list[str] = []
+        current_tokens = 0
+        split_words = [
+            part
+            for word, word_tokens in zip(words, count_tokens(words))
+            for part in _hard_split(word, word_tokens, max_tokens)
+        ]
+        for word, word_tokens in split_words:
+            if current and current_tokens + word_tokens > max_tokens:
+                pieces.append(_Unit(" ".join(current), unit.path, current_tokens))
+                current, current_tokens = [], 0
+            current.append(word)
+            current_tokens += word_tokens
+        if current:
+            pieces.append(_Unit(" ".join(current), unit.path, current_tokens))
+
+    # Junta frases pequenas de volta até o limite
+    merged: list[_Unit] = []
+    for piece in pieces:
+        if merged and merged[-1].tokens + piece.tokens + 1 <= max_tokens:
+            merged[-1].text += " " + piece.text
+            merged[-1].tokens += piece.tokens + 1
+        else:
+            merged.append(piece)
+    if merged:
+        merged[0].page_break = unit.page_break
+    return merged
+
+
+def _split_to_fit(unit: _Unit, room: int) -> tuple[_Unit | None, _Unit]:
+    """Divide o bloco em frases: as primeiras que cabem em ``room`` e o resto."""
+    sentences = _SENTENCE_END.split(unit.text)
+    if unit.is_heading or len(sentences) < 2 or room <= 0:
+        return None, unit
+    taken, total = 0, 0
+    for tokens in count_tokens(sentences):
+        tokens += 1 if taken else 0  # o espaço entre as frases
+        if total + tokens > room:
+            break
+        taken, total = taken + 1, total + tokens
+    if not taken or taken == len(sentences):
+        return None, unit
+    head_text, rest_text = " ".join(sentences[:taken]), " ".join(sentences[taken:])
+    head_tokens, rest_tokens = count_tokens([head_text, rest_text])
+    if head_tokens > room:
+        return None, unit
+    return (
+        _Unit(head_text, unit.path, head_tokens, page_break=unit.page_break),
+        _Unit(rest_text, unit.path, rest_tokens),
+    )
+
+
+def _common_prefix(paths: list[tuple[str, ...]]) -> tuple[str, ...]:
+    prefix = paths[0]
+    for path in paths[1:]:
+        n = 0
+        while n < min(len(prefix), len(path)) and prefix[n] == path[n]:
+            n += 1
+        prefix = prefix[:n]
+    return prefix
+
+
+# ── Empacotamento ──────────────────────────────────────────────
+
+def chunk_document(
+    text: str,
+    *,
+    max_tokens: int | None = None,
+    overlap_tokens: int | None = None,
+    numbered_headings: bool = False,
+) -> list[Chunk]:
+    """Divide ``text`` em chunks seguindo títulos, páginas e blocos.
+
+    ``numbered_headings`` liga a detecção de títulos numerados (para PDFs,
+    que não trazem marcação de título).
+    """
+    if max_tokens is None:
+        max_tokens = min(settings.CHUNK_MAX_TOKENS, _provider_max_tokens())
+    if overlap_tokens is None:
+        overlap_tokens = settings.CHUNK_OVERLAP_TOKENS
+
+    sep = _separator_tokens()
+    breadcrumb_tokens: dict[tuple[str, ...], int] = {}
+
+    def breadcrumb(unit: _Unit) -> tuple[str, ...]:
+        # Títulos acima do primeiro bloco do chunk, para o chunk fazer sentido sozinho
+        return unit.path[:-1] if unit.is_heading else unit.path
+
+    def header_tokens(unit: _Unit) -> int:
+        path = breadcrumb(unit)
+        if not path:
+            return 0
+        if path not in breadcrumb_tokens:
+            breadcrumb_tokens[path] = count_tokens([HEADING_SEPARATOR.join(path)])[0] + sep
+        return breadcrumb_tokens[path]
+
+    # Blocos gigantes viram pedaços com folga para o overlap e o caminho de títulos
+    units: list[_Unit] = []
+    for unit in _parse_units(text, numbered_headings=numbered_headings):
+        piece_tokens = max(1, max_tokens - overlap_tokens - header_tokens(unit))
+        if unit.tokens > piece_tokens:
+            units.extend(_split_oversized(unit, piece_tokens))
+        else:
+            units.append(unit)
+    if not units:
+        return []
+
+    def size(block: list[_Unit]) -> int:
+        return sum(u.tokens + sep for u in block)
+
+    groups: list[list[_Unit]] = []
+    current: list[_Unit] = []
+    used = 0
+
+    for unit in units:
+        if current and used + unit.tokens + sep > max_tokens:
+            # Cortar aqui, no meio da seção, repete caminho de títulos e overlap
+            # no chunk seguinte; recuar até o último título (ou página) só vale
+            # se o espaço que sobra no chunk não passar desse custo
+            slack = 0 if unit.is_heading else header_tokens(unit) + overlap_tokens
+            cut = len(current)
+            for attr in ("is_heading", "page_break"):
+                for i in range(len(current) - 1, 0, -1):
+                    if getattr(current[i], attr):
+                        filled = header_tokens(current[0]) + size(current[:i])
+                        carried = header_tokens(current[i]) + size(current[i:])
+                        if filled >= max_tokens - slack and carried + unit.tokens + sep <= max_tokens:
+                            cut = i
+                        break
+                if cut < len(current):
+                    break
+            # Título não fica órfão no fim do chunk: desce junto com o conteúdo (se couber)
+            while (
+                cut > 1
+                and current[cut - 1].is_heading
+                and header_tokens(current[cut - 1]) + size(current[cut - 1:]) + unit.tokens + sep <= max_tokens
+            ):
+                cut -= 1
+
+            if cut == len(current):
+                # Corte no meio da seção: as primeiras frases do bloco completam o chunk
+                head, unit = _split_to_fit(unit, max_tokens - used - sep)
+                if head is not None:
+                    current.append(head)
+                    cut += 1
+
+            groups.append(current[:cut])
+            carry = current[cut:]
+            resumes = carry[0] if carry else unit
+
+            # Overlap só quando o corte caiu no meio de uma seção
+            overlap: list[_Unit] = []
+            if not resumes.is_heading:
+                budget = min(overlap_tokens, max_tokens - unit.tokens - sep - size(carry))
+                budget -= header_tokens(resumes)
+                for prev in reversed(groups[-1]):
+                    if prev.is_heading or prev.path != resumes.path or prev.tokens + sep > budget:
+                        break
+                    overlap.insert(0, prev)
+                    budget -= prev.tokens + sep
+
+            current = overlap + carry
+            used = header_tokens(current[0] if current else unit) + size(current)
+
+        if not current:
+            used = header_tokens(unit)
+        current.append(unit)
+        used += unit.tokens + sep
+
+    if current:
+        groups.append(current)
+
+    texts: list[str] = []
+    paths: list[tuple[str, ...]] = []
+    for group in groups:
+        lines = [u.text for u in group]
+        if header := breadcrumb(group[0]):
+            lines.insert(0, HEADING_SEPARATOR.join(header))
+        texts.append("\n".join(lines))
+        paths.append(_common_prefix([u.path for u in group]))
+
+    return [
+        Chunk(text=t, heading_path=p, tokens=n)
+        for t, p, n in zip(texts, paths, count_tokens(texts))
+    ]
+
+
+async def chunk_document_async(text: str, **kwargs) -> list[Chunk]:
+    """:func:`chunk_document` numa thread do executor, fora do event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(chunk_document, text, **kwargs))
@@ -0,0 +1,404 @@
+"""Conector do Confluence via REST API.
+
+Em vez de raspar o HTML renderizado página a página, o conector:
+
+1. lista o espaço (``GET /rest/api/content?spaceKey=...``), paginando por
+   ``_links.next``, só com ``version`` e ``ancestors`` — resposta leve;
+2. compara ``version.number`` com ``confluence_pages`` e separa as páginas
+   novas ou alteradas;
+3. busca os corpos em formato *storage* em lote, via CQL
+   (``/rest/api/content/search?cql=id in (...)&expand=body.storage``);
+4. extrai o texto no pool de processos, chunka, embeda em lote e, por
+   página e numa transação, troca os chunks antigos pelos novos e grava a
+   versão ingerida.
+
+Páginas que sumiram do espaço têm os chunks e o registro removidos
+(``prune``). Como o ``base_url`` é parâmetro, o conector roda igual
+contra um servidor stub local. Linha de comando::
+
+    python -m backend.rag.confluence --tenant farmacia-teste --space FARMA
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import re
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from backend.agents.answer_cache import answer_cache
+from backend.core.config import get_settings
+from backend.models.database import AsyncSessionMaker, ConfluencePage, Document
+from backend.rag.chunker import Chunk, chunk_document_async
+from backend.rag.crawler import embed_with_retry, update_job
+from backend.rag.html_extract import extract_page_async
+from backend.rag.ingestor import ingest_chunks
+
+if TYPE_CHECKING:
+    import requests
+
+
+settings = get_settings()
+logger = logging.getLogger("copiloto-farma.confluence")
+
+REQUEST_TIMEOUT = 60
+
+_HEADING_LINE = re.compile(r"^(#{1,5}) ", re.MULTILINE)
+
+
+@dataclass(slots=True)
+class PageRef:
+    id: str
+    title: str
+    version: int
+    ancestors: tuple[str, ...] = ()
+
+
+@dataclass(slots=True)
+class SyncResult:
+    space_key: str
+    pages_listed: int = 0
+    pages_changed: int = 0
+    pages_ingested: int = 0
+    pages_failed: int = 0
+    pages_removed: int = 0
+    chunks_total: int = 0
+    errors: list[str] = field(default_factory=list)
+
+
+class ConfluenceClient:
+    """Cliente síncrono mínimo da REST API (chamado via thread executor)."""
+
+    def __init__(
+        self,
+        base_url: str,
+        *,
+        user: str | None = None,
+        token: str | None = None,
+        session: requests.Session | None = None,
+    ) -> None:
+        import requests
+
+        self.base_url = base_url.rstrip("/")
+        self.session = session or requests.Session()
+        self.session.headers.update({"Accept": "application/json", "User-Agent": "copiloto-farma/0.1"})
+        if user and token:
+            self.session.auth = (user, token)
+        elif token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+
+    def _get(self, path_or_url: str, params: dict | None = None) -> dict:
+        url = path_or_url if path_or_url.startswith("http") else self.base_url + path_or_url
+        resp = self.session.get(url, params=params, timeout=REQUEST_TIMEOUT)
+        resp.raise_for_status()
+        return resp.json()
+
+    def _paginate(self, path: str, params: dict) -> list[dict]:
+        results: list[dict] = []
+        data = self._get(path, params)
+        while True:
+            results.extend(data.get("results", []))
+            next_link = (data.get("_links") or {}).get("next")
+            if not next_link or not data.get("results"):
+                return results
+            # "next" vem relativo ao contexto da instância (o próprio base_url)
+            data = self._get(self.base_url + next_link if next_link.startswith("/") else next_link)
+
+    def list_pages(self, space_key: str) -> list[PageRef]:
+        raw = self._paginate(
+            "/rest/api/content",
+            {
+                "spaceKey": space_key,
+                "type": "page",
+                "status": "current",
+                "limit": settings.CONFLUENCE_PAGE_LIMIT,
+                "expand": "version,ancestors",
+            },
+        )
+        return [
+            PageRef(
+                id=str(page["id"]),
+                title=page["title"],
+                version=int(page["version"]["number"]),
+                ancestors=tuple(a["title"] for a in page.get("ancestors", [])),
+            )
+            for page in raw
+        ]
+
+    def fetch_bodies(self, page_ids: list[str]) -> dict[str, str]:
+        """Corpos em formato storage (XHTML) de até ``CONFLUENCE_BODY_BATCH`` páginas."""
+        raw = self._paginate(
+            "/rest/api/content/search",
+            {
+                "cql": f"id in ({','.join(page_ids)})",
+                "limit": len(page_ids),
+                "expand": "body.storage",
+            },
+        )
+        return {str(page["id"]): page["body"]["storage"]["value"] for page in raw}
+
+    def page_url(self, page_id: str) -> str:
+        return f"{self.base_url}/pages/viewpage.action?pageId={page_id}"
+
+
+def default_client() -> ConfluenceClient:
+    if not settings.CONFLUENCE_BASE_URL:
+        raise RuntimeError("CONFLUENCE_BASE_URL não configurada.")
+    return ConfluenceClient(
+        settings.CONFLUENCE_BASE_URL,
+        user=settings.CONFLUENCE_USER,
+        token=settings.CONFLUENCE_TOKEN,
+    )
+
+
+async def _page_chunks(page: PageRef, body: str) -> list[Chunk]:
+    extracted = await extract_page_async(f"<html><body>{body}</body></html>")
+    # Os títulos do corpo ficam um nível abaixo do título da página
+    text = _HEADING_LINE.sub(lambda m: "#" + m.group(0), extracted.text)
+    chunks = await chunk_document_async(f"# {page.title}\n{text}")
+    return [
+        Chunk(text=c.text, heading_path=page.ancestors + c.heading_path, tokens=c.tokens)
+        for c in chunks
+    ]
+
+
+async def _store_page(
+    *,
+    tenant_id: str,
+    space_key: str,
+    page: PageRef,
+    source_url: str,
+    chunks: list[Chunk],
+    embeddings: list[list[float]],
+) -> None:
+    """Troca os chunks da página e grava a versão, tudo numa transação."""
+    upsert = pg_insert(ConfluencePage).values(
+        tenant_id=tenant_id,
+        page_id=page.id,
+        space_key=space_key,
+        title=page.title[:512],
+        version=page.version,
+        source_url=source_url,
+        chunks=len(chunks),
+    )
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[ConfluencePage.tenant_id, ConfluencePage.page_id],
+        set_={
+            "title": upsert.excluded.title,
+            "version": upsert.excluded.version,
+            "chunks": upsert.excluded.chunks,
+            "space_key": upsert.excluded.space_key,
+            "ingested_at": datetime.now(timezone.utc),
+        },
+    )
+
+    async with AsyncSessionMaker() as session:
+        await session.execute(
+            delete(Document).where(Document.tenant_id == tenant_id, Document.source_url == source_url)
+        )
+        await session.execute(upsert)
+        if chunks:
+            # ingest_chunks faz o commit (e invalida o cache de respostas)
+            await ingest_chunks(
+                session,
+                tenant_id=tenant_id,
+                chunks=chunks,
+                source_url=source_url,
+                embeddings=embeddings,
+            )
+        else:
+            await session.commit()
+            answer_cache.invalidate_tenant(tenant_id)
+
+
+async def _prune(tenant_id: str, space_key: str, live_ids: set[str]) -> int:
+    async with AsyncSessionMaker() as session:
+        result = await session.execute(
+            select(ConfluencePage.page_id, ConfluencePage.source_url).where(
+                ConfluencePage.tenant_id == tenant_id,
+                ConfluencePage.space_key == space_key,
+            )
+        )
+        gone = [(pid, url) for pid, url in result.all() if pid not in live_ids]
+        if not gone:
+            return 0
+        await session.execute(
+            delete(Document).where(
+                Document.tenant_id == tenant_id,
+                Document.source_url.in_([url for _, url in gone]),
+            )
+        )
+        await session.execute(
+            delete(ConfluencePage).where(
+                ConfluencePage.tenant_id == tenant_id,
+                ConfluencePage.page_id.in_([pid for pid, _ in gone]),
+            )
+        )
+        await session.commit()
+    answer_cache.invalidate_tenant(tenant_id)
+    return len(gone)
+
+
+async def sync_space(
+    *,
+    tenant_id: str,
+    space_key: str,
+    client: ConfluenceClient | None = None,
+    prune: bool = True,
+    job_id: str | None = None,
+) -> SyncResult:
+    """Sincroniza um espaço: ingere só páginas novas ou com versão nova."""
+    client = client or default_client()
+    loop = asyncio.get_running_loop()
+    result = SyncResult(space_key=space_key)
+
+    pages = await loop.run_in_executor(None, client.list_pages, space_key)
+    result.pages_listed = len(pages)
+
+    async with AsyncSessionMaker() as session:
+        rows = await session.execute(
+            select(ConfluencePage.page_id, ConfluencePage.version).where(
+                ConfluencePage.tenant_id == tenant_id
+            )
+        )
+        known = dict(rows.all())
+
+    changed = [p for p in pages if known.get(p.id) != p.version]
+    result.pages_changed = len(changed)
+    logger.info(
+        "Confluence %s — %d páginas, %d novas/alteradas",
+        space_key, len(pages), len(changed),
+    )
+    if job_id:
+        await update_job(job_id, pages_found=len(changed))
+
+    batch_size = settings.CONFLUENCE_BODY_BATCH
+    for start in range(0, len(changed), batch_size):
+        batch = changed[start:start + batch_size]
+        try:
+            bodies = await loop.run_in_executor(None, client.fetch_bodies, [p.id for p in batch])
+        except Exception as exc:
+            result.pages_failed += len(batch)
+            result.errors.append(f"corpos {batch[0].id}..{batch[-1].id}: {exc}")
+            logger.warning("Confluence %s — falha ao buscar corpos: %s", space_key, exc)
+            continue
+
+        prepared: list[tuple[PageRef, list[Chunk]]] = []
+        for page in batch:
+            if page.id not in bodies:
+                result.pages_failed += 1
+                result.errors.append(f"{page.id}: corpo não retornado")
+                continue
+            prepared.append((page, await _page_chunks(page, bodies[page.id])))
+
+        # Um embedding em lote para todas as páginas do lote
+        texts = [c.text for _, chunks in prepared for c in chunks]
+        embeddings: list[list[float]] = []
+        try:
+            for offset in range(0, len(texts), settings.INGEST_BATCH_EMBED_SIZE):
+                embeddings.extend(
+                    await embed_with_retry(
+                        loop,
+                        texts[offset:offset + settings.INGEST_BATCH_EMBED_SIZE],
+                        job_id or "confluence",
+                        f"{space_key} (lote de {len(prepared)} páginas)",
+                    )
+                )
+        except Exception as exc:
+            # Como na busca dos corpos: o lote falha, a sincronização segue
+            result.pages_failed += len(prepared)
+            result.errors.append(f"embedding {batch[0].id}..{batch[-1].id}: {exc}")
+            logger.warning("Confluence %s — falha no embedding do lote: %s", space_key, exc)
+            prepared = []
+
+        offset = 0
+        for page, chunks in prepared:
+            n = len(chunks)
+            try:
+                await _store_page(
+                    tenant_id=tenant_id,
+                    space_key=space_key,
+                    page=page,
+                    source_url=client.page_url(page.id),
+                    chunks=chunks,
+                    embeddings=embeddings[offset:offset + n],
+                )
+                result.pages_ingested += 1
+                result.chunks_total += n
+            except Exception as exc:
+                result.pages_failed += 1
+                result.errors.append(f"{page.id}: {exc}")
+                logger.warning("Confluence %s — falha ao gravar página %s: %s", space_key, page.id, exc)
+            offset += n
+
+        if job_id:
+            await update_job(
+                job_id,
+                pages_processed=result.pages_ingested + result.pages_failed,
+                chunks_total=result.chunks_total,
+            )
+
+    if prune:
+        result.pages_removed = await _prune(tenant_id, space_key, {p.id for p in pages})
+
+    logger.info(
+        "Confluence %s — %d ingeridas, %d com falha, %d removidas, %d chunks",
+        space_key, result.pages_ingested, result.pages_failed, result.pages_removed, result.chunks_total,
+    )
+    return result
+
+
+async def run_confluence_job(job_id: str, tenant_id: str, space_key: str, prune: bool) -> None:
+    """Background task de ``POST /ingest/confluence``."""
+    await update_job(job_id, status="running", started_at=datetime.now(timezone.utc))
+    try:
+        result = await sync_space(
+            tenant_id=tenant_id, space_key=space_key, prune=prune, job_id=job_id,
+        )
+    except Exception as exc:
+        logger.exception("Confluence [%s] falhou: %s", job_id, exc)
+        await update_job(
+            job_id,
+            status="failed",
+            error_message=str(exc)[:500],
+            finished_at=datetime.now(timezone.utc),
+        )
+        return
+
+    await update_job(
+        job_id,
+        status="completed",
+        error_message="; ".join(result.errors)[:500] or None,
+        finished_at=datetime.now(timezone.utc),
+    )
+
+
+def main(argv: list[str]) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Sincroniza um espaço do Confluence")
+    parser.add_argument("--tenant", required=True)
+    parser.add_argument("--space", required=True)
+    parser.add_argument("--base-url", default=settings.CONFLUENCE_BASE_URL)
+    parser.add_argument("--no-prune", action="store_true", help="não remove páginas que sumiram")
+    args = parser.parse_args(argv)
+
+    if not args.base_url:
+        print("Informe --base-url ou CONFLUENCE_BASE_URL.")
+        return 2
+    client = ConfluenceClient(args.base_url, user=settings.CONFLUENCE_USER, token=settings.CONFLUENCE_TOKEN)
+    result = asyncio.run(
+        sync_space(tenant_id=args.tenant, space_key=args.space, client=client, prune=not args.no_prune)
+    )
+    print(result)
+    return 1 if result.pages_failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
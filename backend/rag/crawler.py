@@ -3,21 +3,23 @@
 from __future__ import annotations
 
 import asyncio
+import functools
 import logging
 from datetime import datetime, timezone
 from typing import Set
 from urllib.parse import urljoin, urlparse
 
-import requests
-from bs4 import BeautifulSoup
 from sqlalchemy import update
 
+from backend.core.admission import admission
 from backend.models.database import AsyncSessionMaker, OnboardingJob
+from backend.rag.html_extract import extract_page_async
+from backend.rag.chunker import chunk_document_async
 from backend.rag.ingestor import (
-    chunk_text_tokens,
     embed_texts,
+    fetch_html,
     ingest_chunks,
-    scrape_url_text,
+    scrape_url_text_async,
 )
 
 
@@ -66,8 +68,13 @@ def _is_valid_link(href: str, base_domain: str) -> bool:
     return True
 
 
-def discover_links(root_url: str, max_pages: int) -> list[str]:
-    """Fetch root_url and discover internal links up to max_pages."""
+async def discover_links(root_url: str, max_pages: int) -> list[str]:
+    """Fetch root_url and discover internal links up to max_pages.
+
+    Downloads run on the default thread executor; HTML parsing runs on the
+    shared process pool (see ``backend.rag.html_extract``).
+    """
+    loop = asyncio.get_running_loop()
     parsed_root = urlparse(root_url)
     base_domain = parsed_root.netloc
 
@@ -90,20 +97,21 @@ def discover_links(root_url: str, max_pages: int) -> list[str]:
             break
 
         try:
-            resp = requests.get(
-                url,
-                timeout=REQUEST_TIMEOUT,
-                headers={"User-Agent": "copiloto-farma-crawler/0.1"},
+            html = await loop.run_in_executor(
+                None,
+                functools.partial(
+                    fetch_html,
+                    url,
+                    user_agent="copiloto-farma-crawler/0.1",
+                    timeout=REQUEST_TIMEOUT,
+                ),
             )
-            resp.raise_for_status()
+            page = await extract_page_async(html)
         except Exception as exc:
             logger.warning("Erro ao acessar %s: %s", url, exc)
             continue
 
-        soup = BeautifulSoup(resp.text, "html.parser")
-
-        for a_tag in soup.find_all("a", href=True):
-            href = a_tag["href"]
+        for href in page.links:
             full_url = urljoin(url, href)
 
             # Clean fragment
@@ -115,7 +123,7 @@ def discover_links(root_url: str, max_pages: int) -> list[str]:
     return discovered[:max_pages]
 
 
-async def _update_job(job_id: str, **fields) -> None:
+async def update_job(job_id: str, **fields) -> None:
     """Update onboarding job fields in a fresh session."""
     async with AsyncSessionMaker() as session:
         stmt = update(OnboardingJob).where(OnboardingJob.id == job_id).values(**fields)
@@ -123,7 +131,7 @@ async def _update_job(job_id: str, **fields) -> None:
         await session.commit()
 
 
-async def _embed_with_retry(loop, chunks: list[str], job_id: str, url: str) -> list[list[float]]:
+async def embed_with_retry(loop, chunks: list[str], job_id: str, url: str) -> list[list[float]]:
     """Embed texts with automatic retry on rate limit / transient errors."""
     for attempt in range(1, EMBED_MAX_RETRIES + 1):
         try:
@@ -150,18 +158,21 @@ async def run_onboarding(job_id: str, root_url: str, tenant_id: str, max_pages:
 
     logger.info("Onboarding [%s] iniciado — tenant=%s root=%s max=%d", job_id, tenant_id, root_url, max_pages)
 
-    await _update_job(
+    await update_job(
         job_id,
         status="running",
         started_at=datetime.now(timezone.utc),
     )
 
+    # A rota reservou max_pages na cota de ingestão; devolve o que não for usado
+    unused_pages = max_pages
     try:
-        # 1. Discover links (sync — runs in thread pool)
+        # 1. Discover links
         loop = asyncio.get_running_loop()
-        urls = await loop.run_in_executor(None, discover_links, root_url, max_pages)
+        urls = await discover_links(root_url, max_pages)
+        unused_pages = max_pages - len(urls)
 
-        await _update_job(job_id, pages_found=len(urls))
+        await update_job(job_id, pages_found=len(urls))
         logger.info("Onboarding [%s] — %d páginas encontradas", job_id, len(urls))
 
         pages_processed = 0
@@ -170,23 +181,23 @@ async def run_onboarding(job_id: str, root_url: str, tenant_id: str, max_pages:
         # 2. Process each URL
         for url in urls:
             try:
-                # Scrape in thread pool (sync requests)
-                text = await loop.run_in_executor(None, scrape_url_text, url)
+                # Fetch in thread pool, parse in process pool
+                text = await scrape_url_text_async(url)
 
                 if not text or len(text.strip()) < 50:
                     logger.debug("Onboarding [%s] — página vazia: %s", job_id, url)
                     pages_processed += 1
-                    await _update_job(job_id, pages_processed=pages_processed)
+                    await update_job(job_id, pages_processed=pages_processed)
                     continue
 
-                chunks = chunk_text_tokens(text, chunk_size=500, overlap=50)
+                chunks = await chunk_document_async(text)
                 if not chunks:
                     pages_processed += 1
-                    await _update_job(job_id, pages_processed=pages_processed)
+                    await update_job(job_id, pages_processed=pages_processed)
                     continue
 
                 # Embed with retry (handles Voyage rate limits)
-                embeddings = await _embed_with_retry(loop, chunks, job_id, url)
+                embeddings = await embed_with_retry(loop, [c.text for c in chunks], job_id, url)
 
                 # Insert into DB
                 async with AsyncSessionMaker() as session:
@@ -195,12 +206,13 @@ async def run_onboarding(job_id: str, root_url: str, tenant_id: str, max_pages:
                         tenant_id=tenant_id,
                         chunks=chunks,
                         source_url=url,
+                        embeddings=embeddings,
                     )
 
                 pages_processed += 1
                 chunks_total += len(chunks)
 
-                await _update_job(
+                await update_job(
                     job_id,
                     pages_processed=pages_processed,
                     chunks_total=chunks_total,
@@ -217,12 +229,12 @@ async def run_onboarding(job_id: str, root_url: str, tenant_id: str, max_pages:
                     job_id, url, exc,
                 )
                 pages_processed += 1
-                await _update_job(job_id, pages_processed=pages_processed)
+                await update_job(job_id, pages_processed=pages_processed)
 
             # Respect delay between requests (Voyage free tier)
             await asyncio.sleep(REQUEST_DELAY)
 
-        await _update_job(
+        await update_job(
             job_id,
             status="completed",
             finished_at=datetime.now(timezone.utc),
@@ -235,9 +247,11 @@ async def run_onboarding(job_id: str, root_url: str, tenant_id: str, max_pages:
 
     except Exception as exc:
         logger.exception("Onboarding [%s] falhou: %s", job_id, exc)
-        await _update_job(
+        await update_job(
             job_id,
             status="failed",
             error_message=str(exc)[:500],
             finished_at=datetime.now(timezone.utc),
         )
+    finally:
+        admission.release(tenant_id, "ingest_pages", unused_pages)
@@ -0,0 +1,214 @@
+"""Provedores de embedding plugáveis, escolhidos por ``EMBEDDING_PROVIDER``.
+
+- ``voyage``: API da Voyage AI (padrão; exige ``VOYAGE_API_KEY``);
+- ``local``: modelo ``sentence-transformers`` rodando na CPU
+  (``EMBEDDING_LOCAL_MODEL``; dependência opcional);
+- ``hashing``: feature hashing determinístico de palavras e bigramas — sem
+  rede nem modelo, milhares de textos por segundo. Para benchmarks, testes
+  de carga e CI; a qualidade semântica é só a de sobreposição de termos.
+
+Cada provedor declara ``dim`` (nativa), ``max_batch`` (textos por chamada)
+e ``max_tokens`` (por texto). ``embed`` divide a entrada em lotes e devolve
+uma matriz já ajustada a ``EMBEDDING_DIM`` (corte ou zero-padding) e
+normalizada (L2), de forma vetorizada.
+"""
+
+from __future__ import annotations
+
+import abc
+import functools
+import re
+import time
+import zlib
+from typing import Any, Sequence
+
+import numpy as np
+
+from backend.core.config import get_settings
+from backend.core.metrics import register_metrics_source
+
+
+settings = get_settings()
+
+_stats: dict[str, float] = {"calls": 0, "texts": 0, "seconds": 0.0}
+
+
+def fit_to_dim(matrix: np.ndarray, dim: int) -> np.ndarray:
+    """Corta ou completa com zeros as colunas até ``dim``."""
+    if matrix.shape[1] == dim:
+        return matrix
+    if matrix.shape[1] > dim:
+        return matrix[:, :dim]
+    return np.pad(matrix, ((0, 0), (0, dim - matrix.shape[1])))
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    """Normalização L2 por linha (linhas nulas ficam nulas)."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class EmbeddingProvider(abc.ABC):
+    name = "base"
+    dim: int
+    max_batch: int
+    max_tokens: int
+
+    @classmethod
+    def configured_max_tokens(cls) -> int | None:
+        """``max_tokens`` a partir das settings, sem instanciar; None se só o modelo sabe."""
+        return None
+
+    @abc.abstractmethod
+    def _embed_batch(self, texts: list[str], input_type: str) -> np.ndarray:
+        """Embeddings crus (sem ajuste de dimensão nem normalização) de um lote."""
+
+    def embed(self, texts: Sequence[str], *, input_type: str = "document") -> np.ndarray:
+        """Matriz ``(len(texts), EMBEDDING_DIM)`` float32, normalizada."""
+        if not texts:
+            return np.zeros((0, settings.EMBEDDING_DIM), dtype=np.float32)
+        started = time.perf_counter()
+        parts = [
+            np.asarray(self._embed_batch(list(texts[i:i + self.max_batch]), input_type), dtype=np.float32)
+            for i in range(0, len(texts), self.max_batch)
+        ]
+        matrix = normalize(fit_to_dim(np.vstack(parts), settings.EMBEDDING_DIM))
+        _stats["calls"] += 1
+        _stats["texts"] += len(texts)
+        _stats["seconds"] += time.perf_counter() - started
+        return matrix
+
+
+class VoyageProvider(EmbeddingProvider):
+    name = "voyage"
+
+    # Limites publicados por modelo: (dimensão, tokens por texto)
+    MODELS = {
+        "voyage-2": (1024, 4000),
+        "voyage-large-2": (1536, 16000),
+        "voyage-multilingual-2": (1024, 32000),
+        "voyage-3": (1024, 32000),
+        "voyage-3-lite": (512, 32000),
+        "voyage-3-large": (1024, 32000),
+    }
+    DEFAULT_LIMITS = (1024, 4000)
+
+    @classmethod
+    def configured_max_tokens(cls) -> int | None:
+        return cls.MODELS.get(settings.VOYAGE_MODEL_NAME, cls.DEFAULT_LIMITS)[1]
+
+    def __init__(self, api_key: str | None, model: str) -> None:
+        if not api_key:
+            raise RuntimeError("VOYAGE_API_KEY não configurada.")
+        import voyageai
+
+        self.model = model
+        self.dim, self.max_tokens = self.MODELS.get(model, self.DEFAULT_LIMITS)
+        self.max_batch = 128
+        self._client = voyageai.Client(api_key=api_key, base_url=settings.VOYAGE_BASE_URL)
+
+    def _embed_batch(self, texts: list[str], input_type: str) -> np.ndarray:
+        resp = self._client.embed(texts=texts, model=self.model, input_type=input_type)
+        return np.asarray(resp.embeddings, dtype=np.float32)
+
+
+class LocalProvider(EmbeddingProvider):
+    name = "local"
+
+    def __init__(self, model: str) -> None:
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as exc:
+            raise RuntimeError(
+                "EMBEDDING_PROVIDER=local requer o pacote sentence-transformers."
+            ) from exc
+
+        self._model = SentenceTransformer(model, device="cpu")
+        self.dim = self._model.get_sentence_embedding_dimension()
+        self.max_tokens = self._model.max_seq_length
+        self.max_batch = 64
+
+    def _embed_batch(self, texts: list[str], input_type: str) -> np.ndarray:
+        return self._model.encode(
+            texts, batch_size=self.max_batch, convert_to_numpy=True, normalize_embeddings=False,
+        )
+
+
+_WORD = re.compile(r"\w+")
+
+
+@functools.lru_cache(maxsize=200_000)
+def _bucket(feature: str, dim: int) -> tuple[int, float]:
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % dim, (1.0 if (h >> 31) & 1 else -1.0)
+
+
+class HashingProvider(EmbeddingProvider):
+    name = "hashing"
+    max_tokens = 32000
+
+    @classmethod
+    def configured_max_tokens(cls) -> int | None:
+        return cls.max_tokens
+
+    def __init__(self, dim: int) -> None:
+        self.dim = dim
+        self.max_batch = 1024
+
+    def _embed_batch(self, texts: list[str], input_type: str) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD.findall(text.lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            if not features:
+                continue
+            buckets = [_bucket(f, self.dim) for f in features]
+            index = np.fromiter((b[0] for b in buckets), dtype=np.int64, count=len(buckets))
+            sign = np.fromiter((b[1] for b in buckets), dtype=np.float32, count=len(buckets))
+            out[row] = np.bincount(index, weights=sign, minlength=self.dim)
+        return out
+
+
+@functools.lru_cache(maxsize=1)
+def get_embedding_provider() -> EmbeddingProvider:
+    provider = settings.EMBEDDING_PROVIDER
+    if provider == "voyage":
+        return VoyageProvider(settings.VOYAGE_API_KEY, settings.VOYAGE_MODEL_NAME)
+    if provider == "local":
+        return LocalProvider(settings.EMBEDDING_LOCAL_MODEL)
+    if provider == "hashing":
+        return HashingProvider(settings.EMBEDDING_DIM)
+    raise RuntimeError(f"EMBEDDING_PROVIDER desconhecido: {provider}")
+
+
+_PROVIDER_CLASSES: dict[str, type[EmbeddingProvider]] = {
+    "voyage": VoyageProvider,
+    "local": LocalProvider,
+    "hashing": HashingProvider,
+}
+
+
+def provider_max_tokens() -> int | None:
+    """Limite de tokens por texto do provedor configurado, sem carregá-lo.
+
+    Se o provedor já foi criado (warmup), vale o limite da instância; senão o
+    que as settings determinam — para ``local`` só o modelo sabe, e a
+    resposta é None.
+    """
+    if get_embedding_provider.cache_info().currsize:
+        return get_embedding_provider().max_tokens
+    cls = _PROVIDER_CLASSES.get(settings.EMBEDDING_PROVIDER)
+    return cls.configured_max_tokens() if cls is not None else None
+
+
+def _snapshot() -> dict[str, Any]:
+    calls = _stats["calls"]
+    return {
+        **_stats,
+        "provider": settings.EMBEDDING_PROVIDER,
+        "avg_call_ms": round(_stats["seconds"] / calls * 1000, 2) if calls else 0.0,
+    }
+
+
+register_metrics_source("embeddings", _snapshot)
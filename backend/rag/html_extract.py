@@ -0,0 +1,182 @@
+"""Extração de texto e links de HTML com backend de parser plugável.
+
+Backends, em ordem de preferência quando ``HTML_PARSER_BACKEND=auto``:
+
+- ``selectolax`` (Lexbor, em C) — o mais rápido;
+- ``lxml`` (libxml2);
+- ``bs4`` (BeautifulSoup + ``html.parser``, Python puro) — sempre disponível.
+
+Além do texto, a extração preserva a estrutura que o chunker usa: títulos
+viram linhas ``# Título`` (um ``#`` por nível), itens de lista viram
+``- item`` e cada linha de tabela vira uma linha ``célula | célula``.
+
+Parsing e limpeza de texto são CPU-bound e seguram o GIL, então as rotas e
+o crawler chamam :func:`extract_page_async`, que executa no pool de
+processos compartilhado em vez do executor de threads padrão.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Callable
+
+from backend.core.config import get_settings
+from backend.core.process_pool import get_process_pool
+
+
+settings = get_settings()
+
+_STRIP_TAGS = ("script", "style", "noscript")
+_HEADINGS = ("h1", "h2", "h3", "h4", "h5", "h6")
+
+
+@dataclass(slots=True)
+class ExtractedPage:
+    text: str
+    links: list[str] = field(default_factory=list)
+
+
+def _clean_lines(text: str) -> str:
+    # Remove linhas muito curtas e repetição
+    lines = [ln.strip() for ln in text.splitlines()]
+    return "\n".join(ln for ln in lines if len(ln) >= 3)
+
+
+def _heading_line(tag: str, text: str) -> str:
+    return f"{'#' * int(tag[1])} {text}"
+
+
+def _squash(text: str) -> str:
+    return " ".join(text.split())
+
+
+# ── Backends ───────────────────────────────────────────────────
+# Elementos estruturais são processados de dentro para fora (ordem reversa
+# do documento), para que listas e tabelas aninhadas virem uma linha só.
+
+def _extract_selectolax(html: str) -> ExtractedPage:
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(html)
+    links = [
+        href for a in tree.css("a[href]") if (href := a.attributes.get("href"))
+    ]
+    tree.strip_tags(list(_STRIP_TAGS))
+
+    for row in reversed(tree.css("tr")):
+        cells = [_squash(c.text(separator=" ")) for c in row.css("th, td")]
+        row.replace_with(" | ".join(c for c in cells if c))
+    for item in reversed(tree.css("li")):
+        item.replace_with(f"- {_squash(item.text(separator=' '))}")
+    for heading in tree.css(", ".join(_HEADINGS)):
+        heading.replace_with(_heading_line(heading.tag, _squash(heading.text(separator=" "))))
+
+    # Prioriza a área principal se existir
+    main = tree.css_first("main") or tree.css_first("article") or tree.body
+    root = main if main is not None else tree.root
+    text = root.text(separator="\n", strip=True) if root is not None else ""
+    return ExtractedPage(text=_clean_lines(text), links=links)
+
+
+def _extract_lxml(html: str) -> ExtractedPage:
+    from lxml import etree
+    from lxml import html as lxml_html
+
+    if not html.strip():
+        return ExtractedPage(text="")
+    try:
+        doc = lxml_html.document_fromstring(html)
+    except (etree.ParserError, ValueError):
+        return ExtractedPage(text="")
+
+    links = [str(href) for href in doc.xpath("//a/@href") if href]
+    for node in doc.xpath("|".join(f"//{tag}" for tag in _STRIP_TAGS)):
+        node.drop_tree()
+
+    def collapse(node, line: str) -> None:
+        tail = node.tail
+        node.clear()
+        node.text, node.tail = line, tail
+
+    for row in reversed(doc.xpath("//tr")):
+        cells = [_squash(" ".join(c.itertext())) for c in row.xpath("./th|./td")]
+        collapse(row, " | ".join(c for c in cells if c))
+    for item in reversed(doc.xpath("//li")):
+        collapse(item, "- " + _squash(" ".join(item.itertext())))
+    for heading in doc.xpath("|".join(f"//{tag}" for tag in _HEADINGS)):
+        collapse(heading, _heading_line(heading.tag, _squash(" ".join(heading.itertext()))))
+
+    main = None
+    for path in (".//main", ".//article", ".//body"):
+        main = doc.find(path)
+        if main is not None:
+            break
+    root = main if main is not None else doc
+    text = "\n".join(t.strip() for t in root.itertext() if t.strip())
+    return ExtractedPage(text=_clean_lines(text), links=links)
+
+
+def _extract_bs4(html: str) -> ExtractedPage:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    links = [a["href"] for a in soup.find_all("a", href=True)]
+
+    for tag in soup(list(_STRIP_TAGS)):
+        tag.decompose()
+
+    for row in reversed(soup.find_all("tr")):
+        cells = [_squash(c.get_text(" ")) for c in row.find_all(["th", "td"], recursive=False)]
+        row.string = " | ".join(c for c in cells if c)
+    for item in reversed(soup.find_all("li")):
+        item.string = f"- {_squash(item.get_text(' '))}"
+    for heading in soup.find_all(list(_HEADINGS)):
+        heading.string = _heading_line(heading.name, _squash(heading.get_text(" ")))
+
+    main = soup.find("main") or soup.find("article") or soup.body
+    text = main.get_text(separator="\n", strip=True) if main else soup.get_text(separator="\n", strip=True)
+    return ExtractedPage(text=_clean_lines(text), links=links)
+
+
+BACKENDS: dict[str, Callable[[str], ExtractedPage]] = {
+    "selectolax": _extract_selectolax,
+    "lxml": _extract_lxml,
+    "bs4": _extract_bs4,
+}
+
+_MODULES = {"selectolax": "selectolax", "lxml": "lxml", "bs4": "bs4"}
+
+
+def available_backends() -> list[str]:
+    import importlib.util
+
+    return [name for name, module in _MODULES.items() if importlib.util.find_spec(module)]
+
+
+_resolved: str | None = None
+
+
+def resolve_backend(name: str | None = None) -> str:
+    """Backend efetivo: o pedido (se instalado) ou o melhor disponível."""
+    global _resolved
+
+    requested = name or settings.HTML_PARSER_BACKEND
+    if requested != "auto":
+        if requested not in available_backends():
+            raise RuntimeError(f"Parser HTML '{requested}' não está instalado.")
+        return requested
+    if _resolved is None:
+        _resolved = available_backends()[0]
+    return _resolved
+
+
+def extract_page(html: str, backend: str | None = None) -> ExtractedPage:
+    """Extrai texto principal e hrefs (brutos) de uma página, no processo atual."""
+    return BACKENDS[resolve_backend(backend)](html)
+
+
+async def extract_page_async(html: str, backend: str | None = None) -> ExtractedPage:
+    """Como :func:`extract_page`, mas no pool de processos (fora do GIL do loop)."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), extract_page, html, resolve_backend(backend))
@@ -1,18 +1,20 @@
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass
 from io import BytesIO
 from typing import Iterable, Sequence
 
-import requests
-import voyageai
-from bs4 import BeautifulSoup
-from pypdf import PdfReader
-from sqlalchemy import select
+from sqlalchemy import insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.agents.answer_cache import answer_cache
 from backend.core.config import get_settings
+from backend.core.profiling import span
 from backend.models.database import Document
+from backend.rag.chunker import PAGE_BREAK, Chunk, chunk_document_async
+from backend.rag.embeddings import get_embedding_provider
+from backend.rag.html_extract import extract_page, extract_page_async
 
 
 settings = get_settings()
@@ -25,112 +27,98 @@ class IngestResult:
     chunks_ingested: int
 
 
-def scrape_url_text(url: str) -> str:
-    resp = requests.get(url, timeout=30, headers={"User-Agent": "copiloto-farma/0.1"})
+def fetch_html(url: str, *, user_agent: str = "copiloto-farma/0.1", timeout: float = 30) -> str:
+    import requests
+
+    resp = requests.get(url, timeout=timeout, headers={"User-Agent": user_agent})
     resp.raise_for_status()
-    soup = BeautifulSoup(resp.text, "html.parser")
+    return resp.text
 
-    for tag in soup(["script", "style", "noscript"]):
-        tag.decompose()
 
-    # Prioriza a área principal se existir
-    main = soup.find("main") or soup.find("article") or soup.body
-    text = main.get_text(separator="\n", strip=True) if main else soup.get_text(separator="\n", strip=True)
+def scrape_url_text(url: str) -> str:
+    return extract_page(fetch_html(url)).text
+
 
-    # Remove linhas muito curtas e repetição
-    lines = [ln.strip() for ln in text.splitlines()]
-    lines = [ln for ln in lines if len(ln) >= 3]
-    return "\n".join(lines)
+async def scrape_url_text_async(url: str) -> str:
+    """Download numa thread e extração no pool de processos."""
+    loop = asyncio.get_running_loop()
+    html = await loop.run_in_executor(None, fetch_html, url)
+    page = await extract_page_async(html)
+    return page.text
 
 
 def extract_pdf_text(pdf_bytes: bytes) -> str:
+    from pypdf import PdfReader
+
     reader = PdfReader(BytesIO(pdf_bytes))
     parts: list[str] = []
     for page in reader.pages:
         page_text = page.extract_text() or ""
         if page_text.strip():
             parts.append(page_text.strip())
-    return "\n\n".join(parts).strip()
-
-
-def chunk_text_tokens(text: str, *, chunk_size: int = 500, overlap: int = 50) -> list[str]:
-    # Aproximação de "tokens" via palavras (suficiente para MVP).
-    tokens = text.split()
-    if not tokens:
-        return []
+    # Fronteira de página preservada para o chunker
+    return PAGE_BREAK.join(parts).strip()
 
-    chunks: list[str] = []
-    step = max(1, chunk_size - overlap)
-    for start in range(0, len(tokens), step):
-        end = min(len(tokens), start + chunk_size)
-        chunk_tokens = tokens[start:end]
-        if chunk_tokens:
-            chunks.append(" ".join(chunk_tokens))
-        if end >= len(tokens):
-            break
-    return chunks
 
+def count_pdf_pages(path: str) -> int:
+    from pypdf import PdfReader
 
-def _normalize(vec: list[float]) -> list[float]:
-    import math
+    return len(PdfReader(path).pages)
 
-    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
-    return [v / norm for v in vec]
 
+def extract_pdf_pages(path: str, start: int, end: int) -> list[str]:
+    """Extrai o texto das páginas ``[start, end)``; roda em processo separado."""
+    from pypdf import PdfReader
 
-def _fit_to_dim(vec: list[float], dim: int) -> list[float]:
-    if len(vec) == dim:
-        return vec
-    if len(vec) > dim:
-        return vec[:dim]
-    return vec + [0.0] * (dim - len(vec))
-
-
-def embed_texts(texts: list[str]) -> list[list[float]]:
-    if not settings.VOYAGE_API_KEY:
-        raise RuntimeError("VOYAGE_API_KEY não configurada.")
+    reader = PdfReader(path)
+    parts: list[str] = []
+    for index in range(start, min(end, len(reader.pages))):
+        page_text = reader.pages[index].extract_text() or ""
+        if page_text.strip():
+            parts.append(page_text.strip())
+    return parts
 
-    client = voyageai.Client(api_key=settings.VOYAGE_API_KEY)
-    resp = client.embed(
-        texts=texts,
-        model=settings.VOYAGE_MODEL_NAME,
-        input_type="document",
-    )
-    base_vecs = resp.embeddings
 
-    out: list[list[float]] = []
-    for v in base_vecs:
-        v = list(map(float, v))
-        out.append(_normalize(_fit_to_dim(v, settings.EMBEDDING_DIM)))
-    return out
+def embed_texts(texts: list[str], *, input_type: str = "document") -> list[list[float]]:
+    """Embeddings normalizados em ``EMBEDDING_DIM`` pelo provedor configurado."""
+    with span("embed", texts=len(texts), input_type=input_type):
+        return get_embedding_provider().embed(texts, input_type=input_type).tolist()
 
 
 async def ingest_chunks(
     session: AsyncSession,
     *,
     tenant_id: str,
-    chunks: Sequence[str],
+    chunks: Sequence[Chunk],
     source_url: str | None,
+    embeddings: Sequence[list[float]] | None = None,
 ) -> IngestResult:
+    """Grava os chunks (embedando-os, se ``embeddings`` não vier pronto)."""
     if not chunks:
         return IngestResult(tenant_id=tenant_id, source_url=source_url, chunks_ingested=0)
 
-    embeddings = embed_texts(list(chunks))
-
-    docs = [
-        Document(
-            tenant_id=tenant_id,
-            content=chunk,
-            embedding=emb,
-            source_url=source_url,
-        )
+    if embeddings is None:
+        embeddings = embed_texts([c.text for c in chunks])
+
+    rows = [
+        {
+            "tenant_id": tenant_id,
+            "content": chunk.text,
+            "embedding": emb,
+            "source_url": source_url,
+            "heading_path": chunk.heading,
+        }
         for chunk, emb in zip(chunks, embeddings, strict=True)
     ]
 
-    session.add_all(docs)
+    # executemany → INSERT multi-linha (insertmanyvalues), sem objetos ORM
+    await session.execute(insert(Document), rows)
     await session.commit()
 
-    return IngestResult(tenant_id=tenant_id, source_url=source_url, chunks_ingested=len(docs))
+    # O corpus do tenant mudou: respostas em cache podem estar desatualizadas
+    answer_cache.invalidate_tenant(tenant_id)
+
+    return IngestResult(tenant_id=tenant_id, source_url=source_url, chunks_ingested=len(rows))
 
 
 async def ingest_url(
@@ -139,8 +127,8 @@ async def ingest_url(
     tenant_id: str,
     url: str,
 ) -> IngestResult:
-    text = scrape_url_text(url)
-    chunks = chunk_text_tokens(text, chunk_size=500, overlap=50)
+    text = await scrape_url_text_async(url)
+    chunks = await chunk_document_async(text)
     return await ingest_chunks(session, tenant_id=tenant_id, chunks=chunks, source_url=url)
 
 
@@ -152,7 +140,7 @@ async def ingest_pdf(
     source_url: str | None = None,
 ) -> IngestResult:
     text = extract_pdf_text(pdf_bytes)
-    chunks = chunk_text_tokens(text, chunk_size=500, overlap=50)
+    chunks = await chunk_document_async(text, numbered_headings=True)
     return await ingest_chunks(session, tenant_id=tenant_id, chunks=chunks, source_url=source_url)
 
 
@@ -0,0 +1,138 @@
+"""Ingestão de PDF em streaming, com extração de páginas em paralelo.
+
+O upload é gravado em arquivo temporário (nunca inteiro na memória) e as
+páginas são extraídas em lotes de ``INGEST_PDF_PAGE_BATCH`` no pool de
+processos. Cada lote, assim que fica pronto (em ordem), é chunkado, embedado
+e inserido — enquanto os lotes seguintes ainda estão sendo extraídos.
+Arquivos grandes rodam como job em background com progresso em
+``onboarding_jobs``, consultável em ``GET /onboarding/status/{job_id}``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+
+from backend.core.admission import admission
+from backend.core.config import get_settings
+from backend.core.process_pool import get_process_pool
+from backend.models.database import AsyncSessionMaker
+from backend.rag.chunker import PAGE_BREAK, chunk_document_async
+from backend.rag.crawler import update_job
+from backend.rag.ingestor import (
+    IngestResult,
+    count_pdf_pages,
+    embed_texts,
+    extract_pdf_pages,
+    ingest_chunks,
+)
+
+
+settings = get_settings()
+logger = logging.getLogger("copiloto-farma.pdf")
+
+
+async def count_pdf_pages_async(path: str) -> int:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), count_pdf_pages, path)
+
+
+async def ingest_pdf_file(
+    *,
+    tenant_id: str,
+    path: str,
+    source_url: str | None,
+    job_id: str | None = None,
+    total_pages: int | None = None,
+) -> IngestResult:
+    """Ingere o PDF em ``path``.
+
+    Com ``total_pages`` o chamador já contou as páginas e cobrou
+    ``ingest_pages`` (as rotas fazem isso antes de responder); sem ele, conta
+    e cobra aqui.
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+
+    if total_pages is None:
+        total_pages = await count_pdf_pages_async(path)
+        await admission.acquire(tenant_id, "ingest_pages", total_pages)
+    if job_id:
+        await update_job(job_id, pages_found=total_pages)
+
+    batch_size = settings.INGEST_PDF_PAGE_BATCH
+    starts = list(range(0, total_pages, batch_size))
+    # Todos os lotes entram no pool de uma vez; consumimos na ordem das páginas
+    batches = [
+        loop.run_in_executor(pool, extract_pdf_pages, path, start, start + batch_size)
+        for start in starts
+    ]
+
+    chunks_total = 0
+    try:
+        for start, batch in zip(starts, batches):
+            pages = await batch
+            chunks = await chunk_document_async(PAGE_BREAK.join(pages), numbered_headings=True)
+
+            if chunks:
+                embeddings = await loop.run_in_executor(None, embed_texts, [c.text for c in chunks])
+                async with AsyncSessionMaker() as session:
+                    await ingest_chunks(
+                        session,
+                        tenant_id=tenant_id,
+                        chunks=chunks,
+                        source_url=source_url,
+                        embeddings=embeddings,
+                    )
+                chunks_total += len(chunks)
+
+            pages_processed = min(total_pages, start + batch_size)
+            if job_id:
+                await update_job(
+                    job_id,
+                    pages_processed=pages_processed,
+                    chunks_total=chunks_total,
+                )
+            logger.debug(
+                "PDF %s — %d/%d páginas, %d chunks",
+                source_url, pages_processed, total_pages, chunks_total,
+            )
+    finally:
+        for batch in batches:
+            batch.cancel()
+
+    return IngestResult(tenant_id=tenant_id, source_url=source_url, chunks_ingested=chunks_total)
+
+
+async def run_pdf_ingest_job(
+    *,
+    job_id: str,
+    tenant_id: str,
+    path: str,
+    source_url: str | None,
+    total_pages: int | None = None,
+) -> None:
+    """Background task para PDFs grandes; remove o arquivo temporário ao final."""
+    await update_job(job_id, status="running", started_at=datetime.now(timezone.utc))
+    try:
+        result = await ingest_pdf_file(
+            tenant_id=tenant_id, path=path, source_url=source_url, job_id=job_id,
+            total_pages=total_pages,
+        )
+        await update_job(job_id, status="completed", finished_at=datetime.now(timezone.utc))
+        logger.info(
+            "Ingestão de PDF [%s] concluída — %s, %d chunks",
+            job_id, source_url, result.chunks_ingested,
+        )
+    except Exception as exc:
+        logger.exception("Ingestão de PDF [%s] falhou: %s", job_id, exc)
+        await update_job(
+            job_id,
+            status="failed",
+            error_message=str(exc)[:500],
+            finished_at=datetime.now(timezone.utc),
+        )
+    finally:
+        os.unlink(path)
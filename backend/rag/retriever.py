@@ -3,24 +3,96 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Sequence
 
-from sqlalchemy import select
+from sqlalchemy import Float, Integer, String, Text, bindparam, text
 from sqlalchemy.ext.asyncio import AsyncSession
+from pgvector.sqlalchemy import Vector
 
 from backend.core.config import get_settings
-from backend.models.database import Document
+from backend.core.profiling import span
 from backend.rag.ingestor import embed_texts
 
 
 settings = get_settings()
 
 
-@dataclass
+@dataclass(slots=True)
+class NeighborChunk:
+    id: int
+    content: str
+
+
+@dataclass(slots=True)
 class RetrievedChunk:
     id: int
     tenant_id: str
     content: str
     source_url: str | None
     score: float
+    heading_path: str | None = None
+    neighbors: tuple[NeighborChunk, ...] = ()
+
+
+# ── Statements pré-compilados ──────────────────────────────────
+# Projetam apenas id/content/source_url/heading_path/score: o vetor de 1024
+# floats não volta pela rede e nenhuma instância ORM de Document é construída.
+# Como o SQL é sempre o mesmo texto, o asyncpg reaproveita o prepared
+# statement no cache de cada conexão do pool entre requisições.
+
+_RETRIEVE_SQL = (
+    text(
+        """
+        SELECT id, content, source_url, heading_path,
+               embedding <-> CAST(:query_embedding AS vector) AS score
+        FROM documents
+        WHERE tenant_id = :tenant_id
+        ORDER BY score
+        LIMIT :top_k
+        """
+    )
+    .bindparams(
+        bindparam("query_embedding", type_=Vector(settings.EMBEDDING_DIM)),
+        bindparam("tenant_id", type_=String),
+        bindparam("top_k", type_=Integer),
+    )
+    .columns(id=Integer, content=Text, source_url=String, heading_path=Text, score=Float)
+)
+
+# Variante com vizinhos: os chunks de uma mesma fonte são inseridos em
+# sequência, então os ids adjacentes (mesmo source_url) são o texto
+# imediatamente antes/depois do trecho encontrado. Tudo em um round trip.
+_RETRIEVE_WITH_NEIGHBORS_SQL = (
+    text(
+        """
+        WITH hits AS (
+            SELECT id, source_url,
+                   embedding <-> CAST(:query_embedding AS vector) AS score
+            FROM documents
+            WHERE tenant_id = :tenant_id
+            ORDER BY score
+            LIMIT :top_k
+        )
+        SELECT h.id AS hit_id, d.id, d.content, d.source_url, d.heading_path, h.score
+        FROM hits h
+        JOIN documents d
+          ON d.tenant_id = :tenant_id
+         AND (
+                d.id = h.id
+             OR (d.source_url = h.source_url
+                 AND d.id BETWEEN h.id - :window AND h.id + :window)
+         )
+        ORDER BY h.score, h.id, d.id
+        """
+    )
+    .bindparams(
+        bindparam("query_embedding", type_=Vector(settings.EMBEDDING_DIM)),
+        bindparam("tenant_id", type_=String),
+        bindparam("top_k", type_=Integer),
+        bindparam("window", type_=Integer),
+    )
+    .columns(
+        hit_id=Integer, id=Integer, content=Text, source_url=String, heading_path=Text, score=Float,
+    )
+)
 
 
 async def retrieve_relevant_chunks(
@@ -28,36 +100,78 @@ async def retrieve_relevant_chunks(
     tenant_id: str,
     query: str,
     top_k: int | None = None,
+    neighbor_window: int | None = None,
+    query_embedding: list[float] | None = None,
 ) -> Sequence[RetrievedChunk]:
-    """Busca vetorial por tenant_id e retorna top_k chunks."""
+    """Busca vetorial por tenant_id e retorna top_k chunks.
+
+    Com ``neighbor_window > 0`` traz também, na mesma consulta, os chunks
+    vizinhos (mesma fonte, ids adjacentes) de cada resultado. Se o chamador
+    já tiver o embedding da pergunta, pode passá-lo em ``query_embedding``.
+    """
     if top_k is None:
         top_k = settings.RAG_TOP_K
+    if neighbor_window is None:
+        neighbor_window = settings.RAG_NEIGHBOR_WINDOW
+
+    if query_embedding is None:
+        query_embedding = embed_texts([query])[0]
+
+    params = {
+        "query_embedding": query_embedding,
+        "tenant_id": tenant_id,
+        "top_k": top_k,
+    }
+
+    if neighbor_window <= 0:
+        with span("retriever.search", top_k=top_k):
+            result = await session.execute(_RETRIEVE_SQL, params)
+        return [
+            RetrievedChunk(
+                id=row.id,
+                tenant_id=tenant_id,
+                content=row.content,
+                source_url=row.source_url,
+                score=float(row.score),
+                heading_path=row.heading_path,
+            )
+            for row in result
+        ]
 
-    query_embedding = embed_texts([query])[0]
+    with span("retriever.search", top_k=top_k, neighbor_window=neighbor_window):
+        result = await session.execute(
+            _RETRIEVE_WITH_NEIGHBORS_SQL, {**params, "window": neighbor_window}
+        )
 
-    distance = Document.embedding.l2_distance(query_embedding).label("score")
-    stmt = (
-        select(Document, distance)
-        .where(Document.tenant_id == tenant_id)
-        .order_by(distance.asc())
-        .limit(top_k)
-    )
+    hits: dict[int, RetrievedChunk] = {}
+    neighbors: dict[int, list[NeighborChunk]] = {}
+    for row in result:
+        if row.id == row.hit_id:
+            hits[row.hit_id] = RetrievedChunk(
+                id=row.id,
+                tenant_id=tenant_id,
+                content=row.content,
+                source_url=row.source_url,
+                score=float(row.score),
+                heading_path=row.heading_path,
+            )
+        else:
+            neighbors.setdefault(row.hit_id, []).append(
+                NeighborChunk(id=row.id, content=row.content)
+            )
 
-    result = await session.execute(stmt)
-    rows = result.all()
+    for hit_id, chunk in hits.items():
+        chunk.neighbors = tuple(neighbors.get(hit_id, ()))
+    return list(hits.values())
 
-    out: list[RetrievedChunk] = []
-    for doc, score in rows:
-        out.append(
-            RetrievedChunk(
-                id=doc.id,
-                tenant_id=doc.tenant_id,
-                content=doc.content,
-                source_url=doc.source_url,
-                score=float(score),
-            )
-        )
-    return out
+
+def _chunk_text_with_neighbors(chunk: RetrievedChunk) -> str:
+    """Reconstrói o trecho em ordem de id, incluindo os vizinhos."""
+    if not chunk.neighbors:
+        return chunk.content
+    before = [n.content for n in chunk.neighbors if n.id < chunk.id]
+    after = [n.content for n in chunk.neighbors if n.id > chunk.id]
+    return "\n".join([*before, chunk.content, *after])
 
 
 def format_chunks_as_context(chunks: Sequence[RetrievedChunk], *, max_chars: int | None = None) -> str:
@@ -67,9 +181,11 @@ def format_chunks_as_context(chunks: Sequence[RetrievedChunk], *, max_chars: int
     parts: list[str] = []
     for i, c in enumerate(chunks, start=1):
         src = c.source_url or "desconhecida"
-        parts.append(f"[CHUNK {i}] source={src} score={c.score:.4f}\n{c.content}")
+        section = f" section={c.heading_path}" if c.heading_path else ""
+        parts.append(
+            f"[CHUNK {i}] source={src}{section} score={c.score:.4f}\n{_chunk_text_with_neighbors(c)}"
+        )
 
     ctx = "\n\n---\n\n".join(parts)
     limit = max_chars or settings.RAG_MAX_CONTEXT_CHARS
     return ctx[:limit]
-
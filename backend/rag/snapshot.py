@@ -0,0 +1,382 @@
+"""Snapshot do corpus de um tenant: exporta e importa ``documents`` sem re-embedar.
+
+Uso::
+
+    python -m backend.rag.snapshot export farmacia-a farmacia-a.cfsnap
+    python -m backend.rag.snapshot import farmacia-a.cfsnap --tenant farmacia-b --replace
+
+Também exposto em ``GET /ingest/snapshot/{tenant_id}`` e ``POST /ingest/snapshot``,
+protegidos pelo header ``X-Admin-Token`` (``ADMIN_TOKEN``; vazio = fechados).
+
+O arquivo é um zip colunar (uma entrada por coluna, lida e gravada em
+blocos de ``BLOCK_ROWS`` linhas):
+
+- ``manifest.json``: formato, versão, tenant de origem, linhas, dimensão e
+  o modelo de embedding que gerou os vetores;
+- ``embedding.f32``: vetores como float32 little-endian contíguos
+  (``linhas × dim``), sem compressão — floats não comprimem, e assim o
+  bloco vai direto para o ``COPY``;
+- ``<coluna>.offsets`` (uint64, ``linhas + 1``) e ``<coluna>.data`` (UTF-8)
+  para ``content``, ``source_url`` e ``heading_path``, mais
+  ``<coluna>.valid`` (uint8) nas anuláveis — comprimidos com deflate;
+- ``created_at.i64``: microssegundos desde a época.
+
+A importação carrega por ``COPY`` binário (numa transação, opcionalmente
+apagando o corpus atual do tenant) e recusa vetores de outra dimensão ou de
+outro modelo de embedding, já que não seriam comparáveis com as consultas.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from contextlib import ExitStack
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import IO, Any, Iterator
+
+import asyncpg
+import numpy as np
+from pgvector.asyncpg import register_vector
+
+from backend.agents.answer_cache import answer_cache
+from backend.core.config import get_settings
+from backend.models.replica import replica_available
+
+
+settings = get_settings()
+logger = logging.getLogger("copiloto-farma.snapshot")
+
+SNAPSHOT_FORMAT = "copiloto-corpus-snapshot"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".cfsnap"
+BLOCK_ROWS = 10_000
+
+TEXT_COLUMNS = ("content", "source_url", "heading_path")
+NULLABLE_COLUMNS = ("source_url", "heading_path")
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+class SnapshotError(ValueError):
+    """Arquivo de snapshot inválido ou incompatível com este ambiente."""
+
+
+@dataclass(slots=True)
+class SnapshotResult:
+    tenant_id: str
+    rows: int
+    dim: int
+    seconds: float
+    replaced: int = 0
+
+
+def embedding_model() -> str:
+    """Identifica o espaço vetorial atual (vetores de modelos diferentes não se misturam)."""
+    provider = settings.EMBEDDING_PROVIDER
+    if provider == "voyage":
+        return f"voyage:{settings.VOYAGE_MODEL_NAME}"
+    if provider == "local":
+        return f"local:{settings.EMBEDDING_LOCAL_MODEL}"
+    return provider
+
+
+def _dsn(url: str) -> str:
+    return url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+async def _connect(*, for_read: bool = False) -> asyncpg.Connection:
+    url = settings.async_read_database_url if for_read and replica_available() else settings.async_database_url
+    conn = await asyncpg.connect(_dsn(url))
+    await register_vector(conn)
+    return conn
+
+
+# ── Escrita ────────────────────────────────────────────────────
+
+
+class _SnapshotWriter:
+    """Grava o zip; métodos síncronos, chamados num executor."""
+
+    def __init__(self, path: str, dim: int) -> None:
+        self.dim = dim
+        self.rows = 0
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+        self._vectors = self._zip.open(
+            zipfile.ZipInfo("embedding.f32", date_time=time.localtime()[:6]), "w", force_zip64=True,
+        )
+        # Só uma entrada do zip pode estar aberta: as colunas de texto vão para temporários
+        self._data = {col: tempfile.TemporaryFile() for col in TEXT_COLUMNS}
+        self._offsets = {col: [0] for col in TEXT_COLUMNS}
+        self._valid = {col: bytearray() for col in NULLABLE_COLUMNS}
+        self._created: list[int] = []
+
+    def add_block(self, records: list[Any]) -> None:
+        vectors = np.stack([r["embedding"] for r in records]).astype("<f4", copy=False)
+        if vectors.shape[1] != self.dim:
+            raise SnapshotError(f"Vetor com dimensão {vectors.shape[1]}, esperado {self.dim}.")
+        self._vectors.write(vectors.tobytes())
+
+        for col in TEXT_COLUMNS:
+            data, offsets = self._data[col], self._offsets[col]
+            for record in records:
+                value = record[col]
+                if col in self._valid:
+                    self._valid[col].append(value is not None)
+                encoded = value.encode("utf-8") if value else b""
+                data.write(encoded)
+                offsets.append(offsets[-1] + len(encoded))
+
+        self._created.extend((r["created_at"] - _EPOCH) // _MICROSECOND for r in records)
+        self.rows += len(records)
+
+    def finish(self, manifest: dict[str, Any]) -> None:
+        self._vectors.close()
+        for col in TEXT_COLUMNS:
+            self._zip.writestr(f"{col}.offsets", np.asarray(self._offsets[col], dtype="<u8").tobytes())
+            data = self._data[col]
+            data.seek(0)
+            with self._zip.open(f"{col}.data", "w", force_zip64=True) as dst:
+                shutil.copyfileobj(data, dst, length=1024 * 1024)
+            data.close()
+        for col, valid in self._valid.items():
+            self._zip.writestr(f"{col}.valid", bytes(valid))
+        self._zip.writestr("created_at.i64", np.asarray(self._created, dtype="<i8").tobytes())
+        self._zip.writestr("manifest.json", json.dumps(manifest, indent=2, ensure_ascii=False))
+        self._zip.close()
+
+    def abort(self) -> None:
+        for data in self._data.values():
+            data.close()
+        self._vectors.close()
+        self._zip.close()
+
+
+async def export_snapshot(tenant_id: str, path: str) -> SnapshotResult:
+    """Exporta o corpus do tenant para ``path`` (lê da réplica quando disponível)."""
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    writer = _SnapshotWriter(path, settings.EMBEDDING_DIM)
+    conn = await _connect(for_read=True)
+    try:
+        async with conn.transaction(isolation="repeatable_read", readonly=True):
+            cursor = conn.cursor(
+                "SELECT content, embedding, source_url, heading_path, created_at "
+                "FROM documents WHERE tenant_id = $1 ORDER BY id",
+                tenant_id,
+                prefetch=BLOCK_ROWS,
+            )
+            block: list[Any] = []
+            async for record in cursor:
+                block.append(record)
+                if len(block) == BLOCK_ROWS:
+                    await loop.run_in_executor(None, writer.add_block, block)
+                    block = []
+            if block:
+                await loop.run_in_executor(None, writer.add_block, block)
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        await conn.close()
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "tenant_id": tenant_id,
+        "rows": writer.rows,
+        "dim": writer.dim,
+        "embedding_model": embedding_model(),
+        "block_rows": BLOCK_ROWS,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    await loop.run_in_executor(None, writer.finish, manifest)
+    result = SnapshotResult(tenant_id, writer.rows, writer.dim, time.perf_counter() - started)
+    logger.info("Snapshot de %s exportado — %d chunks em %.1fs", tenant_id, result.rows, result.seconds)
+    return result
+
+
+# ── Leitura ────────────────────────────────────────────────────
+
+
+class _SnapshotReader:
+    def __init__(self, path: str) -> None:
+        try:
+            self._zip = zipfile.ZipFile(path)
+            self.manifest: dict[str, Any] = json.loads(self._zip.read("manifest.json"))
+        except (zipfile.BadZipFile, KeyError, ValueError) as exc:
+            raise SnapshotError(f"Snapshot inválido: {exc}") from exc
+        if self.manifest.get("format") != SNAPSHOT_FORMAT:
+            raise SnapshotError("Arquivo não é um snapshot de corpus.")
+        if self.manifest.get("version") != SNAPSHOT_VERSION:
+            raise SnapshotError(f"Versão de snapshot não suportada: {self.manifest.get('version')}")
+        self.rows = int(self.manifest["rows"])
+        self.dim = int(self.manifest["dim"])
+
+    def _array(self, name: str, dtype: str) -> np.ndarray:
+        return np.frombuffer(self._zip.read(name), dtype=dtype)
+
+    def blocks(self, tenant_id: str) -> Iterator[list[tuple]]:
+        """Blocos de registros prontos para o ``COPY`` (colunas de ``COPY_COLUMNS``).
+
+        Vetores e textos são lidos em streaming, um bloco por vez; só os
+        offsets, as máscaras e ``created_at`` (bytes por linha) ficam inteiros
+        em memória.
+        """
+        offsets = {col: self._array(f"{col}.offsets", "<u8") for col in TEXT_COLUMNS}
+        valid = {col: self._array(f"{col}.valid", "u1") for col in NULLABLE_COLUMNS}
+        created = self._array("created_at.i64", "<i8")
+        if any(len(o) != self.rows + 1 for o in offsets.values()) or len(created) != self.rows:
+            raise SnapshotError("Snapshot inconsistente: colunas com tamanhos diferentes.")
+
+        row_bytes = self.dim * 4
+        with ExitStack() as stack:
+            vectors = stack.enter_context(self._zip.open("embedding.f32"))
+            streams = {col: stack.enter_context(self._zip.open(f"{col}.data")) for col in TEXT_COLUMNS}
+            for start in range(0, self.rows, BLOCK_ROWS):
+                stop = min(self.rows, start + BLOCK_ROWS)
+                raw = _read_exact(vectors, (stop - start) * row_bytes, "embedding.f32")
+                matrix = np.frombuffer(raw, dtype="<f4").reshape(stop - start, self.dim)
+                data = {
+                    col: _read_exact(
+                        streams[col], int(offsets[col][stop] - offsets[col][start]), f"{col}.data",
+                    )
+                    for col in TEXT_COLUMNS
+                }
+
+                def text(col: str, i: int) -> str | None:
+                    if col in valid and not valid[col][i]:
+                        return None
+                    base = offsets[col][start]
+                    return data[col][offsets[col][i] - base:offsets[col][i + 1] - base].decode("utf-8")
+
+                yield [
+                    (
+                        tenant_id,
+                        text("content", i),
+                        matrix[i - start],
+                        text("source_url", i),
+                        text("heading_path", i),
+                        _EPOCH + int(created[i]) * _MICROSECOND,
+                    )
+                    for i in range(start, stop)
+                ]
+
+    def close(self) -> None:
+        self._zip.close()
+
+
+def _read_exact(stream: IO[bytes], size: int, name: str) -> bytes:
+    raw = stream.read(size)
+    if len(raw) != size:
+        raise SnapshotError(f"Snapshot truncado: bloco incompleto em {name}.")
+    return raw
+
+
+COPY_COLUMNS = ["tenant_id", "content", "embedding", "source_url", "heading_path", "created_at"]
+
+
+async def import_snapshot(
+    path: str,
+    *,
+    tenant_id: str | None = None,
+    replace: bool = False,
+    allow_model_mismatch: bool = False,
+) -> SnapshotResult:
+    """Carrega o snapshot no tenant (o de origem, se ``tenant_id`` não vier) via ``COPY``."""
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    reader = await loop.run_in_executor(None, _SnapshotReader, path)
+    try:
+        target = tenant_id or reader.manifest["tenant_id"]
+        if reader.dim != settings.EMBEDDING_DIM:
+            raise SnapshotError(
+                f"Snapshot com vetores de dimensão {reader.dim}; este ambiente usa {settings.EMBEDDING_DIM}."
+            )
+        source_model = reader.manifest.get("embedding_model")
+        if source_model != embedding_model() and not allow_model_mismatch:
+            raise SnapshotError(
+                f"Snapshot gerado com {source_model}; este ambiente embeda com {embedding_model()}."
+            )
+
+        blocks = reader.blocks(target)
+        replaced = 0
+        conn = await _connect()
+        try:
+            async with conn.transaction():
+                if replace:
+                    status = await conn.execute("DELETE FROM documents WHERE tenant_id = $1", target)
+                    replaced = int(status.split()[-1])
+                while (block := await loop.run_in_executor(None, next, blocks, None)) is not None:
+                    await conn.copy_records_to_table("documents", records=block, columns=COPY_COLUMNS)
+            await conn.execute("ANALYZE documents")
+        finally:
+            await conn.close()
+    finally:
+        reader.close()
+
+    # O corpus do tenant mudou: respostas em cache podem estar desatualizadas
+    answer_cache.invalidate_tenant(target)
+    result = SnapshotResult(target, reader.rows, reader.dim, time.perf_counter() - started, replaced)
+    logger.info(
+        "Snapshot importado em %s — %d chunks (%d substituídos) em %.1fs",
+        target, result.rows, result.replaced, result.seconds,
+    )
+    return result
+
+
+# ── CLI ────────────────────────────────────────────────────────
+
+
+async def _run(args: argparse.Namespace) -> int:
+    try:
+        if args.command == "export":
+            result = await export_snapshot(args.tenant_id, args.path)
+            print(f"{result.rows} chunks de {result.tenant_id} → {args.path} em {result.seconds:.1f}s")
+        else:
+            result = await import_snapshot(
+                args.path,
+                tenant_id=args.tenant,
+                replace=args.replace,
+                allow_model_mismatch=args.allow_model_mismatch,
+            )
+            print(
+                f"{result.rows} chunks → {result.tenant_id} em {result.seconds:.1f}s"
+                + (f" ({result.replaced} substituídos)" if args.replace else "")
+            )
+    except SnapshotError as exc:
+        print(f"Erro: {exc}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv: list[str]) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+    parser = argparse.ArgumentParser(prog="python -m backend.rag.snapshot")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="exporta o corpus de um tenant")
+    export.add_argument("tenant_id")
+    export.add_argument("path", help=f"arquivo de saída (ex.: tenant{SNAPSHOT_SUFFIX})")
+
+    load = commands.add_parser("import", help="importa um snapshot")
+    load.add_argument("path")
+    load.add_argument("--tenant", help="tenant de destino (padrão: o de origem)")
+    load.add_argument("--replace", action="store_true", help="apaga o corpus atual do tenant antes")
+    load.add_argument(
+        "--allow-model-mismatch", action="store_true",
+        help="aceita vetores de outro modelo de embedding",
+    )
+    return asyncio.run(_run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
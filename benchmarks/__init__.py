@@ -0,0 +1 @@
+"""Benchmarks de desempenho do backend (rodar com ``python -m benchmarks.<nome>``)."""
@@ -0,0 +1,121 @@
+"""Compara o chunker estrutural com o antigo (janelas fixas de palavras).
+
+Uso::
+
+    python -m benchmarks.chunking --corpus ./paginas_salvas --json chunking.json
+
+Lê páginas ``.html``/``.htm`` (extraídas com ``html_extract``) e ``.pdf`` do
+corpus — ou gera páginas sintéticas — e reporta, para cada estratégia, o
+número de chunks, o total de tokens embedados (contados com o mesmo
+tokenizer do chunker) e o preenchimento médio dos chunks — também sem o
+último chunk de cada documento, que é naturalmente parcial.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+from pathlib import Path
+
+from backend.core.config import get_settings
+from backend.rag.chunker import PAGE_BREAK, chunk_document, count_tokens
+from backend.rag.html_extract import extract_page
+from backend.rag.ingestor import extract_pdf_pages
+from benchmarks.html_extract import synthetic_corpus
+
+
+settings = get_settings()
+
+
+def legacy_chunks(text: str, *, chunk_size: int = 500, overlap: int = 50) -> list[str]:
+    """O ``chunk_text_tokens`` anterior: janelas de palavras com overlap fixo."""
+    tokens = text.split()
+    chunks: list[str] = []
+    step = max(1, chunk_size - overlap)
+    for start in range(0, len(tokens), step):
+        end = min(len(tokens), start + chunk_size)
+        chunks.append(" ".join(tokens[start:end]))
+        if end >= len(tokens):
+            break
+    return chunks
+
+
+def load_documents(corpus: Path | None, synthetic_pages: int) -> list[tuple[str, bool]]:
+    """Lista de ``(texto, é_pdf)``."""
+    if corpus is None:
+        return [(extract_page(html).text, False) for html in synthetic_corpus(synthetic_pages)]
+
+    docs: list[tuple[str, bool]] = []
+    for path in sorted(corpus.rglob("*")):
+        suffix = path.suffix.lower()
+        if suffix in (".html", ".htm"):
+            docs.append((extract_page(path.read_text(encoding="utf-8", errors="replace")).text, False))
+        elif suffix == ".pdf":
+            docs.append((PAGE_BREAK.join(extract_pdf_pages(str(path), 0, 10_000)), True))
+    return docs
+
+
+def summarize(name: str, per_doc: list[list[str]]) -> dict:
+    chunks = [c for doc in per_doc for c in doc]
+    tokens = count_tokens(chunks)
+    # Sem o último chunk de cada documento: mede o empacotamento em si
+    last = set()
+    index = 0
+    for doc in per_doc:
+        index += len(doc)
+        if doc:
+            last.add(index - 1)
+    inner = [n for i, n in enumerate(tokens) if i not in last]
+    return {
+        "strategy": name,
+        "chunks": len(chunks),
+        "embedded_tokens": sum(tokens),
+        "mean_tokens": round(statistics.fmean(tokens), 1) if tokens else 0.0,
+        "mean_fill": round(statistics.fmean(tokens) / settings.CHUNK_MAX_TOKENS, 3) if tokens else 0.0,
+        "mean_fill_inner": round(statistics.fmean(inner) / settings.CHUNK_MAX_TOKENS, 3) if inner else 0.0,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=Path, help="diretório com páginas .html e/ou .pdf")
+    parser.add_argument("--synthetic-pages", type=int, default=50)
+    parser.add_argument("--json", type=Path, help="grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    docs = load_documents(args.corpus, args.synthetic_pages)
+    if not docs:
+        print("Nenhum documento encontrado no corpus.", file=sys.stderr)
+        return 1
+
+    legacy: list[list[str]] = []
+    structured: list[list[str]] = []
+    for text, is_pdf in docs:
+        legacy.append(legacy_chunks(text.replace(PAGE_BREAK, "\n\n")))
+        structured.append([c.text for c in chunk_document(text, numbered_headings=is_pdf)])
+
+    results = [summarize("legacy_words", legacy), summarize("structured", structured)]
+    before, after = results
+
+    print(f"Documentos: {len(docs)} (limite {settings.CHUNK_MAX_TOKENS} tokens/chunk)")
+    for r in results:
+        print(
+            f"{r['strategy']:<13} {r['chunks']:>6} chunks  {r['embedded_tokens']:>9} tokens  "
+            f"média {r['mean_tokens']:>6.1f} tokens/chunk  preenchimento {r['mean_fill']:.0%} "
+            f"({r['mean_fill_inner']:.0%} sem o último de cada documento)"
+        )
+    if before["chunks"] and before["embedded_tokens"]:
+        print(
+            f"Redução: {1 - after['chunks'] / before['chunks']:.1%} chunks, "
+            f"{1 - after['embedded_tokens'] / before['embedded_tokens']:.1%} tokens embedados"
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps({"documents": len(docs), "results": results}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""Benchmark dos backends de extração de HTML (páginas/s).
+
+Uso::
+
+    python -m benchmarks.html_extract --corpus ./paginas_salvas --repeat 3
+    python -m benchmarks.html_extract --processes 4 --json resultado.json
+
+``--corpus`` aponta para um diretório com arquivos ``.html``/``.htm`` (por
+exemplo, páginas da documentação salvas pelo navegador). Sem ``--corpus`` é
+gerado um corpus sintético parecido com páginas de documentação.
+
+Com ``--processes N`` cada backend também é medido extraindo o corpus num
+``ProcessPoolExecutor`` de N processos, como no crawler.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from backend.rag.html_extract import BACKENDS, available_backends
+
+
+def load_corpus(directory: Path) -> list[str]:
+    pages = []
+    for path in sorted(directory.rglob("*")):
+        if path.suffix.lower() in (".html", ".htm") and path.is_file():
+            pages.append(path.read_text(encoding="utf-8", errors="replace"))
+    return pages
+
+
+def synthetic_corpus(n_pages: int, seed: int = 42) -> list[str]:
+    rng = random.Random(seed)
+    words = (
+        "cadastro produto estoque venda cliente nota fiscal emissão caixa "
+        "relatório fornecedor pedido compra preço desconto tela menu botão "
+        "configuração usuário permissão sistema farmácia receita lote validade"
+    ).split()
+
+    def sentence() -> str:
+        return " ".join(rng.choice(words) for _ in range(rng.randint(6, 18))).capitalize() + "."
+
+    pages = []
+    for i in range(n_pages):
+        nav = "".join(f'<li><a href="/docs/{rng.randint(1, 500)}#s{j}">{sentence()}</a></li>' for j in range(40))
+        sections = "".join(
+            f"<h2>{sentence()}</h2>" + "".join(f"<p>{sentence()} {sentence()}</p>" for _ in range(6))
+            + "<ul>" + "".join(f"<li>{sentence()}</li>" for _ in range(5)) + "</ul>"
+            for _ in range(rng.randint(8, 20))
+        )
+        pages.append(
+            f"<!DOCTYPE html><html><head><title>Página {i}</title>"
+            "<style>body { font-family: sans-serif; }</style>"
+            "<script>window.dataLayer = [];</script></head><body>"
+            f"<header><nav><ul>{nav}</ul></nav></header>"
+            f"<main><article><h1>Manual {i}</h1>{sections}</article></main>"
+            "<footer><p>© Copiloto</p><noscript>Ative o JavaScript</noscript></footer>"
+            "</body></html>"
+        )
+    return pages
+
+
+def _extract_all(backend: str, pages: list[str]) -> int:
+    extract = BACKENDS[backend]
+    return sum(len(extract(html).text) for html in pages)
+
+
+def bench_backend(backend: str, pages: list[str], repeat: int, processes: int) -> dict:
+    extract = BACKENDS[backend]
+    extract(pages[0])  # aquece imports
+
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        _extract_all(backend, pages)
+        best = min(best, time.perf_counter() - started)
+
+    result = {
+        "backend": backend,
+        "pages": len(pages),
+        "seconds": round(best, 4),
+        "pages_per_sec": round(len(pages) / best, 1),
+    }
+
+    if processes > 1:
+        # Fatias contíguas, uma tarefa por processo — mede o ganho de escalar por núcleos
+        size = -(-len(pages) // processes)
+        slices = [pages[i:i + size] for i in range(0, len(pages), size)]
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            list(pool.map(_extract_all, [backend] * len(slices), [s[:1] for s in slices]))
+            best_pool = float("inf")
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(pool.map(_extract_all, [backend] * len(slices), slices))
+                best_pool = min(best_pool, time.perf_counter() - started)
+        result["processes"] = processes
+        result["pool_seconds"] = round(best_pool, 4)
+        result["pool_pages_per_sec"] = round(len(pages) / best_pool, 1)
+
+    return result
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=Path, help="diretório com páginas .html salvas")
+    parser.add_argument("--synthetic-pages", type=int, default=200)
+    parser.add_argument("--backends", nargs="*", default=None, help="padrão: todos os instalados")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--processes", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    pages = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.synthetic_pages)
+    if not pages:
+        print("Nenhuma página .html encontrada no corpus.", file=sys.stderr)
+        return 1
+
+    installed = available_backends()
+    backends = args.backends or installed
+    missing = [b for b in backends if b not in installed]
+    if missing:
+        print(f"Backends não instalados: {', '.join(missing)}", file=sys.stderr)
+        return 1
+
+    total_mb = sum(len(p.encode("utf-8")) for p in pages) / 1024 / 1024
+    print(f"Corpus: {len(pages)} páginas, {total_mb:.1f} MB")
+
+    results = [bench_backend(b, pages, args.repeat, args.processes) for b in backends]
+    baseline = next((r["pages_per_sec"] for r in results if r["backend"] == "bs4"), None)
+
+    for r in results:
+        line = f"{r['backend']:<11} {r['pages_per_sec']:>9.1f} páginas/s"
+        if baseline:
+            line += f"  ({r['pages_per_sec'] / baseline:.1f}x bs4)"
+        if "pool_pages_per_sec" in r:
+            line += f"  | {r['processes']} processos: {r['pool_pages_per_sec']:.1f} páginas/s"
+        print(line)
+
+    if args.json:
+        args.json.write_text(json.dumps({"corpus_pages": len(pages), "results": results}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
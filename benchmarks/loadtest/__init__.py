@@ -0,0 +1,8 @@
+"""Teste de carga ponta a ponta da API (rodar com ``python -m benchmarks.loadtest``).
+
+- ``stubs``: servidor que imita a API da Anthropic, a da Voyage e um site
+  de documentação, com latência configurável;
+- ``app``: a aplicação de ``backend.main.create_app`` instrumentada com
+  lag do event loop e espera por conexão do pool do banco;
+- ``__main__``: sobe os dois processos, gera a carga e reporta.
+"""
@@ -0,0 +1,496 @@
+"""Teste de carga ponta a ponta: quantos atendentes simultâneos uma instância aguenta.
+
+Uso::
+
+    python -m benchmarks.loadtest --concurrency 10 25 50 --duration 60 --json carga.json
+    python -m benchmarks.loadtest --llm-latency-ms 3000 --mix chat=70,screenshot=20,feedback=10
+    python -m benchmarks.loadtest --app-url http://localhost:8000 --concurrency 20
+
+Sobe o servidor de stubs (Anthropic, Voyage e site de documentação, ver
+``stubs``) e a aplicação instrumentada (``app``) num processo uvicorn
+próprio, apontada para os stubs e para o Postgres local (``DATABASE_URL``
+ou ``--database-url``). Com ``--app-url`` usa uma instância já rodando —
+ela precisa estar configurada com ``ANTHROPIC_BASE_URL``/``VOYAGE_BASE_URL``
+apontando para os stubs (o endereço é impresso no início).
+
+Antes da carga, cada tenant recebe ``--seed-docs`` páginas via
+``/ingest/batch``. Depois, para cada valor de ``--concurrency``, N
+atendentes virtuais repetem durante ``--duration`` segundos operações
+sorteadas pelo ``--mix``:
+
+- ``chat``: pergunta avulsa em ``/chat``;
+- ``history``: conversa persistida (``/conversations``), com histórico;
+- ``screenshot``: pergunta com captura de tela;
+- ``feedback``: ``POST /feedback``;
+- ``ingest``: lote com arquivos e uma URL em ``/ingest/batch``;
+- ``onboarding``: crawl do site de stubs via ``/onboarding/start``.
+
+Jobs (ingest/onboarding) são acompanhados em segundo plano, até
+``--max-jobs`` ao mesmo tempo. Por estágio são reportados vazão, taxa de
+erro e p50/p95/p99 por operação, junto com o que a aplicação mediu: lag do
+event loop, espera por conexão do pool, fila do gateway de LLM e chamadas
+aos stubs.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import httpx
+import numpy as np
+from PIL import Image, ImageDraw
+
+from benchmarks.html_extract import synthetic_corpus
+
+
+OPS = ("chat", "history", "screenshot", "feedback", "ingest", "onboarding")
+DEFAULT_MIX = "chat=50,history=25,screenshot=8,feedback=12,ingest=4,onboarding=1"
+HISTORY_TURNS = 10
+
+_WORDS = (
+    "como cadastrar produto estoque venda cliente nota fiscal emissão caixa "
+    "relatório fornecedor pedido compra preço desconto tela menu botão "
+    "configuração usuário permissão farmácia receita lote validade sngpc "
+    "cancelar estornar imprimir cupom fechamento convênio"
+).split()
+
+
+# ── Dados da carga ─────────────────────────────────────────────
+
+
+def _question(rng: random.Random) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(5, 12))).capitalize() + "?"
+
+
+def _screenshots(n: int, seed: int) -> list[str]:
+    """Capturas sintéticas (PNG base64) parecidas com telas de sistema."""
+    rng = random.Random(seed)
+    shots = []
+    for _ in range(n):
+        image = Image.new("RGB", (1366, 768), (236, 240, 244))
+        draw = ImageDraw.Draw(image)
+        draw.rectangle((0, 0, 1366, 48), fill=(rng.randint(0, 80), rng.randint(60, 140), rng.randint(120, 200)))
+        for row in range(14):
+            y = 90 + row * 44
+            for col in range(5):
+                x = 40 + col * 260
+                draw.rectangle((x, y, x + 240, y + 34), outline=(180, 180, 180), fill=(255, 255, 255))
+                draw.text((x + 8, y + 10), " ".join(rng.choice(_WORDS) for _ in range(2)), fill=(30, 30, 30))
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        shots.append(base64.b64encode(buffer.getvalue()).decode("ascii"))
+    return shots
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    mix: dict[str, float] = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPS:
+            raise argparse.ArgumentTypeError(f"operação desconhecida no --mix: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# ── Medição ────────────────────────────────────────────────────
+
+
+@dataclass(slots=True)
+class Recorder:
+    latencies: dict[str, list[float]] = field(default_factory=dict)
+    statuses: dict[str, dict[str, int]] = field(default_factory=dict)
+
+    def record(self, op: str, seconds: float, status: int | str) -> None:
+        self.latencies.setdefault(op, []).append(seconds)
+        counts = self.statuses.setdefault(op, {})
+        counts[str(status)] = counts.get(str(status), 0) + 1
+
+    def summary(self, wall: float) -> dict[str, Any]:
+        ops = {}
+        for op, values in sorted(self.latencies.items()):
+            ms = np.array(values) * 1000
+            errors = sum(n for s, n in self.statuses[op].items() if not s.startswith("2"))
+            ops[op] = {
+                "count": len(ms),
+                "errors": errors,
+                "per_second": round(len(ms) / wall, 2),
+                "p50_ms": round(float(np.percentile(ms, 50)), 1),
+                "p95_ms": round(float(np.percentile(ms, 95)), 1),
+                "p99_ms": round(float(np.percentile(ms, 99)), 1),
+                "max_ms": round(float(ms.max()), 1),
+                "statuses": self.statuses[op],
+            }
+        requests = sum(v["count"] for k, v in ops.items() if not k.endswith("_job"))
+        errors = sum(v["errors"] for k, v in ops.items() if not k.endswith("_job"))
+        return {
+            "requests": requests,
+            "throughput_rps": round(requests / wall, 2),
+            "error_rate": round(errors / requests, 4) if requests else 0.0,
+            "ops": ops,
+        }
+
+
+class LoadRun:
+    def __init__(self, args: argparse.Namespace, client: httpx.AsyncClient, stub_url: str) -> None:
+        self.args = args
+        self.client = client
+        self.stub_url = stub_url
+        self.mix = parse_mix(args.mix)
+        self.tenants = [f"carga-{i:03d}" for i in range(args.tenants)]
+        self.common = [_question(random.Random(i)) for i in range(30)]
+        self.screenshots = _screenshots(args.screenshots, args.seed)
+        self.jobs: set[asyncio.Task] = set()
+        self.recorder = Recorder()
+
+    # ── Chamadas ───────────────────────────────────────────
+
+    async def _call(self, op: str, method: str, path: str, **kwargs) -> httpx.Response | None:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError as exc:
+            self.recorder.record(op, time.perf_counter() - started, type(exc).__name__)
+            return None
+        self.recorder.record(op, time.perf_counter() - started, response.status_code)
+        return response
+
+    async def _follow(self, op: str, path: str, started: float) -> None:
+        """Acompanha um job até terminar e registra o tempo total em ``<op>_job``."""
+        deadline = started + self.args.job_timeout
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(1.0)
+            response = await self._call(f"{op}_poll", "GET", path)
+            if response is None or response.status_code != 200:
+                continue
+            status = response.json()["status"]
+            if status in ("completed", "failed"):
+                self.recorder.record(f"{op}_job", time.perf_counter() - started, 200 if status == "completed" else status)
+                return
+        self.recorder.record(f"{op}_job", time.perf_counter() - started, "timeout")
+
+    def _spawn_job(self, op: str, path: str, started: float) -> None:
+        task = asyncio.create_task(self._follow(op, path, started))
+        self.jobs.add(task)
+        task.add_done_callback(self.jobs.discard)
+
+    # ── Operações ──────────────────────────────────────────
+
+    async def chat(self, user: "Attendant") -> None:
+        await self._call("chat", "POST", "/chat", json={
+            "message": user.question(), "tenant_id": user.tenant, "context": user.context(),
+        })
+
+    async def history(self, user: "Attendant") -> None:
+        if user.conversation_id is None:
+            response = await self._call("conversation", "POST", "/conversations/", json={"tenant_id": user.tenant})
+            if response is None or response.status_code != 201:
+                return
+            user.conversation_id = response.json()["conversation_id"]
+            user.turns.clear()
+
+        message = user.question()
+        response = await self._call("history", "POST", "/chat", json={
+            "message": message,
+            "tenant_id": user.tenant,
+            "conversation_id": user.conversation_id,
+            "context": user.context(),
+            "history": user.turns[-HISTORY_TURNS:],
+        })
+        if response is not None and response.status_code == 200:
+            user.turns += [
+                {"role": "user", "content": message},
+                {"role": "assistant", "content": response.json()["response"]},
+            ]
+        if len(user.turns) >= 2 * HISTORY_TURNS:
+            user.conversation_id = None  # atendimento encerrado, próxima conversa
+
+    async def screenshot(self, user: "Attendant") -> None:
+        await self._call("screenshot", "POST", "/chat", json={
+            "message": user.question(),
+            "tenant_id": user.tenant,
+            "context": user.context(),
+            "screenshot": user.rng.choice(self.screenshots),
+        })
+
+    async def feedback(self, user: "Attendant") -> None:
+        await self._call("feedback", "POST", "/feedback/", json={
+            "tenant_id": user.tenant,
+            "message": user.question(),
+            "response": "Acesse Cadastros > Produtos e confira o lote.",
+            "rating": user.rng.choice(("positive", "positive", "negative")),
+        })
+
+    async def ingest(self, user: "Attendant") -> None:
+        files = [
+            ("files", (f"manual-{user.rng.randint(0, 10**6)}.txt", " ".join(_question(user.rng) for _ in range(400)).encode())),
+            ("files", (f"pagina-{user.rng.randint(0, 10**6)}.html", self._doc_html(user.rng.randint(0, 10**6)))),
+        ]
+        data = {"tenant_id": user.tenant, "urls": [f"{self.stub_url}/docs/{user.rng.randint(0, 10**6)}"]}
+        started = time.perf_counter()
+        response = await self._call("ingest", "POST", "/ingest/batch", data=data, files=files)
+        if response is not None and response.status_code == 202:
+            self._spawn_job("ingest", f"/ingest/batch/{response.json()['job_id']}", started)
+
+    async def onboarding(self, user: "Attendant") -> None:
+        started = time.perf_counter()
+        response = await self._call("onboarding", "POST", "/onboarding/start", json={
+            "tenant_id": user.tenant,
+            "root_url": f"{self.stub_url}/docs/{user.rng.randint(0, 500)}",
+            "product_name": "Carga",
+            "max_pages": self.args.onboarding_pages,
+        })
+        if response is not None and response.status_code == 202:
+            self._spawn_job("onboarding", f"/onboarding/status/{response.json()['job_id']}", started)
+
+    def _doc_html(self, page: int) -> bytes:
+        return synthetic_corpus(1, seed=page)[0].encode()
+
+    # ── Estágios ───────────────────────────────────────────
+
+    async def seed(self) -> None:
+        if not self.args.seed_docs:
+            return
+        print(f"Semeando {self.args.seed_docs} páginas por tenant...")
+        for t, tenant in enumerate(self.tenants):
+            urls = [f"{self.stub_url}/docs/{t * 1000 + i}" for i in range(self.args.seed_docs)]
+            response = await self.client.post("/ingest/batch", data={"tenant_id": tenant, "urls": urls})
+            response.raise_for_status()
+            self._spawn_job("seed", f"/ingest/batch/{response.json()['job_id']}", time.perf_counter())
+        await asyncio.gather(*list(self.jobs))
+        self.recorder = Recorder()
+
+    async def stage(self, concurrency: int) -> dict[str, Any]:
+        self.recorder = Recorder()
+        stop_at = time.perf_counter() + self.args.duration
+
+        async def attendant(i: int) -> None:
+            user = Attendant(self, random.Random(self.args.seed * 100_003 + concurrency * 1_009 + i))
+            await asyncio.sleep(self.args.ramp_seconds * i / concurrency)
+            while time.perf_counter() < stop_at:
+                op = user.pick()
+                await getattr(self, op)(user)
+                if self.args.think_ms:
+                    await asyncio.sleep(user.rng.expovariate(1000 / self.args.think_ms))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(attendant(i) for i in range(concurrency)))
+        wall = time.perf_counter() - started
+        return self.recorder.summary(wall) | {"wall_seconds": round(wall, 1)}
+
+
+class Attendant:
+    """Atendente virtual: um tenant, uma conversa corrente e um RNG próprio."""
+
+    def __init__(self, run: LoadRun, rng: random.Random) -> None:
+        self.run = run
+        self.rng = rng
+        self.tenant = rng.choice(run.tenants)
+        self.conversation_id: str | None = None
+        self.turns: list[dict[str, str]] = []
+
+    def pick(self) -> str:
+        ops = list(self.run.mix)
+        op = self.rng.choices(ops, weights=[self.run.mix[o] for o in ops])[0]
+        if op in ("ingest", "onboarding") and len(self.run.jobs) >= self.run.args.max_jobs:
+            return "chat"
+        return op
+
+    def question(self) -> str:
+        if self.rng.random() < self.run.args.repeat_ratio:
+            return self.rng.choice(self.run.common)
+        return _question(self.rng)
+
+    def context(self) -> dict[str, str]:
+        return {"current_url": f"https://erp.exemplo/tela/{self.rng.randint(1, 20)}"}
+
+
+# ── Processos ──────────────────────────────────────────────────
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _spawn(target: str, port: int, env: dict[str, str], log_level: str) -> subprocess.Popen:
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "--factory", target,
+            "--host", "127.0.0.1", "--port", str(port), "--log-level", log_level,
+        ],
+        env={**os.environ, **env},
+    )
+
+
+async def _wait_ready(url: str, process: subprocess.Popen | None, timeout: float = 90.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=2.0) as client:
+        while time.monotonic() < deadline:
+            if process is not None and process.poll() is not None:
+                raise RuntimeError(f"{url} encerrou com código {process.returncode} antes de ficar pronto")
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.3)
+    raise RuntimeError(f"{url} não respondeu em {timeout:.0f}s")
+
+
+def _delta(after: dict[str, float], before: dict[str, float]) -> dict[str, float]:
+    return {k: round(v - before.get(k, 0), 1) for k, v in after.items() if isinstance(v, (int, float))}
+
+
+async def run(args: argparse.Namespace) -> int:
+    processes: list[subprocess.Popen] = []
+    stub_port = args.stub_port or _free_port()
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    try:
+        processes.append(_spawn("benchmarks.loadtest.stubs:create_stub_app", stub_port, {
+            "LOADTEST_LLM_LATENCY_MS": str(args.llm_latency_ms),
+            "LOADTEST_LLM_JITTER_MS": str(args.llm_jitter_ms),
+            "LOADTEST_EMBED_LATENCY_MS": str(args.embed_latency_ms),
+            "LOADTEST_EMBED_JITTER_MS": str(args.embed_jitter_ms),
+        }, args.log_level))
+        await _wait_ready(f"{stub_url}/stats", processes[-1])
+        print(f"Stubs em {stub_url} (ANTHROPIC_BASE_URL={stub_url}, VOYAGE_BASE_URL={stub_url}/v1)")
+
+        app_url = args.app_url
+        if app_url is None:
+            app_port = _free_port()
+            app_url = f"http://127.0.0.1:{app_port}"
+            env = {
+                "ANTHROPIC_API_KEY": "stub",
+                "ANTHROPIC_BASE_URL": stub_url,
+                "VOYAGE_API_KEY": "stub",
+                "VOYAGE_BASE_URL": f"{stub_url}/v1",
+                "EMBEDDING_PROVIDER": "voyage",
+                "CHUNK_TOKENIZER": "approx",
+                "LOOP_MONITOR_ENABLED": "true",
+                "LOOP_MONITOR_INTERVAL_MS": str(args.lag_interval_ms),
+                # Mede capacidade, não cota: os limites por tenant ficam desligados salvo --admission
+                "ADMISSION_ENABLED": "true" if args.admission else "false",
+            }
+            if args.database_url:
+                env["DATABASE_URL"] = args.database_url
+            processes.append(_spawn("benchmarks.loadtest.app:create_instrumented_app", app_port, env, args.log_level))
+            await _wait_ready(f"{app_url}/health", processes[-1])
+        print(f"Aplicação em {app_url}")
+
+        limits = httpx.Limits(max_connections=max(args.concurrency) + args.max_jobs + 10)
+        stages = []
+        async with httpx.AsyncClient(base_url=app_url, timeout=args.timeout, limits=limits) as client, \
+                httpx.AsyncClient(base_url=stub_url, timeout=10) as stubs:
+            load = LoadRun(args, client, stub_url)
+            await load.seed()
+
+            for concurrency in args.concurrency:
+                await client.post("/loadtest/reset")
+                stubs_before = (await stubs.get("/stats")).json()
+                print(f"\n== {concurrency} atendentes, {args.duration}s ==")
+
+                result = await load.stage(concurrency)
+                metrics = (await client.get("/metrics")).json()
+                stage = {
+                    "concurrency": concurrency,
+                    **result,
+                    "server": metrics,
+                    "stubs": _delta((await stubs.get("/stats")).json(), stubs_before),
+                }
+                stages.append(stage)
+                _print_stage(stage)
+
+            if load.jobs:
+                print(f"\nAguardando {len(load.jobs)} job(s) em andamento...")
+                await asyncio.wait(list(load.jobs), timeout=args.job_timeout)
+
+        if args.json:
+            report = {"config": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()}, "stages": stages}
+            args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+            print(f"\nResultados em {args.json}")
+        return 0
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def _print_stage(stage: dict[str, Any]) -> None:
+    print(
+        f"  {stage['requests']} requisições em {stage['wall_seconds']}s — "
+        f"{stage['throughput_rps']} req/s, erro {stage['error_rate']:.1%}"
+    )
+    for op, s in stage["ops"].items():
+        print(
+            f"  {op:<16} {s['count']:>6}  p50 {s['p50_ms']:>8.1f}  p95 {s['p95_ms']:>8.1f}  "
+            f"p99 {s['p99_ms']:>8.1f}  max {s['max_ms']:>8.1f} ms  erros {s['errors']}"
+        )
+    probe = stage["server"].get("loadtest")
+    if probe:
+        lag, wait = probe["loop_lag"], probe["pool_wait"]
+        print(
+            f"  event loop lag   p50 {lag.get('p50_ms', 0):>8.1f}  p99 {lag.get('p99_ms', 0):>8.1f}  "
+            f"max {lag.get('max_ms', 0):>8.1f} ms"
+        )
+        print(
+            f"  espera do pool   p50 {wait.get('p50_ms', 0):>8.1f}  p99 {wait.get('p99_ms', 0):>8.1f}  "
+            f"max {wait.get('max_ms', 0):>8.1f} ms  (pico {probe['pool_peak_checked_out']} conexões)"
+        )
+    gateway = stage["server"].get("llm_gateway")
+    if gateway:
+        print(f"  gateway LLM      {json.dumps(gateway, ensure_ascii=False)}")
+    print(f"  stubs            {json.dumps(stage['stubs'], ensure_ascii=False)}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 25, 50], help="atendentes por estágio")
+    parser.add_argument("--duration", type=float, default=60, help="segundos por estágio")
+    parser.add_argument("--ramp-seconds", type=float, default=5)
+    parser.add_argument("--think-ms", type=float, default=2000, help="pausa média entre ações (0 = sem pausa)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"pesos por operação (padrão: {DEFAULT_MIX})")
+    parser.add_argument("--tenants", type=int, default=5)
+    parser.add_argument("--repeat-ratio", type=float, default=0.2, help="fração de perguntas repetidas")
+    parser.add_argument("--screenshots", type=int, default=6, help="capturas distintas em rodízio")
+    parser.add_argument("--seed-docs", type=int, default=10, help="páginas ingeridas por tenant antes da carga")
+    parser.add_argument("--onboarding-pages", type=int, default=10)
+    parser.add_argument("--max-jobs", type=int, default=4, help="jobs de ingest/onboarding simultâneos")
+    parser.add_argument("--job-timeout", type=float, default=300)
+    parser.add_argument("--timeout", type=float, default=120, help="timeout por requisição (s)")
+    parser.add_argument("--llm-latency-ms", type=float, default=1500)
+    parser.add_argument("--llm-jitter-ms", type=float, default=500)
+    parser.add_argument("--embed-latency-ms", type=float, default=80)
+    parser.add_argument("--embed-jitter-ms", type=float, default=20)
+    parser.add_argument("--lag-interval-ms", type=float, default=50)
+    parser.add_argument("--admission", action="store_true", help="mantém a admissão por tenant ligada na aplicação")
+    parser.add_argument("--app-url", help="instância já rodando (não sobe a aplicação)")
+    parser.add_argument("--database-url", help="Postgres da aplicação (padrão: configuração atual)")
+    parser.add_argument("--stub-port", type=int, default=0)
+    parser.add_argument("--log-level", default="warning")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", type=Path, help="grava os resultados em JSON")
+    args = parser.parse_args(argv)
+    parse_mix(args.mix)
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
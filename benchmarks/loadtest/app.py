@@ -0,0 +1,94 @@
+"""A aplicação real, instrumentada para o teste de carga.
+
+Sobe com uvicorn (``--factory benchmarks.loadtest.app:create_instrumented_app``)
+e acrescenta ao ``/metrics`` a fonte ``loadtest``:
+
+- lag do event loop: amostras do watchdog da aplicação
+  (``backend.core.loop_monitor``, intervalo ``LOOP_MONITOR_INTERVAL_MS``) —
+  trabalho síncrono no loop aparece aqui, e os pontos que bloquearam ficam
+  na fonte ``event_loop``;
+- espera por conexão do pool do SQLAlchemy: tempo dentro de ``_do_get`` do
+  pool (fila de checkout + abertura de conexão nova).
+
+``POST /loadtest/reset`` zera as amostras entre estágios.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import deque
+from typing import Any
+
+import numpy as np
+from fastapi import FastAPI
+
+from backend.core.loop_monitor import loop_monitor
+from backend.core.metrics import register_metrics_source
+from backend.main import create_app
+from backend.models.database import engine
+
+
+_MAX_SAMPLES = 200_000
+
+
+def _summary(samples: deque[float]) -> dict[str, Any]:
+    if not samples:
+        return {"samples": 0}
+    ms = np.fromiter(samples, dtype=np.float64, count=len(samples)) * 1000
+    return {
+        "samples": len(ms),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "max_ms": round(float(ms.max()), 2),
+        "mean_ms": round(float(ms.mean()), 3),
+    }
+
+
+class _Instrumentation:
+    def __init__(self) -> None:
+        self.pool_wait: deque[float] = deque(maxlen=_MAX_SAMPLES)
+        self.pool_peak_checked_out = 0
+
+    def reset(self) -> None:
+        loop_monitor.reset()
+        self.pool_wait.clear()
+        self.pool_peak_checked_out = 0
+
+    def instrument_pool(self) -> None:
+        pool = engine.sync_engine.pool
+        do_get = pool._do_get
+
+        def timed_do_get():
+            started = time.perf_counter()
+            try:
+                return do_get()
+            finally:
+                self.pool_wait.append(time.perf_counter() - started)
+                self.pool_peak_checked_out = max(self.pool_peak_checked_out, pool.checkedout())
+
+        pool._do_get = timed_do_get
+
+    def snapshot(self) -> dict[str, Any]:
+        pool = engine.sync_engine.pool
+        return {
+            "loop_lag": _summary(loop_monitor.samples),
+            "pool_wait": _summary(self.pool_wait),
+            "pool_size": pool.size(),
+            "pool_checked_out": pool.checkedout(),
+            "pool_peak_checked_out": self.pool_peak_checked_out,
+        }
+
+
+def create_instrumented_app() -> FastAPI:
+    app = create_app()
+    probe = _Instrumentation()
+    probe.instrument_pool()
+    register_metrics_source("loadtest", probe.snapshot)
+
+    @app.post("/loadtest/reset", include_in_schema=False)
+    async def reset() -> dict[str, str]:
+        probe.reset()
+        return {"status": "ok"}
+
+    return app
@@ -0,0 +1,129 @@
+"""Servidor substituto da Anthropic, da Voyage e de um site de documentação.
+
+Sobe com uvicorn (``--factory benchmarks.loadtest.stubs:create_stub_app``)
+e é configurado por variáveis de ambiente:
+
+- ``LOADTEST_LLM_LATENCY_MS`` / ``LOADTEST_LLM_JITTER_MS``: tempo de cada
+  ``POST /v1/messages`` (média ± variação uniforme);
+- ``LOADTEST_EMBED_LATENCY_MS`` / ``LOADTEST_EMBED_JITTER_MS``: idem para
+  ``POST /v1/embeddings``;
+- ``LOADTEST_EMBED_DIM``: dimensão dos vetores devolvidos.
+
+Os embeddings vêm do ``HashingProvider`` (textos parecidos dão vetores
+parecidos, então o RAG e o cache semântico se comportam de forma
+plausível). ``GET /docs/{n}`` serve páginas sintéticas com links entre si,
+para onboarding e ingestão de URLs sem rede externa.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import os
+import random
+import time
+from typing import Any
+
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse
+
+from backend.rag.embeddings import HashingProvider, normalize
+from benchmarks.html_extract import synthetic_corpus
+
+
+def _env_ms(name: str, default: float) -> float:
+    return float(os.environ.get(name, default)) / 1000
+
+
+async def _sleep(mean: float, jitter: float) -> None:
+    delay = max(0.0, mean + random.uniform(-jitter, jitter))
+    if delay:
+        await asyncio.sleep(delay)
+
+
+def _message_text(messages: list[dict[str, Any]]) -> str:
+    last = messages[-1]["content"] if messages else ""
+    if isinstance(last, str):
+        return last
+    return " ".join(block.get("text", "") for block in last if block.get("type") == "text")
+
+
+def create_stub_app() -> FastAPI:
+    llm_latency = _env_ms("LOADTEST_LLM_LATENCY_MS", 1500)
+    llm_jitter = _env_ms("LOADTEST_LLM_JITTER_MS", 500)
+    embed_latency = _env_ms("LOADTEST_EMBED_LATENCY_MS", 80)
+    embed_jitter = _env_ms("LOADTEST_EMBED_JITTER_MS", 20)
+    hashing = HashingProvider(int(os.environ.get("LOADTEST_EMBED_DIM", 1024)))
+
+    app = FastAPI(title="Copiloto Farma — stubs de carga")
+    counter = itertools.count(1)
+    stats: dict[str, float] = {
+        "messages": 0, "vision_messages": 0, "embedding_calls": 0, "embedded_texts": 0, "doc_pages": 0,
+    }
+    started = time.monotonic()
+
+    @app.post("/v1/messages")
+    async def messages(request: Request) -> dict[str, Any]:
+        body = await request.json()
+        prompt = _message_text(body.get("messages", []))
+        has_image = any(
+            isinstance(m.get("content"), list) and any(b.get("type") == "image" for b in m["content"])
+            for m in body.get("messages", [])
+        )
+        stats["messages"] += 1
+        stats["vision_messages"] += has_image
+        await _sleep(llm_latency, llm_jitter)
+
+        text = (
+            "Para resolver, acesse o menu Cadastros > Produtos, confira o lote e a "
+            "validade e confirme a operação. Se o erro continuar, verifique as "
+            "permissões do usuário."
+        )
+        if "<tela>" in prompt:
+            text = "<tela>Tela de cadastro de produtos com a grade de lotes aberta.</tela>\n" + text
+        input_tokens = len(str(body)) // 4
+        return {
+            "id": f"msg_stub_{next(counter)}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "stub"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {
+                "input_tokens": input_tokens,
+                "output_tokens": len(text) // 4,
+                "cache_creation_input_tokens": 0,
+                "cache_read_input_tokens": 0,
+            },
+        }
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request) -> dict[str, Any]:
+        body = await request.json()
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        stats["embedding_calls"] += 1
+        stats["embedded_texts"] += len(texts)
+        await _sleep(embed_latency, embed_jitter)
+
+        vectors = normalize(hashing._embed_batch(texts, body.get("input_type") or "document"))
+        return {
+            "object": "list",
+            "data": [
+                {"object": "embedding", "embedding": vector.tolist(), "index": i}
+                for i, vector in enumerate(vectors)
+            ],
+            "model": body.get("model", "stub"),
+            "usage": {"total_tokens": sum(len(t) // 4 for t in texts)},
+        }
+
+    @app.get("/docs/{page}", response_class=HTMLResponse)
+    async def docs(page: int) -> str:
+        stats["doc_pages"] += 1
+        return synthetic_corpus(1, seed=page)[0]
+
+    @app.get("/stats")
+    async def get_stats() -> dict[str, float]:
+        return {**stats, "uptime_seconds": round(time.monotonic() - started, 1)}
+
+    return app
@@ -0,0 +1,679 @@
+"""Benchmark de recuperação: recall@k × latência por tamanho de corpus e modo de índice.
+
+Uso::
+
+    python -m benchmarks.retrieval --chunks-per-tenant 10000 100000 --json retrieval.json
+    python -m benchmarks.retrieval --tenants 200 --chunks-per-tenant 2000 --modes exact hnsw
+    python -m benchmarks.retrieval --dump embeddings.npz --baseline retrieval.json
+
+Carrega um corpus multi-tenant num schema próprio (``--schema``, recriado a
+cada cenário) do Postgres local com pgvector, com a mesma tabela
+``documents`` da aplicação, e mede a mesma consulta de
+``retriever._RETRIEVE_SQL`` em cada modo:
+
+- ``exact``: sem índice vetorial (o que roda em produção hoje);
+- ``ivfflat`` e ``hnsw`` sobre ``vector``;
+- ``hnsw_halfvec``: índice sobre ``embedding::halfvec`` (pgvector >= 0.7);
+- ``hnsw_binary``: índice sobre ``binary_quantize(embedding)`` com
+  re-ranqueamento exato dos candidatos (pgvector >= 0.7).
+
+Cada modo roda com algumas variantes de parâmetros de busca
+(``ivfflat.probes``, ``hnsw.ef_search``, ``hnsw.iterative_scan`` quando
+disponível). Para cada uma são reportados p50/p95/p99, QPS e recall@k contra
+o top-k exato calculado em numpy enquanto o corpus é carregado.
+
+Corpus:
+
+- ``--generator clusters`` (padrão): vetores normalizados em torno de
+  centróides por tenant — distribuição parecida com embeddings reais;
+- ``--generator hashing``: textos sintéticos por tópico embedados pelo
+  ``HashingProvider`` (sem rede);
+- ``--dump arquivo.npz``: embeddings salvos (``embeddings`` obrigatório;
+  ``tenant_ids``, ``queries`` e ``query_tenants`` opcionais). Um ``.npy``
+  com só a matriz também serve.
+
+Com ``--baseline`` os resultados são comparados a um JSON anterior e o
+comando sai com código 1 se algum p95 piorar mais que
+``--max-latency-regression`` ou algum recall cair mais que
+``--max-recall-drop``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator
+
+import asyncpg
+import numpy as np
+from pgvector.asyncpg import register_vector
+
+from backend.core.config import get_settings
+from backend.rag.embeddings import HashingProvider, fit_to_dim, normalize
+
+
+settings = get_settings()
+
+BLOCK_ROWS = 10_000
+INDEX_NAME = "ix_bench_documents_embedding"
+CLUSTER_SPREAD = 0.8  # norma média do ruído em torno do centróide
+
+# Mesma projeção de retriever._RETRIEVE_SQL; $1 = vetor, $2 = tenant, $3 = top_k
+_SELECT = "SELECT id, content, source_url, heading_path, {score} AS score FROM documents WHERE tenant_id = $2"
+_VECTOR_SQL = _SELECT.format(score="embedding <-> $1::vector") + " ORDER BY score LIMIT $3"
+
+
+def _halfvec_sql(dim: int) -> str:
+    expr = f"embedding::halfvec({dim}) <-> $1::vector::halfvec({dim})"
+    return _SELECT.format(score=expr) + " ORDER BY score LIMIT $3"
+
+
+def _binary_sql(dim: int) -> str:
+    # $4 = fator de re-ranqueamento: busca k·fator candidatos por Hamming e
+    # reordena pela distância exata
+    inner = (
+        _SELECT.format(score="embedding <-> $1::vector")
+        + f" ORDER BY binary_quantize(embedding)::bit({dim}) <~> binary_quantize($1::vector)"
+        + " LIMIT $3 * $4"
+    )
+    return f"SELECT * FROM ({inner}) candidates ORDER BY score LIMIT $3"
+
+
+# ── Corpus ─────────────────────────────────────────────────────
+
+
+@dataclass(slots=True)
+class Block:
+    tenant_id: str
+    ids: np.ndarray
+    vectors: np.ndarray
+    texts: list[str]
+
+
+@dataclass(slots=True)
+class Query:
+    tenant_id: str
+    vector: np.ndarray
+    truth: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+
+
+def _filler(text: str, chars: int) -> str:
+    return text if len(text) >= chars else (text + " ") * (chars // (len(text) + 1)) + text
+
+
+class SyntheticCorpus:
+    """Corpus gerado sob demanda, em blocos, de forma determinística."""
+
+    def __init__(
+        self, *, tenants: int, per_tenant: int, dim: int, seed: int, generator: str, content_chars: int,
+    ) -> None:
+        self.tenant_ids = [f"bench-{t:04d}" for t in range(tenants)]
+        self.per_tenant = per_tenant
+        self.dim = dim
+        self.seed = seed
+        self.generator = generator
+        self.content_chars = content_chars
+        self.clusters = max(8, per_tenant // 500)
+        self._hashing = HashingProvider(dim) if generator == "hashing" else None
+        self._vocabulary = [f"termo{i}" for i in range(5000)]
+
+    @property
+    def rows(self) -> int:
+        return len(self.tenant_ids) * self.per_tenant
+
+    def describe(self) -> dict:
+        return {
+            "source": self.generator,
+            "tenants": len(self.tenant_ids),
+            "chunks_per_tenant": self.per_tenant,
+            "rows": self.rows,
+        }
+
+    def _centroids(self, tenant: int) -> np.ndarray:
+        rng = np.random.default_rng([self.seed, tenant, 0])
+        return normalize(rng.standard_normal((self.clusters, self.dim), dtype=np.float32))
+
+    def _topics(self, tenant: int) -> list[list[str]]:
+        rng = np.random.default_rng([self.seed, tenant, 0])
+        return [list(rng.choice(self._vocabulary, 40, replace=False)) for _ in range(self.clusters)]
+
+    def _embed(self, texts: list[str]) -> np.ndarray:
+        return normalize(fit_to_dim(self._hashing.embed(texts), self.dim)).astype(np.float32)
+
+    def _around(self, rng: np.random.Generator, centroids: np.ndarray, labels: np.ndarray) -> np.ndarray:
+        noise = rng.standard_normal((len(labels), self.dim), dtype=np.float32)
+        return normalize(centroids[labels] + noise * (CLUSTER_SPREAD / np.sqrt(self.dim)))
+
+    def _texts(self, rng: np.random.Generator, topics: list[list[str]], labels: np.ndarray, words: int) -> list[str]:
+        texts = []
+        for label in labels:
+            own = rng.choice(topics[label], int(words * 0.7))
+            other = rng.choice(self._vocabulary, words - len(own))
+            texts.append(" ".join(np.concatenate([own, other])))
+        return texts
+
+    def blocks(self) -> Iterator[Block]:
+        next_id = 1
+        for t, tenant_id in enumerate(self.tenant_ids):
+            rng = np.random.default_rng([self.seed, t, 1])
+            centroids = self._centroids(t) if self._hashing is None else None
+            topics = self._topics(t) if self._hashing is not None else None
+            for start in range(0, self.per_tenant, BLOCK_ROWS):
+                n = min(BLOCK_ROWS, self.per_tenant - start)
+                labels = rng.integers(0, self.clusters, n)
+                ids = np.arange(next_id, next_id + n, dtype=np.int64)
+                next_id += n
+                if self._hashing is not None:
+                    texts = self._texts(rng, topics, labels, 60)
+                    vectors = self._embed(texts)
+                    texts = [_filler(text, self.content_chars) for text in texts]
+                else:
+                    vectors = self._around(rng, centroids, labels)
+                    texts = [
+                        _filler(f"Trecho sintético {i} do tópico {label}.", self.content_chars)
+                        for i, label in zip(ids, labels)
+                    ]
+                yield Block(tenant_id, ids, vectors, texts)
+
+    def queries(self, n: int) -> list[Query]:
+        rng = np.random.default_rng([self.seed, 2**31 - 1])
+        tenants = rng.integers(0, len(self.tenant_ids), n)
+        queries = []
+        for t in tenants:
+            label = rng.integers(0, self.clusters, 1)
+            if self._hashing is not None:
+                vector = self._embed(self._texts(rng, self._topics(t), label, 8))[0]
+            else:
+                vector = self._around(rng, self._centroids(t), label)[0]
+            queries.append(Query(self.tenant_ids[t], vector))
+        return queries
+
+
+class DumpCorpus:
+    """Embeddings salvos em ``.npz`` (ou ``.npy``)."""
+
+    def __init__(self, path: Path, *, seed: int, content_chars: int) -> None:
+        data = np.load(path, allow_pickle=False)
+        arrays = {"embeddings": data} if isinstance(data, np.ndarray) else dict(data)
+        self.path = path
+        self.seed = seed
+        self.content_chars = content_chars
+        self.vectors = np.asarray(arrays["embeddings"], dtype=np.float32)
+        self.dim = self.vectors.shape[1]
+        tenants = arrays.get("tenant_ids")
+        self.row_tenants = (
+            np.asarray(tenants).astype(str) if tenants is not None
+            else np.full(len(self.vectors), "bench-0000")
+        )
+        self.tenant_ids = sorted(set(self.row_tenants.tolist()))
+        self.saved_queries = arrays.get("queries")
+        self.saved_query_tenants = arrays.get("query_tenants")
+
+    @property
+    def rows(self) -> int:
+        return len(self.vectors)
+
+    def describe(self) -> dict:
+        return {
+            "source": f"dump:{self.path.name}",
+            "tenants": len(self.tenant_ids),
+            "chunks_per_tenant": self.rows // max(1, len(self.tenant_ids)),
+            "rows": self.rows,
+        }
+
+    def blocks(self) -> Iterator[Block]:
+        next_id = 1
+        for tenant_id in self.tenant_ids:
+            rows = np.flatnonzero(self.row_tenants == tenant_id)
+            for start in range(0, len(rows), BLOCK_ROWS):
+                part = rows[start:start + BLOCK_ROWS]
+                ids = np.arange(next_id, next_id + len(part), dtype=np.int64)
+                next_id += len(part)
+                texts = [_filler(f"Trecho {i} do dump.", self.content_chars) for i in ids]
+                yield Block(tenant_id, ids, self.vectors[part], texts)
+
+    def queries(self, n: int) -> list[Query]:
+        rng = np.random.default_rng([self.seed, 2**31 - 1])
+        if self.saved_queries is not None:
+            vectors = np.asarray(self.saved_queries, dtype=np.float32)
+            picks = rng.choice(len(vectors), n, replace=len(vectors) < n)
+            if self.saved_query_tenants is not None:
+                tenants = np.asarray(self.saved_query_tenants).astype(str)[picks]
+            else:
+                tenants = rng.choice(self.tenant_ids, n)
+            return [Query(str(t), vectors[i]) for t, i in zip(tenants, picks)]
+
+        # Sem consultas salvas: linhas do corpus com ruído, na norma original
+        rows = rng.choice(self.rows, n, replace=self.rows < n)
+        base = self.vectors[rows]
+        noise = rng.standard_normal(base.shape, dtype=np.float32) * (0.5 / np.sqrt(self.dim))
+        norms = np.linalg.norm(base, axis=1, keepdims=True)
+        vectors = normalize(base / np.where(norms == 0, 1, norms) + noise) * norms
+        return [Query(str(self.row_tenants[r]), v) for r, v in zip(rows, vectors.astype(np.float32))]
+
+
+# ── Modos de índice ────────────────────────────────────────────
+
+
+@dataclass(slots=True)
+class Variant:
+    label: str
+    gucs: dict[str, str]
+    rerank: int = 0
+
+
+@dataclass(slots=True)
+class Mode:
+    name: str
+    min_version: tuple[int, ...]
+    max_dim: int
+
+    def index_sql(self, dim: int, rows: int) -> str | None:
+        hnsw = "WITH (m = 16, ef_construction = 64)"
+        if self.name == "ivfflat":
+            return (
+                f"CREATE INDEX {INDEX_NAME} ON documents USING ivfflat (embedding vector_l2_ops) "
+                f"WITH (lists = {ivfflat_lists(rows)})"
+            )
+        if self.name == "hnsw":
+            return f"CREATE INDEX {INDEX_NAME} ON documents USING hnsw (embedding vector_l2_ops) {hnsw}"
+        if self.name == "hnsw_halfvec":
+            return (
+                f"CREATE INDEX {INDEX_NAME} ON documents "
+                f"USING hnsw ((embedding::halfvec({dim})) halfvec_l2_ops) {hnsw}"
+            )
+        if self.name == "hnsw_binary":
+            return (
+                f"CREATE INDEX {INDEX_NAME} ON documents "
+                f"USING hnsw ((binary_quantize(embedding)::bit({dim})) bit_hamming_ops) {hnsw}"
+            )
+        return None
+
+    def query_sql(self, dim: int) -> str:
+        if self.name == "hnsw_halfvec":
+            return _halfvec_sql(dim)
+        if self.name == "hnsw_binary":
+            return _binary_sql(dim)
+        return _VECTOR_SQL
+
+    def variants(self, rows: int, top_k: int, version: tuple[int, ...]) -> list[Variant]:
+        if self.name == "exact":
+            return [Variant("default", {})]
+        if self.name == "ivfflat":
+            lists = ivfflat_lists(rows)
+            probes = sorted({p for p in (1, 4, 10, int(np.sqrt(lists)), lists // 10) if 1 <= p <= lists})
+            return [Variant(f"probes={p}", {"ivfflat.probes": str(p)}) for p in probes]
+        if self.name == "hnsw_binary":
+            return [
+                Variant(
+                    f"rerank={f} ef_search={max(40, top_k * f)}",
+                    {"hnsw.ef_search": str(max(40, top_k * f))},
+                    rerank=f,
+                )
+                for f in (4, 10)
+            ]
+        variants = [Variant(f"ef_search={ef}", {"hnsw.ef_search": str(ef)}) for ef in (40, 100, 200)]
+        if version >= (0, 8):
+            # Filtro por tenant depois do índice: a busca iterativa continua
+            # varrendo o grafo até achar k linhas do tenant
+            variants.append(
+                Variant(
+                    "ef_search=40 iterative=relaxed",
+                    {"hnsw.ef_search": "40", "hnsw.iterative_scan": "relaxed_order"},
+                )
+            )
+        return variants
+
+
+MODES = {
+    mode.name: mode
+    for mode in (
+        Mode("exact", (0,), 16_000),
+        Mode("ivfflat", (0, 4), 2_000),
+        Mode("hnsw", (0, 5), 2_000),
+        Mode("hnsw_halfvec", (0, 7), 4_000),
+        Mode("hnsw_binary", (0, 7), 64_000),
+    )
+}
+
+
+def ivfflat_lists(rows: int) -> int:
+    """Recomendação do pgvector: linhas/1000 até 1M, √linhas acima."""
+    return max(10, rows // 1000) if rows <= 1_000_000 else int(np.sqrt(rows))
+
+
+def parse_version(text: str) -> tuple[int, ...]:
+    return tuple(int(p) for p in text.split(".") if p.isdigit())
+
+
+# ── Carga e verdade exata ──────────────────────────────────────
+
+
+class _TopK:
+    """Top-k exato incremental das consultas de cada tenant."""
+
+    def __init__(self, queries: list[Query], k: int) -> None:
+        self.k = k
+        self.by_tenant: dict[str, np.ndarray] = {}
+        for tenant_id in {q.tenant_id for q in queries}:
+            self.by_tenant[tenant_id] = np.array(
+                [i for i, q in enumerate(queries) if q.tenant_id == tenant_id], dtype=np.int64
+            )
+        self.matrix = np.vstack([q.vector for q in queries]).astype(np.float32)
+        self._ids: dict[int, np.ndarray] = {}
+        self._dist: dict[int, np.ndarray] = {}
+
+    def update(self, block: Block) -> None:
+        rows = self.by_tenant.get(block.tenant_id)
+        if rows is None:
+            return
+        q = self.matrix[rows]
+        x = block.vectors
+        dist = (q * q).sum(1)[:, None] + (x * x).sum(1)[None, :] - 2 * q @ x.T
+        for row, d in zip(rows, dist):
+            ids = np.concatenate([self._ids.get(row, np.zeros(0, np.int64)), block.ids])
+            d = np.concatenate([self._dist.get(row, np.zeros(0, np.float32)), d])
+            if len(d) > self.k:
+                keep = np.argpartition(d, self.k)[:self.k]
+                ids, d = ids[keep], d[keep]
+            self._ids[row], self._dist[row] = ids, d
+
+    def finish(self, queries: list[Query]) -> None:
+        for row, query in enumerate(queries):
+            ids = self._ids.get(row, np.zeros(0, np.int64))
+            query.truth = ids[np.argsort(self._dist.get(row, np.zeros(0, np.float32)))]
+
+
+async def create_schema(conn: asyncpg.Connection, schema: str, dim: int) -> None:
+    await conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    await conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+    await conn.execute(f"CREATE SCHEMA {schema}")
+    # Espelha backend.models.database.Document, com id explícito para a
+    # verdade exata casar com o banco
+    await conn.execute(
+        f"""
+        CREATE TABLE {schema}.documents (
+            id BIGINT PRIMARY KEY,
+            tenant_id VARCHAR(64) NOT NULL,
+            content TEXT NOT NULL,
+            embedding vector({dim}) NOT NULL,
+            source_url VARCHAR(2048),
+            heading_path TEXT,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """
+    )
+    await conn.execute(f"CREATE INDEX ix_bench_documents_tenant ON {schema}.documents (tenant_id)")
+
+
+async def load_corpus(conn: asyncpg.Connection, schema: str, corpus, queries: list[Query], k: int) -> float:
+    """COPY do corpus em blocos, calculando o top-k exato no caminho."""
+    truth = _TopK(queries, k)
+    started = time.perf_counter()
+    loaded = 0
+    for block in corpus.blocks():
+        truth.update(block)
+        records = [
+            (int(i), block.tenant_id, text, vector, f"bench://{block.tenant_id}/{int(i) // 20}")
+            for i, text, vector in zip(block.ids, block.texts, block.vectors)
+        ]
+        await conn.copy_records_to_table(
+            "documents",
+            schema_name=schema,
+            records=records,
+            columns=["id", "tenant_id", "content", "embedding", "source_url"],
+        )
+        loaded += len(records)
+        print(f"  carregadas {loaded}/{corpus.rows} linhas", end="\r", flush=True)
+    await conn.execute(f"ANALYZE {schema}.documents")
+    truth.finish(queries)
+    print()
+    return time.perf_counter() - started
+
+
+# ── Workload ───────────────────────────────────────────────────
+
+
+async def run_variant(
+    args: argparse.Namespace,
+    sql: str,
+    variant: Variant,
+    warmup: list[Query],
+    queries: list[Query],
+) -> dict:
+    async def init(conn: asyncpg.Connection) -> None:
+        await register_vector(conn)
+        for key, value in variant.gucs.items():
+            await conn.execute(f"SET {key} = '{value}'")
+
+    def params(query: Query) -> tuple:
+        extra = (variant.rerank,) if variant.rerank else ()
+        return (query.vector, query.tenant_id, args.top_k, *extra)
+
+    pool = await asyncpg.create_pool(
+        args.dsn,
+        min_size=args.concurrency,
+        max_size=args.concurrency,
+        init=init,
+        server_settings={"search_path": f"{args.schema},public"},
+    )
+    try:
+        async with pool.acquire() as conn:
+            plan = await conn.fetchval("EXPLAIN (FORMAT JSON) " + sql, *params(queries[0]))
+            for query in warmup:
+                await conn.fetch(sql, *params(query))
+
+        latencies = np.zeros(len(queries))
+        found: list[list[int]] = [[] for _ in queries]
+        pending = iter(range(len(queries)))
+
+        async def worker() -> None:
+            async with pool.acquire() as conn:
+                for i in pending:
+                    started = time.perf_counter()
+                    rows = await conn.fetch(sql, *params(queries[i]))
+                    latencies[i] = time.perf_counter() - started
+                    found[i] = [row["id"] for row in rows]
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        wall = time.perf_counter() - started
+    finally:
+        await pool.close()
+
+    recalls = [
+        len(set(got) & set(q.truth.tolist())) / len(q.truth)
+        for got, q in zip(found, queries)
+        if len(q.truth)
+    ]
+    ms = latencies * 1000
+    return {
+        "variant": variant.label,
+        "settings": variant.gucs | ({"rerank": variant.rerank} if variant.rerank else {}),
+        "index_used": INDEX_NAME in plan,
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+        "qps": round(len(queries) / wall, 1),
+        f"recall_at_{args.top_k}": round(float(np.mean(recalls)), 4) if recalls else None,
+    }
+
+
+async def run_scenario(args: argparse.Namespace, corpus, version: tuple[int, ...]) -> list[dict]:
+    info = corpus.describe()
+    label = f"{info['tenants']}x{info['chunks_per_tenant']}"
+    print(f"\n== Cenário {label} ({info['rows']} linhas, {info['source']}) ==")
+
+    all_queries = corpus.queries(args.warmup + args.queries)
+    warmup, queries = all_queries[:args.warmup], all_queries[args.warmup:]
+
+    conn = await asyncpg.connect(args.dsn)
+    try:
+        await conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        await register_vector(conn)
+        await create_schema(conn, args.schema, corpus.dim)
+        load_seconds = await load_corpus(conn, args.schema, corpus, all_queries, args.top_k)
+        await conn.execute(f"SET search_path = {args.schema}, public")
+        await conn.execute(f"SET maintenance_work_mem = '{args.maintenance_work_mem}'")
+
+        results = []
+        for name in args.modes:
+            mode = MODES[name]
+            if version < mode.min_version or corpus.dim > mode.max_dim:
+                print(f"  {name}: indisponível (pgvector {'.'.join(map(str, version))}, dim {corpus.dim})")
+                continue
+
+            await conn.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+            build_seconds, index_bytes = 0.0, 0
+            ddl = mode.index_sql(corpus.dim, corpus.rows)
+            if ddl:
+                started = time.perf_counter()
+                await conn.execute(ddl)
+                build_seconds = time.perf_counter() - started
+                index_bytes = await conn.fetchval(f"SELECT pg_relation_size('{INDEX_NAME}')")
+
+            for variant in mode.variants(corpus.rows, args.top_k, version):
+                result = await run_variant(args, mode.query_sql(corpus.dim), variant, warmup, queries)
+                result = {
+                    "scenario": label,
+                    **info,
+                    "mode": name,
+                    "load_seconds": round(load_seconds, 2),
+                    "build_seconds": round(build_seconds, 2),
+                    "index_bytes": index_bytes,
+                    **result,
+                }
+                results.append(result)
+                print(
+                    f"  {name:<13} {variant.label:<32} p50 {result['p50_ms']:8.2f}  "
+                    f"p95 {result['p95_ms']:8.2f}  p99 {result['p99_ms']:8.2f} ms  "
+                    f"{result['qps']:8.1f} q/s  recall {result[f'recall_at_{args.top_k}']}"
+                    + ("" if result["index_used"] or not ddl else "  (índice não usado)")
+                )
+        await conn.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+        if not args.keep:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+    finally:
+        await conn.close()
+    return results
+
+
+# ── Comparação com baseline ────────────────────────────────────
+
+
+def compare(results: list[dict], baseline: dict, args: argparse.Namespace) -> list[str]:
+    """Lista de regressões em relação a um JSON anterior."""
+    recall_key = f"recall_at_{args.top_k}"
+    previous = {(r["scenario"], r["mode"], r["variant"]): r for r in baseline.get("results", [])}
+    problems = []
+    for r in results:
+        before = previous.get((r["scenario"], r["mode"], r["variant"]))
+        if before is None:
+            continue
+        name = f"{r['scenario']} {r['mode']} {r['variant']}"
+        if before["p95_ms"] and r["p95_ms"] > before["p95_ms"] * (1 + args.max_latency_regression):
+            problems.append(f"{name}: p95 {before['p95_ms']} → {r['p95_ms']} ms")
+        if before.get(recall_key) is not None and r.get(recall_key) is not None:
+            if r[recall_key] < before[recall_key] - args.max_recall_drop:
+                problems.append(f"{name}: recall {before[recall_key]} → {r[recall_key]}")
+    return problems
+
+
+def default_dsn() -> str:
+    return settings.async_database_url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+async def run(args: argparse.Namespace) -> int:
+    conn = await asyncpg.connect(args.dsn)
+    try:
+        await conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        pgvector = await conn.fetchval("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        postgres = await conn.fetchval("SHOW server_version")
+    finally:
+        await conn.close()
+    version = parse_version(pgvector)
+
+    if args.dump:
+        corpora = [DumpCorpus(args.dump, seed=args.seed, content_chars=args.content_chars)]
+    else:
+        corpora = [
+            SyntheticCorpus(
+                tenants=args.tenants,
+                per_tenant=size,
+                dim=args.dim,
+                seed=args.seed,
+                generator=args.generator,
+                content_chars=args.content_chars,
+            )
+            for size in args.chunks_per_tenant
+        ]
+
+    results = []
+    for corpus in corpora:
+        results.extend(await run_scenario(args, corpus, version))
+
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "postgres": postgres,
+            "pgvector": pgvector,
+            "python": platform.python_version(),
+            "dim": corpora[0].dim,
+            "top_k": args.top_k,
+            "queries": args.queries,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+        print(f"\nResultados em {args.json}")
+
+    if args.baseline:
+        problems = compare(results, json.loads(args.baseline.read_text()), args)
+        if problems:
+            print("\nRegressões em relação ao baseline:")
+            for problem in problems:
+                print(f"  - {problem}")
+            return 1
+        print("\nSem regressões em relação ao baseline.")
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", default=default_dsn(), help="Postgres com pgvector (padrão: DATABASE_URL)")
+    parser.add_argument("--schema", default="copiloto_bench", help="schema recriado a cada cenário")
+    parser.add_argument("--tenants", type=int, default=1)
+    parser.add_argument("--chunks-per-tenant", type=int, nargs="+", default=[10_000])
+    parser.add_argument("--generator", choices=("clusters", "hashing"), default="clusters")
+    parser.add_argument("--dump", type=Path, help=".npz/.npy com embeddings salvos (ignora o gerador)")
+    parser.add_argument("--dim", type=int, default=settings.EMBEDDING_DIM)
+    parser.add_argument("--content-chars", type=int, default=600, help="tamanho do content sintético")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=settings.RAG_TOP_K)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--maintenance-work-mem", default="512MB", help="para a construção dos índices")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="não apaga o schema ao final")
+    parser.add_argument("--json", type=Path, help="grava os resultados em JSON")
+    parser.add_argument("--baseline", type=Path, help="JSON anterior para detectar regressões")
+    parser.add_argument("--max-latency-regression", type=float, default=0.2, help="fração tolerada no p95")
+    parser.add_argument("--max-recall-drop", type=float, default=0.02)
+    args = parser.parse_args(argv)
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""Tempo de cold start: import da aplicação, boot até o primeiro ``/health`` e warmup.
+
+Uso::
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --modes fast full --repeat 5 --json startup.json
+
+Cada medição roda num processo novo (como um cold start no Render):
+
+- ``import``: ``import backend.main`` (mediana de ``--repeat``), com os
+  módulos mais caros segundo ``python -X importtime``;
+- ``boot``: do spawn do uvicorn até o primeiro ``/health`` 200, para cada
+  modo — ``fast`` (``FAST_BOOT=true``) e ``full`` (migra no startup, exige
+  o Postgres configurado);
+- durante ``--probe-seconds`` depois disso, ``/health`` é consultado em
+  sequência para medir a latência enquanto o warmup roda; o tempo do
+  warmup vem de ``/metrics``.
+
+Sai com código 1 se o p99 do ``/health`` passar de ``--health-budget-ms``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+
+_IMPORT_SNIPPET = "import time; t = time.perf_counter(); import backend.main; print(time.perf_counter() - t)"
+_IMPORTTIME = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| *(\S+)")
+
+
+def measure_import(repeat: int) -> list[float]:
+    return [
+        float(subprocess.run([sys.executable, "-c", _IMPORT_SNIPPET], check=True, capture_output=True, text=True).stdout)
+        for _ in range(repeat)
+    ]
+
+
+def heaviest_imports(top: int) -> list[dict]:
+    """Pacotes de terceiros com maior tempo cumulativo de import."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import backend.main"],
+        check=True, capture_output=True, text=True,
+    ).stderr
+    totals: dict[str, int] = {}
+    for match in _IMPORTTIME.finditer(stderr):
+        cumulative, root = int(match.group(1)), match.group(2).split(".")[0]
+        if root != "backend" and root.lstrip("_") not in sys.stdlib_module_names:
+            totals[root] = max(totals.get(root, 0), cumulative)
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{"module": name, "ms": round(us / 1000, 1)} for name, us in ranked]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_boot(mode: str, *, timeout: float, probe_seconds: float) -> dict:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    env = {**os.environ, "FAST_BOOT": "true" if mode == "fast" else "false", "WARMUP_ON_STARTUP": "true"}
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        env=env,
+    )
+    result: dict = {"mode": mode}
+    try:
+        with httpx.Client(base_url=url, timeout=2.0) as client:
+            while True:
+                if process.poll() is not None:
+                    result["error"] = f"processo encerrou com código {process.returncode}"
+                    return result
+                if time.perf_counter() - started > timeout:
+                    result["error"] = f"sem resposta em {timeout:.0f}s"
+                    return result
+                try:
+                    if client.get("/health").status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    time.sleep(0.01)
+            result["boot_seconds"] = round(time.perf_counter() - started, 3)
+
+            latencies = []
+            probe_until = time.perf_counter() + probe_seconds
+            while time.perf_counter() < probe_until:
+                t = time.perf_counter()
+                client.get("/health")
+                latencies.append((time.perf_counter() - t) * 1000)
+                time.sleep(0.01)
+            ms = np.array(latencies)
+            result["health"] = {
+                "probes": len(ms),
+                "p50_ms": round(float(np.percentile(ms, 50)), 2),
+                "p99_ms": round(float(np.percentile(ms, 99)), 2),
+                "max_ms": round(float(ms.max()), 2),
+            }
+            result["warmup"] = client.get("/metrics").json().get("warmup")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return result
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", choices=("fast", "full"), default=["fast", "full"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="módulos mais caros listados")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--probe-seconds", type=float, default=3)
+    parser.add_argument("--health-budget-ms", type=float, default=50)
+    parser.add_argument("--json", type=Path, help="grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    imports = measure_import(args.repeat)
+    report: dict = {
+        "import_seconds": round(statistics.median(imports), 3),
+        "import_runs": [round(s, 3) for s in imports],
+        "heaviest_imports": heaviest_imports(args.top),
+        "boot": [],
+    }
+    print(f"import backend.main: {report['import_seconds']:.3f}s (mediana de {args.repeat})")
+    for entry in report["heaviest_imports"]:
+        print(f"  {entry['module']:<24} {entry['ms']:>8.1f} ms")
+
+    over_budget = False
+    for mode in args.modes:
+        runs = [measure_boot(mode, timeout=args.timeout, probe_seconds=args.probe_seconds) for _ in range(args.repeat)]
+        report["boot"].extend(runs)
+        errors = [r["error"] for r in runs if "error" in r]
+        if errors:
+            print(f"boot {mode}: falhou — {errors[0]}")
+            continue
+        boot = statistics.median(r["boot_seconds"] for r in runs)
+        p99 = max(r["health"]["p99_ms"] for r in runs)
+        warm = [r["warmup"] for r in runs if r.get("warmup")]
+        print(
+            f"boot {mode}: {boot:.3f}s até o primeiro /health; /health p99 {p99:.1f} ms durante o warmup"
+            + (f"; warmup {warm[-1]['status']} em {warm[-1]['seconds']}s" if warm else "")
+        )
+        over_budget |= p99 > args.health_budget_ms
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    if over_budget:
+        print(f"/health passou do orçamento de {args.health_budget_ms} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,44 @@
 #!/usr/bin/env python3
 """
-scraper_linx.py — Scraper standalone para ingerir páginas da documentação
-Linx Farma Big do Confluence no Copiloto Farma via POST /ingest/url.
+scraper_linx.py — Cliente de ingestão em lote do Copiloto Farma.
+
+Envia um manifesto de URLs e/ou arquivos (PDF, HTML, TXT, MD) para
+POST /ingest/batch e acompanha o progresso do job em GET /ingest/batch/{id}.
+Sem manifesto, usa as páginas da documentação Linx Farma Big do Confluence.
+
+O estado é retomável como antes: cada item concluído é gravado em
+links_processados.txt e não é reenviado. O job em andamento fica em
+.scraper_linx_job.json — se o script for interrompido, rodar de novo volta
+a acompanhar o mesmo job em vez de reenviar o lote.
 
 Uso:
     python scraper_linx.py
+    python scraper_linx.py --manifest links.txt --tenant farmacia-teste
+    python scraper_linx.py --api http://localhost:8000 --poll 5
+
+Manifesto: um item por linha (URL ou caminho de arquivo); linhas vazias e
+começando com # são ignoradas.
 """
 
 from __future__ import annotations
 
+import argparse
+import json
+import sys
 import time
+from contextlib import ExitStack
 from pathlib import Path
 from urllib.parse import urlparse
 
 import requests
 
 # ── Configuração ──────────────────────────────────────────────────────
-INGEST_ENDPOINT = "http://localhost:8000/ingest/url"
+API_URL = "http://localhost:8000"
 TENANT_ID = "farmacia-teste"
 PROCESSED_FILE = Path(__file__).parent / "links_processados.txt"
-DELAY_SECONDS = 2
+JOB_STATE_FILE = Path(__file__).parent / ".scraper_linx_job.json"
+POLL_SECONDS = 3
+MAX_ITEMS_PER_JOB = 500  # mesmo limite padrão do servidor (INGEST_BATCH_MAX_ITEMS)
 
 URLS = [
     "https://share.linx.com.br/display/FARMA/Linx+Farma+-+Big",
@@ -59,69 +78,175 @@ def load_processed() -> set[str]:
     }
 
 
-def save_processed(url: str) -> None:
-    """Adiciona um link ao arquivo de processados."""
+def save_processed(entry: str) -> None:
+    """Adiciona um link (ou caminho de arquivo) ao arquivo de processados."""
     with PROCESSED_FILE.open("a", encoding="utf-8") as f:
-        f.write(url + "\n")
+        f.write(entry + "\n")
+
+
+def load_manifest(path: Path | None) -> list[str]:
+    if path is None:
+        return list(URLS)
+    entries = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            entries.append(line)
+    return entries
+
+
+def is_url(entry: str) -> bool:
+    return urlparse(entry).scheme in ("http", "https")
+
+
+def short_name(entry: str) -> str:
+    if not is_url(entry):
+        return Path(entry).name
+    parsed = urlparse(entry)
+    return parsed.path + (f"?{parsed.query}" if parsed.query else "")
+
+
+# ── Job ───────────────────────────────────────────────────────────────
 
+def submit_batch(api: str, tenant: str, entries: list[str]) -> tuple[str, list[str]]:
+    """Envia o lote; retorna (job_id, entradas na ordem das posições do job)."""
+    urls = [e for e in entries if is_url(e)]
+    paths = [e for e in entries if not is_url(e)]
 
-def ingest_url(url: str) -> int:
-    """Envia uma URL para o endpoint de ingestão e retorna o nº de chunks."""
-    payload = {"url": url, "tenant_id": TENANT_ID}
-    resp = requests.post(INGEST_ENDPOINT, json=payload, timeout=120)
+    with ExitStack() as stack:
+        files = [
+            ("files", (Path(p).name, stack.enter_context(open(p, "rb"))))
+            for p in paths
+        ]
+        resp = requests.post(
+            f"{api}/ingest/batch",
+            data={"tenant_id": tenant, "urls": urls},
+            files=files or None,
+            timeout=300,
+        )
     resp.raise_for_status()
-    data = resp.json()
-    return data.get("chunks_ingested", 0)
+    # O servidor numera as URLs primeiro, depois os arquivos
+    return resp.json()["job_id"], urls + paths
 
 
-def main() -> None:
-    processed = load_processed()
-    pending = [url for url in URLS if url not in processed]
+def save_job_state(job_id: str, entries: list[str]) -> None:
+    JOB_STATE_FILE.write_text(json.dumps({"job_id": job_id, "entries": entries}), encoding="utf-8")
 
-    if not pending:
-        print("🎉 Todos os links já foram processados!")
-        return
 
-    print(
-        f"\n📋 {len(pending)} links pendentes "
-        f"({len(processed)} já processados)\n"
-    )
+def load_job_state() -> tuple[str, list[str]] | None:
+    if not JOB_STATE_FILE.exists():
+        return None
+    state = json.loads(JOB_STATE_FILE.read_text(encoding="utf-8"))
+    return state["job_id"], state["entries"]
+
+
+def follow_job(api: str, job_id: str, entries: list[str], poll: float) -> tuple[int, int, int]:
+    """Acompanha o job até terminar; retorna (concluídos, com erro, chunks)."""
+    processed = load_processed()
+    reported: set[int] = set()
+    ok = errors = chunks_total = 0
+
+    while True:
+        resp = requests.get(f"{api}/ingest/batch/{job_id}", timeout=30)
+        resp.raise_for_status()
+        data = resp.json()
+
+        for item in data["items"]:
+            position = item["position"]
+            if position in reported or item["status"] not in ("completed", "failed"):
+                continue
+            reported.add(position)
+            entry = entries[position] if position < len(entries) else item["source"]
+
+            if item["status"] == "completed":
+                ok += 1
+                chunks_total += item["chunks"]
+                if entry not in processed:
+                    save_processed(entry)
+                    processed.add(entry)
+                print(f"  ✅ {short_name(entry)} — {item['chunks']} chunks")
+            else:
+                errors += 1
+                print(f"  ⚠️  {short_name(entry)} — {item['error_message']}")
+
+        print(
+            f"     [{data['percent']:3d}%] {data['items_processed']}/{data['items_total']} itens, "
+            f"{data['chunks_total']} chunks",
+            flush=True,
+        )
+
+        if data["status"] in ("completed", "failed"):
+            if data["status"] == "failed":
+                print(f"  ❌ Job falhou: {data['error_message']}")
+            return ok, errors, chunks_total
+        time.sleep(poll)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Ingestão em lote via /ingest/batch")
+    parser.add_argument("--manifest", type=Path, help="arquivo com uma URL/caminho por linha")
+    parser.add_argument("--api", default=API_URL, help=f"URL da API (padrão: {API_URL})")
+    parser.add_argument("--tenant", default=TENANT_ID)
+    parser.add_argument("--poll", type=float, default=POLL_SECONDS, help="intervalo de consulta (s)")
+    args = parser.parse_args(argv)
+    api = args.api.rstrip("/")
+
+    totals = [0, 0, 0]
+
+    # Job de uma execução anterior interrompida: só acompanha
+    state = load_job_state()
+    if state is not None:
+        job_id, entries = state
+        print(f"\n🔁 Retomando job {job_id} ({len(entries)} itens)\n")
+        try:
+            for i, value in enumerate(follow_job(api, job_id, entries, args.poll)):
+                totals[i] += value
+        except requests.RequestException as exc:
+            # Job apagado (banco recriado, limpeza) ou API fora: sem limpar o
+            # estado, toda execução seguinte pararia aqui. O que o job já
+            # concluiu está em links_processados.txt; o resto é reenviado.
+            if exc.response is not None and exc.response.status_code == 404:
+                print(f"⚠️  Job {job_id} não existe mais no servidor — reenviando os pendentes")
+            else:
+                print(f"⚠️  Falha ao acompanhar o job {job_id}: {exc} — reenviando os pendentes")
+            state = None
+        JOB_STATE_FILE.unlink()
+
+    processed = load_processed()
+    pending = [e for e in load_manifest(args.manifest) if e not in processed]
 
-    total_chunks = 0
-    errors = 0
+    if not pending and state is None:
+        print("🎉 Todos os links já foram processados!")
+        return 0
 
-    for i, url in enumerate(pending, start=1):
-        parsed = urlparse(url)
-        short_path = parsed.path
-        if parsed.query:
-            short_path += f"?{parsed.query}"
-        print(f"  Ingerindo {i}/{len(pending)}: {short_path} ... ", end="", flush=True)
+    if pending:
+        print(f"\n📋 {len(pending)} itens pendentes ({len(processed)} já processados)\n")
 
+    for start in range(0, len(pending), MAX_ITEMS_PER_JOB):
+        batch = pending[start:start + MAX_ITEMS_PER_JOB]
         try:
-            chunks = ingest_url(url)
-            total_chunks += chunks
-            save_processed(url)
-            print(f"✅ {chunks} chunks")
-        except requests.HTTPError as exc:
-            errors += 1
-            status_code = exc.response.status_code if exc.response else "?"
-            print(f"⚠️  HTTP {status_code} — pulando")
+            job_id, entries = submit_batch(api, args.tenant, batch)
         except requests.RequestException as exc:
-            errors += 1
-            print(f"❌ {exc}")
+            print(f"❌ Falha ao enviar o lote: {exc}")
+            return 1
+        save_job_state(job_id, entries)
+        print(f"  🚀 Job {job_id} — {len(entries)} itens")
 
-        if i < len(pending):
-            time.sleep(DELAY_SECONDS)
+        for i, value in enumerate(follow_job(api, job_id, entries, args.poll)):
+            totals[i] += value
+        JOB_STATE_FILE.unlink()
 
+    ok, errors, chunks = totals
     # ── Resumo ──
     print("\n" + "═" * 50)
-    print(f"  🏁 Concluído!")
-    print(f"     Links ingeridos:  {len(pending) - errors}/{len(pending)}")
-    print(f"     Chunks totais:    {total_chunks}")
+    print("  🏁 Concluído!")
+    print(f"     Itens ingeridos:  {ok}/{ok + errors}")
+    print(f"     Chunks totais:    {chunks}")
     if errors:
-        print(f"     Pulados (erro):   {errors}")
+        print(f"     Com erro:         {errors} (serão reenviados na próxima execução)")
     print("═" * 50 + "\n")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
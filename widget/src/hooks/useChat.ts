@@ -158,6 +158,7 @@ export function useChat() {
                     role: "assistant",
                     content: data.response,
                     timestamp: new Date(),
+                    verifiedAnswer: data.verified_answer,
                 };
 
                 setMessages((prev) => [...prev, assistantMessage]);
@@ -205,6 +206,7 @@ export function useChat() {
                     response: assistantMsg.content,
                     rating,
                     context: null,
+                    verified_answer: assistantMsg.verifiedAnswer ?? null,
                 };
                 await fetch(FEEDBACK_URL, {
                     method: "POST",
@@ -4,6 +4,7 @@ export interface Message {
     content: string;
     timestamp: Date;
     feedbackGiven?: "positive" | "negative";
+    verifiedAnswer?: string | null;
 }
 
 export interface ScreenContext {
@@ -29,6 +30,7 @@ export interface ChatRequest {
 
 export interface ChatResponse {
     response: string;
+    verified_answer?: string | null;
 }
 
 export interface FeedbackRequest {
@@ -37,5 +39,6 @@ export interface FeedbackRequest {
     response: string;
     rating: "positive" | "negative";
     context: ScreenContext | null;
+    verified_answer?: string | null;
 }
 